@@ -1,26 +1,401 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+import gzip
+import hashlib
+import json
+import multiprocessing
 import os
+import threading
+import time
+import zlib
+from functools import wraps
+import pandas as pd
+from cachetools import TTLCache
 from dotenv import load_dotenv
+import bitmap_index
+import instrumentation
+import jobs
+import log_store
+import result_cache
+from logs_analysis import summarize_logs
 
 app = Flask(__name__)
 load_dotenv()
 
 API_KEY = os.getenv('API_KEY')
 
+# Seconds an aggregate result stays cached for a given dataset version and query
+RESULT_TTL = 30
+RESULT_CACHE_SIZE = 256
+
+# Rows per chunk written by /logs/export
+EXPORT_CHUNK_ROWS = 10000
+
+# Query parameter -> log column, for the filters every endpoint accepts
+FILTER_PARAMS = {
+    'country': 'Country',
+    'sport': 'Sports Activity',
+    'endpoint': 'Endpoint',
+    'device': 'Device',
+    'browser': 'Browser',
+}
+
+# Responses smaller than this are not worth compressing
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+
+# Job kinds and parameters accepted by POST /jobs. File paths are not, so clients
+# cannot make the server read or write files of their choosing
+API_JOB_PARAMS = {'generate': ('rows', 'seed'), 'rollup': (), 'retrain': ()}
+MAX_GENERATED_ROWS = 10_000_000
+
+# Request latency histograms share their buckets with the stage spans, so both export together
+LATENCY_BUCKETS = instrumentation.LATENCY_BUCKETS
+
+_results = TTLCache(maxsize=RESULT_CACHE_SIZE, ttl=RESULT_TTL)
+_results_lock = threading.Lock()
+
+# Warm dataset shared by every request: logs plus their filter index for one store version
+_dataset = {'version': None, 'fingerprint': None, 'logs': None, 'index': None}
+_dataset_lock = threading.Lock()
+
 def authenticate(key):
     return key == API_KEY
 
+def require_api_key(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('API_KEY')
+        if not authenticate(key):
+            return jsonify({"error": "Unauthorized"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def load_dataset():
+    """
+    Return the warm dataset, refreshing it when the log store has new rows.
+
+    Returns:
+        dict: Keys 'version', 'fingerprint', 'logs' and 'index'.
+    """
+    version = log_store.version()
+    with _dataset_lock:
+        stale = _dataset['version'] != version
+        instrumentation.cache_lookup('api.dataset', hit=not stale)
+        if stale:
+            with instrumentation.span('api.load_dataset'):
+                logs = log_store.load_logs()
+                _dataset.update(version=version, fingerprint=log_store.fingerprint(), logs=logs,
+                                index=bitmap_index.build_index(logs))
+        return dict(_dataset)
+
+def parse_query(args):
+    """
+    Normalize the filter and time-range query parameters.
+
+    Filters accept repeated or comma-separated values, e.g.
+    ?country=Niger,Benin&device=Mobile. 'start' and 'end' are timestamps
+    bounding the request time (inclusive).
+
+    Args:
+        args (werkzeug.datastructures.MultiDict): The request arguments.
+
+    Returns:
+        dict: 'filters' (column -> values), 'start' and 'end' (pd.Timestamp or None).
+    """
+    filters = {}
+    for param, column in FILTER_PARAMS.items():
+        values = [value for raw in args.getlist(param) for value in raw.split(',') if value]
+        if values:
+            filters[column] = sorted(set(values))
+    start, end = args.get('start'), args.get('end')
+    return {
+        'filters': filters,
+        'start': pd.Timestamp(start) if start else None,
+        'end': pd.Timestamp(end) if end else None,
+    }
+
+def filter_logs(dataset, query):
+    """
+    Apply a parsed query to the warm dataset.
+
+    Args:
+        dataset (dict): The dataset returned by load_dataset.
+        query (dict): The query returned by parse_query.
+
+    Returns:
+        pd.DataFrame: The matching rows.
+    """
+    logs = dataset['logs']
+    with instrumentation.span('api.filter'):
+        mask = bitmap_index.select(dataset['index'], query['filters'])
+        if query['start'] is not None or query['end'] is not None:
+            mask = mask & log_store.time_mask(logs['Timestamp'], query['start'], query['end'])
+        return logs[mask]
+
+def _query_key(query):
+    return json.dumps({
+        'filters': query['filters'],
+        'start': str(query['start']),
+        'end': str(query['end']),
+    }, sort_keys=True)
+
+def _counts(series):
+    return {str(key): int(value) for key, value in series.items()}
+
+def _number(value):
+    return None if pd.isna(value) else float(value)
+
+def _summarize(dataset, query):
+    logs = filter_logs(dataset, query)
+    with instrumentation.span('api.summarize'):
+        analysis_results = summarize_logs(logs)
+    return {
+        'rows': int(len(logs)),
+        'visits_per_country': _counts(analysis_results['visits_per_country']),
+        'main_interests': _counts(analysis_results['main_interests']),
+        'average_duration': _number(analysis_results['average_duration']),
+        'duration_std': _number(analysis_results['duration_std']),
+    }
+
+def _summary(dataset, query):
+    key = (dataset['version'], _query_key(query))
+    with _results_lock:
+        result = _results.get(key)
+    instrumentation.cache_lookup('api.results', hit=result is not None)
+    if result is None:
+        # Behind the per-process cache, results persist for every worker, restart and replica
+        result = result_cache.cached('api.summary', dataset['fingerprint'], lambda: _summarize(dataset, query),
+                                     {'query': _query_key(query)})
+        with _results_lock:
+            _results[key] = result
+    return result
+
+def _cached_response(section=None):
+    """
+    Answer an analysis request, honouring If-None-Match.
+
+    The ETag depends only on the dataset version and the normalized query, so
+    a matching client gets a 304 before anything is computed.
+    """
+    try:
+        dataset = load_dataset()
+        query = parse_query(request.args)
+    except FileNotFoundError:
+        return jsonify({"error": "Log data not available."}), 503
+    except ValueError as error:
+        return jsonify({"error": f"Invalid query: {error}"}), 400
+
+    etag = hashlib.sha1(f"{dataset['version']}|{section}|{_query_key(query)}".encode('utf-8')).hexdigest()
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    result = _summary(dataset, query)
+    if section is not None:
+        result = {'rows': result['rows'], **{name: result[name] for name in section}}
+    response = jsonify(result)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={RESULT_TTL}'
+    return response
+
 @app.route('/analyze', methods=['GET'])
+@require_api_key
 def analyze():
-    key = request.headers.get('API_KEY')
-    if not authenticate(key):
-        return jsonify({"error": "Unauthorized"}), 403
+    return _cached_response()
+
+@app.route('/analyze/countries', methods=['GET'])
+@require_api_key
+def analyze_countries():
+    return _cached_response(('visits_per_country',))
+
+@app.route('/analyze/endpoints', methods=['GET'])
+@require_api_key
+def analyze_endpoints():
+    return _cached_response(('main_interests',))
+
+@app.route('/analyze/durations', methods=['GET'])
+@require_api_key
+def analyze_durations():
+    return _cached_response(('average_duration', 'duration_std'))
+
+@app.route('/logs/export', methods=['GET'])
+@require_api_key
+def export_logs():
+    """
+    Stream the matching rows as NDJSON (default) or CSV (?format=csv).
+    """
+    try:
+        logs = filter_logs(load_dataset(), parse_query(request.args))
+    except FileNotFoundError:
+        return jsonify({"error": "Log data not available."}), 503
+    except ValueError as error:
+        return jsonify({"error": f"Invalid query: {error}"}), 400
+
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'csv'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'."}), 400
+
+    def generate():
+        # Serialize one bounded slice at a time so memory does not grow with the export
+        for first in range(0, len(logs), EXPORT_CHUNK_ROWS):
+            chunk = logs.iloc[first:first + EXPORT_CHUNK_ROWS]
+            if export_format == 'csv':
+                yield chunk.to_csv(index=False, header=first == 0, date_format='%Y-%m-%d %H:%M:%S')
+            else:
+                records = chunk.to_json(orient='records', lines=True, date_format='iso', date_unit='s')
+                yield records.rstrip('\n') + '\n'
+        if export_format == 'csv' and logs.empty:
+            yield ','.join(log_store.LOG_COLUMNS) + '\n'
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype)
+
+@app.route('/jobs', methods=['POST'])
+@require_api_key
+def submit_job():
+    """
+    Queue a background job, e.g. {"kind": "generate", "params": {"rows": 1000}}.
+
+    Answers 202 with the job; poll the URL in its Location header.
+    """
+    body = request.get_json(silent=True) or {}
+    kind, params = body.get('kind'), body.get('params') or {}
+    if kind not in API_JOB_PARAMS:
+        return jsonify({"error": f"kind must be one of {', '.join(API_JOB_PARAMS)}."}), 400
+    if not isinstance(params, dict) or set(params) - set(API_JOB_PARAMS[kind]):
+        return jsonify({"error": f"params for {kind} may only contain {', '.join(API_JOB_PARAMS[kind]) or 'nothing'}."}), 400
+    if any(type(value) is not int or value < 0 for value in params.values()) \
+            or params.get('rows', 0) > MAX_GENERATED_ROWS:
+        return jsonify({"error": f"params must be non-negative integers, rows at most {MAX_GENERATED_ROWS}."}), 400
+
+    job_id = jobs.submit(kind, **params)
+    response = jsonify(jobs.status(job_id))
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response
+
+@app.route('/jobs', methods=['GET'])
+@require_api_key
+def list_jobs():
+    """
+    List the background jobs of every worker, newest first (?active=1 for queued and running only).
+    """
+    return jsonify(jobs.list_jobs(active_only=request.args.get('active') in ('1', 'true')))
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+@require_api_key
+def job_status(job_id):
+    """
+    Report a job's status, progress and, once done, its result.
+    """
+    job = jobs.status(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown job."}), 404
+    return jsonify(job)
 
-    return jsonify({"message": "API key authorized."})
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Report per-endpoint request latency histograms (cumulative across workers).
+
+    ?format=prometheus or ?format=json instead returns every metric in one
+    export: request latencies as 'request:<endpoint>' stages next to this
+    worker's stage spans and cache counts.
+    """
+    export_format = request.args.get('format')
+    if export_format is None:
+        return jsonify({'buckets': [str(bound) for bound in LATENCY_BUCKETS], 'endpoints': latency_histograms()})
+    if export_format not in ('prometheus', 'json'):
+        return jsonify({"error": "format must be 'prometheus' or 'json'."}), 400
+
+    snapshot = instrumentation.snapshot()
+    snapshot['spans'].update({f'request:{endpoint}': histogram
+                              for endpoint, histogram in latency_histograms().items()})
+    if export_format == 'prometheus':
+        return Response(instrumentation.to_prometheus(snapshot), mimetype='text/plain; version=0.0.4')
+    return Response(instrumentation.to_json(snapshot), mimetype='application/json')
 
 @app.route('/')
 def index():
     return 'Welcome to the Web Server Log Analysis API!'
 
+@app.before_request
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def _finish_response(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        observe_latency(request.endpoint, time.perf_counter() - started)
+    return _compress(response)
+
+def _compress(response):
+    if 'gzip' not in request.accept_encodings or response.status_code != 200:
+        return response
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return response
+
+    if response.is_streamed:
+        response.response = _gzip_stream(response.response)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < GZIP_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(data, GZIP_LEVEL))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+def _gzip_stream(chunks):
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # wbits=31 writes a gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+# Latency histograms live in shared memory allocated at import, before any
+# pre-fork worker exists, so every worker records into the same counters.
+_latency_endpoints = sorted({rule.endpoint for rule in app.url_map.iter_rules()})
+_latency_rows = {endpoint: row for row, endpoint in enumerate(_latency_endpoints)}
+_latency_counts = multiprocessing.RawArray('q', len(_latency_endpoints) * len(LATENCY_BUCKETS))
+_latency_sums = multiprocessing.RawArray('d', len(_latency_endpoints))
+_latency_lock = multiprocessing.Lock()
+
+def observe_latency(endpoint, seconds):
+    """
+    Record one request's latency in its endpoint's histogram.
+
+    Args:
+        endpoint (str): The Flask endpoint name (unknown endpoints are ignored).
+        seconds (float): The request latency.
+    """
+    row = _latency_rows.get(endpoint)
+    if row is None:
+        return
+    bucket = next(position for position, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)
+    with _latency_lock:
+        _latency_counts[row * len(LATENCY_BUCKETS) + bucket] += 1
+        _latency_sums[row] += seconds
+
+def latency_histograms():
+    """
+    Snapshot the latency histograms.
+
+    Returns:
+        dict: Endpoint name to {'count', 'sum', 'buckets'} for endpoints that served requests.
+    """
+    width = len(LATENCY_BUCKETS)
+    with _latency_lock:
+        counts = list(_latency_counts)
+        sums = list(_latency_sums)
+    histograms = {}
+    for row, endpoint in enumerate(_latency_endpoints):
+        buckets = counts[row * width:(row + 1) * width]
+        if any(buckets):
+            histograms[endpoint] = {'count': sum(buckets), 'sum': sums[row], 'buckets': buckets}
+    return histograms
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -1,24 +1,11 @@
 import streamlit as st
-import pandas as pd
-import csv
-from random import randint, choice
-from faker import Faker
-from dashboard import display_dashboard  # Import the dashboard function
-from reports_page import display_reports  # Import the reports page function
-from prediction_page import display_prediction_page  # Import the reports page function
+
+# Page modules (and the pandas, Altair, matplotlib and scikit-learn they pull in) are imported
+# on first navigation to the page, so the home page paints without them
 
 # Load CSS
 st.markdown('<link rel="stylesheet" href="styles.css">', unsafe_allow_html=True)
 
-# Load data with caching
-@st.cache_data
-def load_data():
-    # Your data loading logic here
-    pass
-
-# Define functions for generating logs, saving logs to CSV, etc.
-# ...
-
 # Define pages
 def home_page():
     st.title('Welcome to the FunOlympics Home Page')
@@ -61,29 +48,42 @@ def home_page():
         st.image("images/swimming.jpg", width=320)
 
 def dashboard():
+    from dashboard import display_dashboard
     display_dashboard()  # Call the function to display the dashboard
 
 def reports_page():
+    from reports_page import display_reports
     display_reports()  # Call the function to display the reports
 
 def prediction_page():
+    from prediction_page import display_prediction_page
     display_prediction_page() # Call the function to display the predictions
 
+def performance_page():
+    from performance_page import display_performance_page
+    display_performance_page()  # Call the function to display the timings and cache counts
+
 # Define navigation
 pages = {
     "Home": home_page,
     "Dashboard": dashboard,
     "Standalone Reports": reports_page,
     "Machine Learning Prediction": prediction_page,
+    "Performance": performance_page,
 }
 
+# Left out of the navigation unless the URL asks for it, e.g. http://localhost:8501/?debug=performance
+hidden_pages = {"Performance"}
+if st.query_params.get("debug") == "performance":
+    hidden_pages = set()
+
 # Sidebar navigation
 st.sidebar.title('Navigation')
 
 # Add the image to the sidebar
 st.sidebar.image("images/touch.webp", width=250)
 
-selection = st.sidebar.radio("Go to", list(pages.keys()))
+selection = st.sidebar.radio("Go to", [name for name in pages if name not in hidden_pages])
 
 # Display the selected page
 pages[selection]()
@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from datetime import datetime
+from types import SimpleNamespace
+
+# Every benchmark uses the same synthetic logs
+SEED = 42
+DEFAULT_ROWS = 100000
+DEFAULT_REPEAT = 3
+
+# A benchmark regresses when its best time exceeds the baseline's by more than this fraction
+DEFAULT_THRESHOLD = 0.25
+
+# Faster than this, timer noise dominates; such benchmarks are reported but never flagged
+MIN_COMPARABLE_SECONDS = 0.005
+
+API_KEY = 'benchmark'
+
+COUNTRIES = ['Niger', 'Benin', 'Chile', 'Norway', 'Japan', 'Peru', 'Kenya', 'Fiji']
+
+class StubReader:
+    """
+    Offline stand-in for geoip2.database.Reader with a deterministic country per address.
+    """
+
+    def city(self, ip):
+        name = COUNTRIES[zlib.crc32(ip.encode('ascii')) % len(COUNTRIES)]
+        return SimpleNamespace(country=SimpleNamespace(name=name))
+
+def prepare_logs(rows, seed=SEED, filename='web_server_logs.csv'):
+    """
+    Write synthetic logs to a CSV file.
+
+    Args:
+        rows (int): Number of log entries.
+        seed (int): Seed for reproducible logs.
+        filename (str): The CSV file to write.
+    """
+    import web_server_logs
+    web_server_logs.save_logs_to_csv(web_server_logs.generate_logs(rows, seed=seed), filename)
+
+def _cold_store():
+    # Forget the parsed logs in this process and on disk
+    import log_store
+    log_store.clear_cache()
+    shutil.rmtree(log_store.dataset_path(), ignore_errors=True)
+
+def _benchmarks(rows):
+    """
+    Return the benchmarks as (name, prepare) pairs.
+
+    prepare does the untimed set-up and returns the callable that is timed.
+    """
+    import api_flask
+    import bitmap_index
+    import dashboard
+    import log_store
+    import logs_analysis
+    import prediction_page
+    import reports_page
+    import result_cache
+    import rollup
+    import web_server_logs
+
+    if log_store.LOG_FILE != os.environ.get('LOG_FILE'):
+        # Its defaults would read (and _cold_store delete) the configured logs' dataset
+        raise RuntimeError("log_store was imported before the benchmark run set LOG_FILE; run it in a fresh process.")
+
+    def generate():
+        return lambda: web_server_logs.generate_logs(rows, seed=SEED)
+
+    def load_cold():
+        _cold_store()
+        return log_store.load_logs
+
+    def load_cached_parquet():
+        log_store.load_logs()
+        log_store.clear_cache()
+        return log_store.load_logs
+
+    def page_loader(loader):
+        def prepare():
+            log_store.load_logs()
+            log_store.clear_cache()
+            return loader
+        return prepare
+
+    def build_rollup():
+        logs = log_store.load_logs()
+        return lambda: bitmap_index.build_index(rollup.build_rollup(logs))
+
+    def filter_aggregate():
+        cube = rollup.build_rollup(log_store.load_logs())
+        index = bitmap_index.build_index(cube)
+        filters = {'Country': list(cube['Country'].unique()[:5]), 'Device': ['Mobile', 'Tablet']}
+
+        def run():
+            index['selections'].clear()
+            filtered = cube[bitmap_index.select(index, filters)]
+            return (rollup.count_by(filtered, 'Country'), rollup.count_by(filtered, 'Endpoint'),
+                    rollup.count_by(filtered, 'Device'), rollup.duration_stats_by(filtered, 'Browser'))
+        return run
+
+    def analyze():
+        logs = log_store.load_logs()
+        reader = StubReader()
+        logs_analysis.lookup_country.cache_clear()
+        return lambda: logs_analysis.analyze_logs(logs, reader)
+
+    def analyze_chunked():
+        log_store.load_logs()
+        return lambda: logs_analysis.analyze_logs_chunked(log_store.LOG_FILE, chunk_bytes=4 * 1024 * 1024)
+
+    def train():
+        data = log_store.load_logs()
+        return lambda: prediction_page.train_model(data)
+
+    def api(path):
+        def prepare():
+            api_flask.API_KEY = API_KEY
+            client = api_flask.app.test_client()
+            api_flask.load_dataset()
+            api_flask._results.clear()
+            result_cache.clear()
+            return lambda: client.get(path, headers={'API_KEY': API_KEY}).get_data()
+        return prepare
+
+    return [
+        ('generate_logs', generate),
+        ('log_store.load_logs.cold', load_cold),
+        ('log_store.load_logs.cached_parquet', load_cached_parquet),
+        ('dashboard.load_data', page_loader(dashboard.load_data)),
+        ('reports_page.load_report_data', page_loader(reports_page.load_report_data)),
+        ('prediction_page.load_data', page_loader(prediction_page.load_data)),
+        ('dashboard.build_rollup', build_rollup),
+        ('dashboard.filter_aggregate', filter_aggregate),
+        ('logs_analysis.analyze_logs', analyze),
+        ('logs_analysis.analyze_logs_chunked', analyze_chunked),
+        ('prediction_page.train_model', train),
+        ('api./analyze', api('/analyze')),
+        ('api./analyze/countries', api('/analyze/countries?device=Mobile')),
+        ('api./logs/export', api('/logs/export?format=csv&device=Tablet')),
+    ]
+
+def measure(prepare, repeat):
+    """
+    Time a benchmark and profile its peak Python memory.
+
+    Timed runs and the profiled run are separate, since tracemalloc slows
+    allocation-heavy code down.
+
+    Args:
+        prepare (callable): Returns the callable to measure.
+        repeat (int): Number of timed runs.
+
+    Returns:
+        dict: 'seconds_min', 'seconds_median' and 'peak_mib'.
+    """
+    timings = []
+    for _ in range(repeat):
+        run = prepare()
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    run = prepare()
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'seconds_min': min(timings),
+        'seconds_median': statistics.median(timings),
+        'peak_mib': peak / (1024 * 1024),
+    }
+
+def run_benchmarks(rows=DEFAULT_ROWS, repeat=DEFAULT_REPEAT, only=None):
+    """
+    Run the benchmark suite against freshly generated logs in a scratch directory.
+
+    Args:
+        rows (int): Number of synthetic log entries.
+        repeat (int): Timed runs per benchmark.
+        only (list): Substrings selecting benchmarks by name (None runs all).
+
+    Returns:
+        dict: 'meta' (run settings and environment) and 'results' (name -> measurements).
+    """
+    source = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, source)
+    workdir = tempfile.mkdtemp(prefix='benchmarks-')
+    previous = os.getcwd()
+    results = {}
+    import result_cache
+    cache_dir = result_cache.CACHE_DIR
+    log_file = os.environ.get('LOG_FILE')
+    try:
+        # The pages read web_server_logs.csv (and write models/) relative to the working directory
+        os.chdir(workdir)
+        # The API benchmarks clear the result cache, so they get one of their own
+        result_cache.CACHE_DIR = os.path.join(workdir, '.result_cache')
+        # Modules read LOG_FILE when first imported, so it points at the scratch logs before any is
+        os.environ['LOG_FILE'] = os.path.join(workdir, 'web_server_logs.csv')
+        prepare_logs(rows, filename=os.environ['LOG_FILE'])
+        for name, prepare in _benchmarks(rows):
+            if only and not any(pattern in name for pattern in only):
+                continue
+            results[name] = measure(prepare, repeat)
+            print(f"{name:40s} {results[name]['seconds_min'] * 1000:10.1f} ms {results[name]['peak_mib']:9.1f} MiB",
+                  file=sys.stderr)
+    finally:
+        result_cache.CACHE_DIR = cache_dir
+        if log_file is None:
+            os.environ.pop('LOG_FILE', None)
+        else:
+            os.environ['LOG_FILE'] = log_file
+        os.chdir(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'rows': rows,
+            'repeat': repeat,
+            'seed': SEED,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'created': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare a run against a baseline run.
+
+    Args:
+        current (dict): Output of run_benchmarks.
+        baseline (dict): A stored run_benchmarks output.
+        threshold (float): Allowed slowdown of the best time, as a fraction.
+
+    Returns:
+        list: One dict per benchmark present in both runs, with 'name',
+        'baseline', 'current', 'ratio' and 'regressed'.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        reference = baseline['results'].get(name)
+        if reference is None:
+            continue
+        ratio = result['seconds_min'] / reference['seconds_min'] if reference['seconds_min'] else float('inf')
+        comparable = max(result['seconds_min'], reference['seconds_min']) >= MIN_COMPARABLE_SECONDS
+        rows.append({
+            'name': name,
+            'baseline': reference['seconds_min'],
+            'current': result['seconds_min'],
+            'ratio': ratio,
+            'regressed': comparable and ratio > 1 + threshold,
+        })
+    return rows
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the load, filter, aggregate, analysis, training and API paths.")
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help="synthetic log entries")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="timed runs per benchmark")
+    parser.add_argument('--only', action='append', help="run benchmarks whose name contains this (repeatable)")
+    parser.add_argument('--output', default='benchmark_results.json', help="where to write this run's JSON")
+    parser.add_argument('--baseline', default=None, help="baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown before a benchmark counts as regressed (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.rows, args.repeat, args.only)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline['meta']['rows'] != args.rows:
+            print(f"Warning: baseline used {baseline['meta']['rows']} rows, this run {args.rows}.", file=sys.stderr)
+        report['comparison'] = {'baseline': args.baseline, 'threshold': args.threshold,
+                                'benchmarks': compare(report, baseline, args.threshold)}
+        for row in report['comparison']['benchmarks']:
+            flag = 'REGRESSED' if row['regressed'] else 'ok'
+            print(f"{row['name']:40s} {row['ratio']:6.2f}x  {flag}")
+        if any(row['regressed'] for row in report['comparison']['benchmarks']):
+            exit_code = 1
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2)
+    sys.exit(exit_code)
@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from threading import Lock
+
+import numpy as np
+import pandas as pd
+
+# Dimensions behind the dashboard's sidebar multiselects
+FILTER_DIMENSIONS = ['Country', 'Sports Activity', 'Endpoint', 'Device', 'Browser']
+
+# Distinct filter selections whose row masks are kept per index
+SELECTION_CACHE_SIZE = 128
+
+def build_index(frame, dimensions=FILTER_DIMENSIONS):
+    """
+    Build an inverted index from dimension values to packed row bitmaps.
+
+    For every dimension, row r of value v's bitmap is set when frame row r
+    holds v. Bitmaps are packed eight rows per byte, so a selection is
+    answered with a few bitwise OR/AND passes over n/8 bytes instead of
+    string comparisons over the whole frame.
+
+    Args:
+        frame (pd.DataFrame): The rows to index (raw logs or a rollup cube).
+        dimensions (list): Columns to index; categoricals reuse their codes.
+
+    Returns:
+        dict: The index, to be passed to select.
+    """
+    num_rows = len(frame)
+    bitmaps = {}
+    for dimension in dimensions:
+        column = frame[dimension]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes, values = column.cat.codes.to_numpy(), column.cat.categories
+        else:
+            codes, values = pd.factorize(column)
+        # Group row numbers by code, then set one value's rows at a time in a reused buffer
+        order = np.argsort(codes, kind='stable')
+        bounds = np.searchsorted(codes[order], np.arange(len(values) + 1))
+        packed = np.empty((len(values), (num_rows + 7) // 8), dtype=np.uint8)
+        rows = np.zeros(num_rows, dtype=bool)
+        for position in range(len(values)):
+            members = order[bounds[position]:bounds[position + 1]]
+            rows[members] = True
+            packed[position] = np.packbits(rows)
+            rows[members] = False
+        bitmaps[dimension] = {'positions': pd.Index(values), 'bitmaps': packed}
+    return {'num_rows': num_rows, 'dimensions': bitmaps, 'selections': OrderedDict(), 'lock': Lock()}
+
+def select(index, filters):
+    """
+    Return the rows matching every non-empty filter.
+
+    Values within a dimension are OR-ed and dimensions are AND-ed. Masks are
+    cached per selection, so repeating a filter combination costs a lookup.
+
+    Args:
+        index (dict): The index returned by build_index.
+        filters (dict): Dimension name to the list of accepted values.
+
+    Returns:
+        np.ndarray: Boolean row mask (read-only; shared with the cache).
+    """
+    key = tuple(sorted((dimension, tuple(sorted(map(str, values))))
+                       for dimension, values in filters.items() if values))
+    selections = index['selections']
+    with index['lock']:
+        if key in selections:
+            selections.move_to_end(key)
+            return selections[key]
+
+    packed = np.full((index['num_rows'] + 7) // 8, 0xFF, dtype=np.uint8)
+    scratch = np.empty_like(packed)
+    for dimension, values in filters.items():
+        if not values:
+            continue
+        entry = index['dimensions'][dimension]
+        positions = entry['positions'].get_indexer(list(values))
+        positions = positions[positions >= 0]
+        # OR the selected values' bitmaps into the scratch buffer, then AND it in
+        scratch.fill(0)
+        for position in positions:
+            np.bitwise_or(scratch, entry['bitmaps'][position], out=scratch)
+        np.bitwise_and(packed, scratch, out=packed)
+
+    mask = np.unpackbits(packed, count=index['num_rows']).view(bool)
+    mask.flags.writeable = False
+    with index['lock']:
+        selections[key] = mask
+        if len(selections) > SELECTION_CACHE_SIZE:
+            selections.popitem(last=False)
+    return mask
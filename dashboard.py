@@ -1,74 +1,142 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-from datetime import datetime, timedelta
-import csv
-from random import randint, choice
-from faker import Faker
+from datetime import datetime
 import altair as alt
+import instrumentation
+import jobs
+import log_store
+import rollup
+import bitmap_index
+import live_tail
+import logs_analysis
+import rendering
+import result_cache
 
 
-fake = Faker()
-
-# Function to generate random IP address
-def generate_ip():
-    return ".".join(map(str, (randint(0, 255) for _ in range(4))))
-
-# Function to generate log entries
-def generate_logs(num_entries=200):
-    endpoints = ["/index.html", "/images/games.jpg", "/searchsports.php", "/football.html"]
-    methods = ["GET", "POST"]
-    statuses = [200, 304, 404, 500]
-    countries = [fake.country() for _ in range(100)]
-    devices = ["Desktop", "Mobile", "Tablet"]
-    browsers = ["Chrome", "Firefox", "Safari", "Edge"]
-    sports_activities = ["Football", "Basketball", "Tennis", "Swimming", "Running", "Cycling", "Golf", "Baseball", "Cricket", "Volleyball"]
-
-    log_entries = []
-    start_time = datetime.now()
-
-    for _ in range(num_entries):
-        timestamp = (start_time + timedelta(seconds=randint(0, 100000))).strftime('%Y-%m-%d %H:%M:%S')
-        ip_address = generate_ip()
-        method = choice(methods)
-        endpoint = choice(endpoints)
-        status = choice(statuses)
-        country = choice(countries)
-        sports_activity = choice(sports_activities)
-        device = choice(devices)
-        browser = choice(browsers)
-        duration = randint(1, 1000)  # Random duration between 1 and 1000 seconds
-        log_entries.append([timestamp, ip_address, method, endpoint, status, country, sports_activity, device, browser, duration])
-
-    return log_entries
-
-# Function to save log entries to a CSV file
-def save_logs_to_csv(log_entries, filename="web_server_logs.csv"):
-    with open(filename, mode='a', newline='', encoding='utf-8') as file:  # Use 'a' to append data
-        writer = csv.writer(file)
-        if file.tell() == 0:
-            writer.writerow(["Timestamp", "IP Address", "Method", "Endpoint", "Status", "Country", "Sports Activity", "Device", "Browser", "Duration"])
-        writer.writerows(log_entries)
-
 # Function to convert DataFrame to CSV
 def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8')
 
-# Load data with caching
-@st.cache_data
-def load_data():
+# Load data from the shared log store (parsed once per CSV change, shared across pages)
+@instrumentation.timed('dashboard.load_data')
+def load_data(start=None, end=None):
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     try:
-        data = pd.read_csv('web_server_logs.csv')
-        return data, timestamp
+        data = log_store.load_logs(start=start, end=end)
+        return data, log_store.loaded_at()
     except FileNotFoundError:
         st.error("Error: CSV file not found.")
     except KeyError:
         st.error("Error: Missing columns in CSV file.")
-        return pd.DataFrame(), timestamp  # Return an empty DataFrame in case of error
+    return pd.DataFrame(), timestamp  # Return an empty DataFrame in case of error
+
+# Rollup cube and its filter index, rebuilt only when the store ingests new rows;
+# the cube itself persists in the result cache, so restarts and other replicas map it from disk
+@st.cache_resource(max_entries=2)
+def load_rollup(version):
+    instrumentation.cache_miss('dashboard.rollup')
+    cube = logs_analysis.cached_rollup()
+    return cube, bitmap_index.build_index(cube)
+
+# Sketch-based visitor statistics; memory stays fixed however many distinct visitors the logs hold
+@st.cache_resource(max_entries=4)
+def load_approximate_summary(version, start, end):
+    instrumentation.cache_miss('dashboard.approximate_summary')
+    return result_cache.cached(
+        'dashboard.approximate_summary', log_store.fingerprint(),
+        lambda: logs_analysis.summarize_logs(log_store.load_logs(start=start, end=end), approximate=True),
+        {'start': start, 'end': end})
+
+def display_approximate_summary(start=None, end=None):
+    instrumentation.cache_lookup('dashboard.approximate_summary')
+    with instrumentation.span('dashboard.approximate_summary'):
+        summary = load_approximate_summary(log_store.version(), start, end)
+    st.header('Approximate Visitor Statistics')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Unique visitors', f"~{summary['unique_visitors']:,}")
+    percentiles = summary['duration_percentiles']
+    col2.metric('Median duration', f"{percentiles[0.5]:.0f} s")
+    col3.metric('p95 duration', f"{percentiles[0.95]:.0f} s")
+    col4.metric('p99 duration', f"{percentiles[0.99]:.0f} s")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write('Top countries')
+        st.dataframe(summary['visits_per_country'].head(10).rename('Visits (upper bound)'))
+    with col2:
+        st.write('Top endpoints')
+        st.dataframe(summary['main_interests'].head(10).rename('Visits (upper bound)'))
+
+# Seconds between live-mode refreshes
+LIVE_REFRESH_SECONDS = 1
+
+# Tail follower shared by every session, so the file is read once per refresh
+@st.cache_resource
+def load_monitor(filename=log_store.LOG_FILE):
+    return live_tail.open_monitor(filename)
+
+# Reruns on its own every LIVE_REFRESH_SECONDS, reading only newly appended lines
+@st.experimental_fragment(run_every=LIVE_REFRESH_SECONDS)
+def display_live_metrics():
+    monitor = load_monitor()
+    with instrumentation.span('dashboard.live_poll'):
+        live_tail.poll(monitor)
+        live = live_tail.snapshot(monitor)
+
+    st.subheader(f'Live: last {monitor["window"]} seconds')
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric('Requests/sec', f"{live['requests_per_second']:.2f}")
+    col2.metric('Error rate', f"{live['error_rate']:.1%}")
+    col3.metric('p95 Duration', '-' if live['p95_duration'] is None else f"{live['p95_duration']:.0f} s")
+    col4.metric('Events', live['events'])
+
+    if not live['events']:
+        st.write("Waiting for new log lines...")
+        return
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write('Top endpoints')
+        st.bar_chart(pd.DataFrame(live['top_endpoints'], columns=['Endpoint', 'count']).set_index('Endpoint'))
+    with col2:
+        st.write('Share of requests by Status')
+        st.table(pd.DataFrame(list(live['status_rates'].items()), columns=['Status', 'Share']))
+    st.dataframe(pd.DataFrame(live['recent'][-20:], columns=log_store.LOG_COLUMNS))
+
+# Seconds between background job status polls
+JOB_POLL_SECONDS = 1
+
+# Progress of the jobs this session submitted; reruns on its own while any is active
+@st.experimental_fragment(run_every=JOB_POLL_SECONDS)
+def display_jobs():
+    submitted = st.session_state.get('jobs', [])
+    if not submitted:
+        return
+    finished = False
+    for job_id in submitted:
+        job = jobs.status(job_id)
+        if job is None:
+            continue
+        label = f"{job['kind'].capitalize()}: {job['message'] or job['status']}"
+        if job['status'] in jobs.ACTIVE_STATES:
+            st.progress(job['progress'], text=label)
+        elif job['status'] == 'failed':
+            st.error(f"{job['kind'].capitalize()} failed: {job['error']}")
+            finished = True
+        else:
+            st.success(f"{job['kind'].capitalize()} finished.")
+            finished = True
+    # Forget reported jobs; a finished one changed the data, so rerun the whole page to show it
+    st.session_state['jobs'] = [job_id for job_id in submitted
+                                if (jobs.status(job_id) or {}).get('status') in jobs.ACTIVE_STATES]
+    if finished:
+        st.rerun()
+
+def submit_job(kind, **params):
+    # Queue a background job and follow it in display_jobs
+    st.session_state.setdefault('jobs', []).append(jobs.submit(kind, **params))
 
 def display_dashboard():
-    logs, timestamp = load_data()
+    start, end = rendering.time_range_filter()
+    logs, timestamp = load_data(start, end)
 
     if not logs.empty:
         st.title('Web Server Log Analysis Dashboard')
@@ -77,14 +145,28 @@ def display_dashboard():
         # Display timestamp
         st.write(f"Data fetched at: {timestamp}")
 
+        # Live mode follows the file's tail instead of re-scanning it
+        if st.sidebar.toggle('Live mode'):
+            display_live_metrics()
+
+        # Heavy recomputation runs as background jobs; the page stays usable meanwhile
+        st.sidebar.header('Background jobs')
+        if st.sidebar.button('Rebuild rollup'):
+            submit_job('rollup')
+        if st.sidebar.button('Retrain model'):
+            submit_job('retrain')
+
         # Buttons
         col1, col2, col3, col4, col5 = st.columns(5)
         if col1.button("Generate Logs"):
-            log_entries = generate_logs()
-            save_logs_to_csv(log_entries)
-            st.success("Log files generated successfully.")
+            # Runs in the background; the job writer serializes and batches appends from every session
+            submit_job('generate', rows=200)
+        display_jobs()
+        # The button toggles a paginated view, so paging through it survives reruns
         if col2.button("View Logs"):
-            st.dataframe(logs)
+            st.session_state['view_logs'] = not st.session_state.get('view_logs', False)
+        if st.session_state.get('view_logs'):
+            rendering.display_table(logs, 'view_logs')
         if col3.button("Trim Logs"):
             logs = logs.head(10)
             st.write("Logs trimmed to the first 10 entries.")
@@ -108,23 +190,33 @@ def display_dashboard():
 
         # Filtering options
         st.sidebar.header('Filters')
-        countries = st.sidebar.multiselect('Select Countries', logs['Country'].unique())
-        sports_activities = st.sidebar.multiselect('Select Sports Activities', logs['Sports Activity'].unique())
-        endpoints = st.sidebar.multiselect('Select Endpoints', logs['Endpoint'].unique())
-        devices = st.sidebar.multiselect('Select Devices', logs['Device'].unique())
-        browsers = st.sidebar.multiselect('Select Browsers', logs['Browser'].unique())
-
-        filtered_logs = logs
-        if countries:
-            filtered_logs = filtered_logs[filtered_logs['Country'].isin(countries)]
-        if sports_activities:
-            filtered_logs = filtered_logs[filtered_logs['Sports Activity'].isin(sports_activities)]
-        if endpoints:
-            filtered_logs = filtered_logs[filtered_logs['Endpoint'].isin(endpoints)]
-        if devices:
-            filtered_logs = filtered_logs[filtered_logs['Device'].isin(devices)]
-        if browsers:
-            filtered_logs = filtered_logs[filtered_logs['Browser'].isin(browsers)]
+        # Filters and charts read the rollup cube, whose size does not grow with raw rows
+        instrumentation.cache_lookup('dashboard.rollup')
+        with instrumentation.span('dashboard.load_rollup'):
+            cube, index = load_rollup(log_store.version())
+        countries = st.sidebar.multiselect('Select Countries', cube['Country'].unique())
+        sports_activities = st.sidebar.multiselect('Select Sports Activities', cube['Sports Activity'].unique())
+        endpoints = st.sidebar.multiselect('Select Endpoints', cube['Endpoint'].unique())
+        devices = st.sidebar.multiselect('Select Devices', cube['Device'].unique())
+        browsers = st.sidebar.multiselect('Select Browsers', cube['Browser'].unique())
+
+        # Bitmap AND/OR over the cube's rows, cached per selection
+        filters = {
+            'Country': countries,
+            'Sports Activity': sports_activities,
+            'Endpoint': endpoints,
+            'Device': devices,
+            'Browser': browsers,
+        }
+        with instrumentation.span('dashboard.filter'):
+            mask = bitmap_index.select(index, filters)
+            if start is not None or end is not None:
+                # Cube rows are hourly buckets: keep those overlapping the time range
+                mask = mask & log_store.time_mask(cube[rollup.TIME_BUCKET], start.floor('h'), end)
+            filtered_cube = cube[mask]
+        # Charts are built once per store version and filter state
+        filter_key = (log_store.version(), str(start), str(end),
+                      tuple((name, tuple(sorted(values))) for name, values in filters.items()))
 
         # Display visualizations side by side
         st.header('')
@@ -132,27 +224,32 @@ def display_dashboard():
 
         with col1:
             st.subheader('Number of Visits per Country')
-            visits_per_country = filtered_logs['Country'].value_counts().reset_index()
-            visits_per_country.columns = ['Country', 'count']
-            chart = alt.Chart(visits_per_country).mark_bar().encode(
-                x='Country',
-                y='count',
-                color=alt.Color('Country', scale=alt.Scale(scheme='category20')),
-                tooltip=['Country', 'count']  # Add tooltip for interactivity
-            ).interactive()  # Make the chart interactive
-            st.altair_chart(chart, use_container_width=True)
+
+            def visits_per_country_chart():
+                # Top countries plus an 'Other' bar, so the payload stays bounded
+                visits_per_country = rendering.top_n_frame(rollup.count_by(filtered_cube, 'Country'), 'Country')
+                return alt.Chart(visits_per_country).mark_bar().encode(
+                    x=alt.X('Country', sort=None),
+                    y='count',
+                    color=alt.Color('Country', scale=alt.Scale(scheme='category20')),
+                    tooltip=['Country', 'count']  # Add tooltip for interactivity
+                ).interactive()  # Make the chart interactive
+            with instrumentation.span('dashboard.chart.visits_per_country'):
+                rendering.display_chart(('visits_per_country', filter_key), visits_per_country_chart)
 
         with col2:
             st.subheader('Main Interests based on Viewed Endpoints')
-            main_interests = filtered_logs['Endpoint'].value_counts().reset_index()
-            main_interests.columns = ['Endpoint', 'count']
-            chart = alt.Chart(main_interests).mark_bar().encode(
-                x='Endpoint',
-                y='count',
-                color=alt.Color('Endpoint', scale=alt.Scale(scheme='category20')),
-                tooltip=['Endpoint', 'count']  # Add tooltip for interactivity
-            ).interactive()  # Make the chart interactive
-            st.altair_chart(chart, use_container_width=True)       
+
+            def main_interests_chart():
+                main_interests = rendering.top_n_frame(rollup.count_by(filtered_cube, 'Endpoint'), 'Endpoint')
+                return alt.Chart(main_interests).mark_bar().encode(
+                    x=alt.X('Endpoint', sort=None),
+                    y='count',
+                    color=alt.Color('Endpoint', scale=alt.Scale(scheme='category20')),
+                    tooltip=['Endpoint', 'count']  # Add tooltip for interactivity
+                ).interactive()  # Make the chart interactive
+            with instrumentation.span('dashboard.chart.main_interests'):
+                rendering.display_chart(('main_interests', filter_key), main_interests_chart)
 
         # Total Visits by Device and Average Response Time by Browser
         st.header('')
@@ -160,42 +257,51 @@ def display_dashboard():
 
         with col1:
             st.subheader('Total Visits by Device')
-            visits_by_device = filtered_logs['Device'].value_counts()
-            fig1, ax1 = plt.subplots()
-            ax1.pie(visits_by_device, labels=visits_by_device.index, autopct='%1.1f%%', startangle=90)
-            ax1.legend(visits_by_device.index, loc="best", fontsize='small')
-            ax1.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-            st.pyplot(fig1)
+            # Rendered to PNG once per filter state instead of on every rerun
+            with instrumentation.span('dashboard.chart.visits_by_device'):
+                visits_by_device = rendering.top_n(rollup.count_by(filtered_cube, 'Device'))
+                rendering.display_pie(('visits_by_device', filter_key), visits_by_device)
 
         with col2:
             st.subheader('Average Response Time by Browser')
-            avg_response_time_by_browser = filtered_logs.groupby('Browser')['Duration'].mean().reset_index()
-            avg_response_time_by_browser.columns = ['Browser', 'Average Response Time']
-            chart = alt.Chart(avg_response_time_by_browser).mark_bar().encode(
-                y=alt.Y('Browser:N', sort='-x'),
-                x=alt.X('Average Response Time:Q'),
-                color=alt.Color('Browser:N', scale=alt.Scale(scheme='category20'))  # Different colors for each browser
-            )
-            st.altair_chart(chart, use_container_width=True)
+
+            def response_time_chart():
+                # Means do not add up into an 'Other' bar, so keep the busiest browsers only
+                stats = rollup.duration_stats_by(filtered_cube, 'Browser')
+                busiest = stats.sort_values('count', ascending=False).head(rendering.MAX_CATEGORIES)
+                avg_response_time_by_browser = busiest['mean'].reset_index()
+                avg_response_time_by_browser.columns = ['Browser', 'Average Response Time']
+                return alt.Chart(avg_response_time_by_browser).mark_bar().encode(
+                    y=alt.Y('Browser:N', sort='-x'),
+                    x=alt.X('Average Response Time:Q'),
+                    color=alt.Color('Browser:N', scale=alt.Scale(scheme='category20'))  # Different colors for each browser
+                )
+            with instrumentation.span('dashboard.chart.response_time_by_browser'):
+                rendering.display_chart(('response_time_by_browser', filter_key), response_time_chart)
+
+        if st.sidebar.toggle('Approximate mode', help="Unique visitors and duration percentiles from sketches"):
+            display_approximate_summary(start, end)
 
         # Visitors Access Analysis
         st.header('Visitors Access Analysis')
 
-        if 'Endpoint' in filtered_logs.columns:
-            endpoint = st.selectbox('Select Endpoint', filtered_logs['Endpoint'].unique())
+        if 'Endpoint' in filtered_cube.columns:
+            endpoint = st.selectbox('Select Endpoint', filtered_cube['Endpoint'].unique())
             
             if endpoint:
-                endpoint_data = filtered_logs[filtered_logs['Endpoint'] == endpoint]
+                endpoint_visits = int(filtered_cube.loc[filtered_cube['Endpoint'] == endpoint, 'count'].sum())
 
                 data = {
                     'Metric': ['Average Visits', 'Standard Deviation'],
-                    'Value': [endpoint_data.shape[0], endpoint_data.shape[0] ** 0.5]  # Using sample size for std dev approximation
+                    'Value': [endpoint_visits, endpoint_visits ** 0.5]  # Using sample size for std dev approximation
                 }
                 st.table(data)
             else:
                 st.write("Please select an endpoint.")
         else:
             st.write("Endpoint column not found.")
+    elif start is not None:
+        st.write("No logs in the selected time range.")
 
 # Running the Streamlit app
 if __name__ == "__main__":
@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+
+# Supported resampling intervals, in seconds
+INTERVAL_SECONDS = {'min': 60, 'h': 3600}
+
+# Lags (in intervals) used as features: the previous interval, same time yesterday and last week
+DEFAULT_LAGS = {'min': (1, 2, 60, 1440), 'h': (1, 2, 24, 168)}
+
+# Quantiles fitted for the forecast and its prediction interval
+QUANTILES = {'Lower': 0.1, 'Forecast': 0.5, 'Upper': 0.9}
+
+def request_counts(logs, interval='h'):
+    """
+    Resample logs into requests per interval.
+
+    Timestamps are bucketed with integer arithmetic and counted with one
+    bincount, so intervals without requests are kept as zeros.
+
+    Args:
+        logs (pd.DataFrame): Logs with a 'Timestamp' column.
+        interval (str): 'min' or 'h'.
+
+    Returns:
+        pd.Series: Request count per interval, indexed by interval start.
+    """
+    step = INTERVAL_SECONDS[interval]
+    epochs = logs['Timestamp'].to_numpy('datetime64[s]').astype(np.int64)
+    if len(epochs) == 0:
+        return pd.Series([], index=pd.DatetimeIndex([]), dtype=np.int64, name='Requests')
+    buckets = epochs // step
+    first = buckets.min()
+    counts = np.bincount(buckets - first)
+    index = pd.to_datetime((first + np.arange(len(counts))) * step, unit='s')
+    return pd.Series(counts, index=index, name='Requests')
+
+def _usable_lags(lags, length):
+    # Keep lags that still leave at least half the series for training
+    return tuple(lag for lag in lags if lag <= length // 2)
+
+def _features(index, history, lags):
+    # Seasonal calendar features plus the count `lag` intervals earlier
+    columns = {
+        'hour': index.hour.to_numpy(),
+        'day_of_week': index.dayofweek.to_numpy(),
+        'minute': index.minute.to_numpy(),
+    }
+    for lag in lags:
+        columns[f'lag_{lag}'] = history[len(history) - len(index) - lag:len(history) - lag]
+    return pd.DataFrame(columns)
+
+def fit_forecaster(counts, interval='h', lags=None):
+    """
+    Fit quantile gradient-boosting models of requests per interval.
+
+    Training works on the aggregated series (one row per interval), so a few
+    months of hourly counts fit in well under a second regardless of how many
+    raw log rows they summarize.
+
+    Args:
+        counts (pd.Series): Output of request_counts.
+        interval (str): The interval counts were resampled to.
+        lags (tuple): Lag features in intervals (defaults to DEFAULT_LAGS[interval]).
+
+    Returns:
+        dict: The forecaster, to be passed to forecast.
+    """
+    from sklearn.ensemble import HistGradientBoostingRegressor  # deferred: only fitting needs scikit-learn
+
+    lags = _usable_lags(DEFAULT_LAGS[interval] if lags is None else lags, len(counts))
+    history = counts.to_numpy(dtype=np.float64)
+    start = max(lags, default=0)
+    X = _features(counts.index[start:], history, lags)
+    y = history[start:]
+
+    models = {}
+    for name, quantile in QUANTILES.items():
+        model = HistGradientBoostingRegressor(
+            loss='quantile', quantile=quantile, max_iter=100, max_leaf_nodes=15,
+            min_samples_leaf=max(1, min(20, len(y) // 10)), random_state=0,
+        )
+        models[name] = model.fit(X, y) if len(y) else None
+    return {'interval': interval, 'lags': lags, 'models': models}
+
+def forecast(forecaster, counts, horizon=24):
+    """
+    Forecast requests for the intervals following the series.
+
+    Steps are predicted one at a time; the median forecast stands in for the
+    unknown counts that later steps use as lag features.
+
+    Args:
+        forecaster (dict): The forecaster returned by fit_forecaster.
+        counts (pd.Series): The series the forecast continues (usually the training series).
+        horizon (int): Number of intervals to forecast.
+
+    Returns:
+        pd.DataFrame: 'Forecast' with 'Lower'/'Upper' prediction interval
+        bounds per future interval (never below zero).
+    """
+    step = pd.Timedelta(seconds=INTERVAL_SECONDS[forecaster['interval']])
+    history = list(counts.to_numpy(dtype=np.float64))
+    index = pd.date_range(counts.index[-1] + step, periods=horizon, freq=step)
+    rows = {name: [] for name in QUANTILES}
+    for position in range(horizon):
+        X = _features(index[position:position + 1], np.asarray(history + [0.0]), forecaster['lags'])
+        for name, model in forecaster['models'].items():
+            rows[name].append(model.predict(X)[0] if model is not None else 0.0)
+        history.append(rows['Forecast'][-1])
+
+    result = pd.DataFrame(rows, index=index).clip(lower=0)
+    # Independently fitted quantiles can cross; keep the interval around the median
+    result['Lower'] = result[['Lower', 'Forecast']].min(axis=1)
+    result['Upper'] = result[['Upper', 'Forecast']].max(axis=1)
+    return result[['Forecast', 'Lower', 'Upper']]
+
+def peak_interval(prediction):
+    """
+    Return the forecast interval with the most expected requests.
+
+    Args:
+        prediction (pd.DataFrame): Output of forecast.
+
+    Returns:
+        tuple: (interval start, forecast row) of the peak.
+    """
+    peak = prediction['Forecast'].idxmax()
+    return peak, prediction.loc[peak]
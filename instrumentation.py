@@ -0,0 +1,193 @@
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Upper bounds (seconds) of the stage latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, math.inf)
+
+# Prefix of every exported Prometheus metric
+METRIC_PREFIX = 'funolympic'
+
+# Per-process registry: {stage name: histogram dict} and {cache name: counters}
+_spans = {}
+_caches = {}
+_lock = threading.Lock()
+
+def observe(name, seconds):
+    """
+    Record one timing of a stage.
+
+    Args:
+        name (str): The stage, e.g. 'dashboard.load_data'.
+        seconds (float): How long it took.
+    """
+    bucket = next(position for position, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound)
+    with _lock:
+        histogram = _spans.get(name)
+        if histogram is None:
+            histogram = _spans[name] = {'count': 0, 'sum': 0.0, 'buckets': [0] * len(LATENCY_BUCKETS)}
+        histogram['count'] += 1
+        histogram['sum'] += seconds
+        histogram['buckets'][bucket] += 1
+
+@contextmanager
+def span(name):
+    """
+    Time the enclosed block as one observation of a stage.
+
+    The block is recorded even when it raises.
+
+    Args:
+        name (str): The stage.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started)
+
+def timed(name):
+    """
+    Decorator recording every call of a function as a span.
+
+    Args:
+        name (str): The stage.
+    """
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def cache_lookup(name, hit=None):
+    """
+    Count one lookup in a cache.
+
+    Caches that know the outcome pass hit. For memoizing decorators such as
+    st.cache_data, count the lookup at the call site without hit and call
+    cache_miss from inside the cached function, which only runs on a miss.
+
+    Args:
+        name (str): The cache.
+        hit (bool): Whether the lookup was served from the cache, or None if
+            cache_miss reports misses separately.
+    """
+    with _lock:
+        counters = _caches.setdefault(name, {'lookups': 0, 'misses': 0})
+        counters['lookups'] += 1
+        if hit is False:
+            counters['misses'] += 1
+
+def cache_miss(name):
+    """
+    Count a miss of a lookup already counted with cache_lookup(name).
+
+    Args:
+        name (str): The cache.
+    """
+    with _lock:
+        _caches.setdefault(name, {'lookups': 0, 'misses': 0})['misses'] += 1
+
+def snapshot():
+    """
+    Copy the metrics recorded so far in this process.
+
+    Returns:
+        dict: 'buckets' (histogram upper bounds), 'spans' (stage -> {'count',
+        'sum', 'buckets'}) and 'caches' (cache -> {'hits', 'misses'}).
+    """
+    with _lock:
+        spans = {name: {**histogram, 'buckets': list(histogram['buckets'])} for name, histogram in _spans.items()}
+        caches = {name: {'hits': max(counters['lookups'] - counters['misses'], 0), 'misses': counters['misses']}
+                  for name, counters in _caches.items()}
+    return {'buckets': list(LATENCY_BUCKETS), 'spans': spans, 'caches': caches}
+
+def reset():
+    """
+    Forget every recorded span and cache count.
+    """
+    with _lock:
+        _spans.clear()
+        _caches.clear()
+
+def quantile(histogram, fraction, buckets=LATENCY_BUCKETS):
+    """
+    Estimate a latency quantile from a histogram.
+
+    Args:
+        histogram (dict): A span from snapshot.
+        fraction (float): Quantile in [0, 1].
+        buckets (tuple): The histogram's upper bounds.
+
+    Returns:
+        float: Upper bound of the bucket holding the quantile (inf for the
+        open last bucket), or None for an empty histogram.
+    """
+    if not histogram['count']:
+        return None
+    rank = fraction * histogram['count']
+    seen = 0
+    for bound, count in zip(buckets, histogram['buckets']):
+        seen += count
+        if seen >= rank:
+            return bound
+    return buckets[-1]
+
+def to_json(metrics=None):
+    """
+    Serialize metrics as JSON.
+
+    Args:
+        metrics (dict): Output of snapshot (a fresh snapshot if None).
+
+    Returns:
+        str: The metrics, with the open bucket bound written as "+Inf".
+    """
+    metrics = snapshot() if metrics is None else metrics
+    return json.dumps({**metrics, 'buckets': [_bound(bound) for bound in metrics['buckets']]}, indent=2)
+
+def _bound(bound):
+    return '+Inf' if bound == math.inf else repr(float(bound))
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def to_prometheus(metrics=None):
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Spans become the histogram <prefix>_stage_seconds labelled by stage, and
+    cache counts the counter <prefix>_cache_lookups_total labelled by cache
+    and result.
+
+    Args:
+        metrics (dict): Output of snapshot (a fresh snapshot if None).
+
+    Returns:
+        str: The exposition text.
+    """
+    metrics = snapshot() if metrics is None else metrics
+    histogram_name = f'{METRIC_PREFIX}_stage_seconds'
+    lines = [f'# HELP {histogram_name} Time spent per instrumented stage.',
+             f'# TYPE {histogram_name} histogram']
+    for name, histogram in sorted(metrics['spans'].items()):
+        stage = _label(name)
+        cumulative = 0
+        for bound, count in zip(metrics['buckets'], histogram['buckets']):
+            cumulative += count
+            lines.append(f'{histogram_name}_bucket{{stage="{stage}",le="{_bound(bound)}"}} {cumulative}')
+        lines.append(f'{histogram_name}_sum{{stage="{stage}"}} {histogram["sum"]!r}')
+        lines.append(f'{histogram_name}_count{{stage="{stage}"}} {histogram["count"]}')
+
+    counter_name = f'{METRIC_PREFIX}_cache_lookups_total'
+    lines += [f'# HELP {counter_name} Cache lookups by outcome.',
+              f'# TYPE {counter_name} counter']
+    for name, counters in sorted(metrics['caches'].items()):
+        for result, key in (('hit', 'hits'), ('miss', 'misses')):
+            lines.append(f'{counter_name}{{cache="{_label(name)}",result="{result}"}} {counters[key]}')
+    return '\n'.join(lines) + '\n'
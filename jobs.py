@@ -0,0 +1,333 @@
+import inspect
+import json
+import os
+import queue
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import instrumentation
+import log_store
+import web_server_logs
+
+# Threads running jobs. Their heavy steps run in Arrow, numpy and pandas code or in
+# worker processes of their own (e.g. shard aggregation), so sessions stay responsive
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+
+# Job status files, shared by every process (Streamlit server, API workers): JOB_DIR/<id>.json
+JOB_DIR = os.getenv('JOB_DIR', '.jobs')
+
+# Finished jobs kept for status polling; older ones are forgotten first
+MAX_FINISHED_JOBS = 100
+
+# Rows generated per chunk, the unit of progress and of batched writes
+GENERATE_CHUNK_ROWS = 50_000
+
+ACTIVE_STATES = ('queued', 'running')
+
+# Jobs this process is running or has queued: {job id: job dict}; finished ones live in JOB_DIR only
+_jobs = {}
+_lock = threading.Lock()
+_executor = None
+
+# Appends waiting for the writer thread: (target, table, completion)
+_writes = queue.Queue()
+_writer = None
+
+def _now():
+    return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _job_path(job_id):
+    return os.path.join(JOB_DIR, job_id + '.json')
+
+def _save(job):
+    os.makedirs(JOB_DIR, exist_ok=True)
+    path = _job_path(job['id'])
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as file:
+        json.dump(job, file, default=str)
+    os.replace(tmp, path)
+
+def _update(job, **fields):
+    with _lock:
+        job.update(fields)
+        _save(job)
+
+def _alive(pid):
+    if os.name != 'posix':
+        return True  # signal 0 would terminate the process on Windows
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def _load(job_id):
+    if not re.fullmatch('[0-9a-f]{32}', job_id):
+        return None
+    try:
+        with open(_job_path(job_id), encoding='utf-8') as file:
+            job = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if job['status'] in ACTIVE_STATES and job['pid'] != os.getpid() and not _alive(job['pid']):
+        job.update(status='failed', error="The process running the job exited.")
+    return job
+
+def progress(job, fraction, message=None):
+    """
+    Report how far a running job has come.
+
+    Args:
+        job (dict): The job passed to the job function.
+        fraction (float): Share of the work done, in [0, 1].
+        message (str): What it is doing, shown next to the progress.
+    """
+    _update(job, progress=min(max(float(fraction), 0.0), 1.0), **({'message': message} if message else {}))
+
+def _write_loop():
+    while True:
+        pending = [_writes.get()]
+        # Everything queued meanwhile goes out in the same write, one per target
+        while True:
+            try:
+                pending.append(_writes.get_nowait())
+            except queue.Empty:
+                break
+        targets = {}
+        for target, table, completion in pending:
+            targets.setdefault(target, []).append((table, completion))
+        for (filename, partitioned), items in targets.items():
+            error = None
+            try:
+                with instrumentation.span('jobs.write'):
+                    web_server_logs.write_tables(filename, [table for table, _ in items], partitioned=partitioned)
+            except Exception as exc:  # reported to every waiting job; the writer itself keeps running
+                error = exc
+            for _, completion in items:
+                completion['error'] = error
+                completion['done'].set()
+
+def append(table, filename=log_store.LOG_FILE, partitioned=False):
+    """
+    Append log rows through the process's single writer thread.
+
+    Appends from every job are serialized, and those queued while a write
+    is in progress are batched into the next one. Each write holds the
+    log's file lock, so other processes never interleave with it either.
+
+    Args:
+        table (pa.Table): Rows typed according to log_store.LOG_SCHEMA.
+        filename (str): The log CSV file or partitioned dataset root.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at filename.
+
+    Raises:
+        OSError: If the write failed (or whatever error the writer hit).
+    """
+    global _writer
+    completion = {'done': threading.Event(), 'error': None}
+    with _lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_write_loop, name='log-writer', daemon=True)
+            _writer.start()
+    _writes.put(((filename, partitioned), table, completion))
+    completion['done'].wait()
+    if completion['error'] is not None:
+        raise completion['error']
+
+def _target(filename):
+    if log_store.is_sharded(filename):
+        raise ValueError("Pass a single log file to write to, not several shards.")
+    return filename
+
+def generate(job, rows=200, filename=log_store.LOG_FILE, seed=None, partitioned=False):
+    """
+    Generate synthetic log entries and append them to the log.
+
+    Args:
+        job (dict): The running job.
+        rows (int): Entries to generate.
+        filename (str): The log CSV file or partitioned dataset root.
+        seed (int): Optional seed for reproducible logs.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at filename.
+
+    Returns:
+        dict: 'rows' written.
+    """
+    filename = _target(filename)
+    written = 0
+    for table in web_server_logs.generate_log_chunks(rows, chunk_size=GENERATE_CHUNK_ROWS, seed=seed):
+        append(table, filename, partitioned)
+        written += table.num_rows
+        progress(job, written / rows, f"{written:,} of {rows:,} rows written")
+    return {'rows': written}
+
+def ingest(job, source, filename=log_store.LOG_FILE, log_format=None, processes=1, partitioned=False):
+    """
+    Parse an access log (see log_parsers) and append its requests to the log.
+
+    Args:
+        job (dict): The running job.
+        source (str): The log file to ingest, plain or gzip-compressed.
+        filename (str): The log CSV file or partitioned dataset root.
+        log_format (str): One of log_parsers.FORMATS (detected if None).
+        processes (int): Parser worker processes.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at filename.
+
+    Returns:
+        dict: 'rows' written and 'skipped' malformed lines.
+    """
+    import log_parsers
+    filename = _target(filename)
+    counts = {'rows': 0, 'skipped': 0}
+    for table, skipped in log_parsers.parse_batches(source, log_format, processes):
+        if table.num_rows:
+            append(table, filename, partitioned)
+        counts['rows'] += table.num_rows
+        counts['skipped'] += skipped
+        # The row count is unknown up front, so progress is reported in the message only
+        progress(job, 0.0, f"{counts['rows']:,} rows ingested")
+    return counts
+
+def rollup(job, source=log_store.LOG_FILE):
+    """
+    Rebuild the dashboard's rollup cube into the persistent result cache.
+
+    Args:
+        job (dict): The running job.
+        source (str or list): The log source, see log_store.shards.
+
+    Returns:
+        dict: 'cells' in the cube.
+    """
+    import logs_analysis
+    progress(job, 0.0, "Loading logs")
+    cube = logs_analysis.cached_rollup(source)
+    return {'cells': len(cube)}
+
+def retrain(job, source=log_store.LOG_FILE):
+    """
+    Bring the persisted duration-by-hour model up to date with the logs.
+
+    Args:
+        job (dict): The running job.
+        source (str or list): The log source, see log_store.shards.
+
+    Returns:
+        dict: 'rows' the model covers and its 'mse'.
+    """
+    import model_registry
+    progress(job, 0.0, "Loading logs")
+    data = log_store.load_logs(source)
+    progress(job, 0.5, "Training")
+    entry = model_registry.update(data, log_store.identity(source))
+    return {'rows': entry['rows'], 'mse': float(entry['mse'])}
+
+# Job kind -> function(job, **params) returning a JSON-serializable result
+JOB_KINDS = {
+    'generate': generate,
+    'ingest': ingest,
+    'rollup': rollup,
+    'retrain': retrain,
+}
+
+def _run(job):
+    _update(job, status='running', started=_now())
+    try:
+        with instrumentation.span(f"jobs.{job['kind']}"):
+            result = JOB_KINDS[job['kind']](job, **job['params'])
+    except Exception as error:  # any failure is the job's outcome, reported through its status
+        _update(job, status='failed', error=f"{type(error).__name__}: {error}", finished=_now())
+    else:
+        _update(job, status='done', progress=1.0, result=result, finished=_now())
+    with _lock:
+        del _jobs[job['id']]
+
+def _forget_finished():
+    finished = [job for job in list_jobs() if job['status'] not in ACTIVE_STATES]
+    for job in finished[MAX_FINISHED_JOBS:]:
+        try:
+            os.remove(_job_path(job['id']))
+        except OSError:
+            pass
+
+def submit(kind, **params):
+    """
+    Queue a job for the background workers.
+
+    Args:
+        kind (str): One of JOB_KINDS.
+        **params: Keyword arguments of the job function.
+
+    Returns:
+        str: The job id, for status.
+
+    Raises:
+        ValueError: If the kind is unknown or the parameters do not fit it.
+    """
+    global _executor
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job kind {kind!r}; expected one of {', '.join(JOB_KINDS)}.")
+    try:
+        inspect.signature(JOB_KINDS[kind]).bind(None, **params)
+    except TypeError as error:
+        raise ValueError(f"Invalid parameters for {kind}: {error}") from None
+
+    job = {
+        'id': uuid.uuid4().hex, 'kind': kind, 'params': params, 'status': 'queued',
+        'progress': 0.0, 'message': None, 'result': None, 'error': None,
+        'submitted': _now(), 'started': None, 'finished': None, 'pid': os.getpid(),
+    }
+    _forget_finished()
+    with _lock:
+        _jobs[job['id']] = job
+        _save(job)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(JOB_WORKERS, thread_name_prefix='job')
+    _executor.submit(_run, job)
+    return job['id']
+
+def status(job_id):
+    """
+    Return a snapshot of a job.
+
+    Jobs submitted by other processes (e.g. another API worker) are read
+    from their status file; one whose process has exited while it was
+    queued or running is reported as failed.
+
+    Args:
+        job_id (str): The id returned by submit.
+
+    Returns:
+        dict or None: Copy of the job ('id', 'kind', 'params', 'status' (queued,
+        running, done or failed), 'progress', 'message', 'result', 'error',
+        the 'submitted'/'started'/'finished' times and the running 'pid'),
+        or None if unknown.
+    """
+    with _lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            return dict(job)
+    return _load(job_id)
+
+def list_jobs(active_only=False):
+    """
+    Return snapshots of the jobs of every process, newest first.
+
+    Args:
+        active_only (bool): Only queued and running jobs.
+
+    Returns:
+        list: Job dicts, as status returns.
+    """
+    try:
+        names = os.listdir(JOB_DIR)
+    except FileNotFoundError:
+        return []
+    found = (status(name[:-len('.json')]) for name in names if name.endswith('.json'))
+    found = [job for job in found if job is not None and (not active_only or job['status'] in ACTIVE_STATES)]
+    return sorted(found, key=lambda job: job['submitted'], reverse=True)
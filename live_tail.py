@@ -0,0 +1,179 @@
+import csv
+import os
+import time
+from collections import Counter, deque
+from threading import Lock
+
+import log_store
+
+# Length of the rolling window, in one-second slots
+WINDOW_SECONDS = 60
+
+# Most recent events kept for display
+RECENT_EVENTS = 1000
+
+# Fixed Duration histogram: DURATION_BIN_SECONDS wide bins, the last one open-ended
+DURATION_BIN_SECONDS = 10
+DURATION_BINS = 181
+
+# Upper bound on bytes read per poll, so a burst is caught up over a few refreshes
+MAX_POLL_BYTES = 8 * 1024 * 1024
+
+def open_monitor(filename=log_store.LOG_FILE, from_start=False, window=WINDOW_SECONDS):
+    """
+    Start following an append-only log file, or every shard of a log.
+
+    Args:
+        filename (str or list): The log CSV file, or a glob or list of shard CSVs (resolved now).
+        from_start (bool): Replay the existing lines instead of only new ones.
+        window (int): Rolling window length in seconds.
+
+    Returns:
+        dict: The monitor, to be passed to poll and snapshot.
+    """
+    monitor = {
+        'tails': [{'filename': path, 'inode': None, 'offset': 0, 'partial': b''}
+                  for path in log_store.shards(filename)],
+        'recent': deque(maxlen=RECENT_EVENTS),
+        'window': window,
+        'second': int(time.time()),
+        'slots': [None] * window,
+        'totals': _empty_counters(),
+        'lock': Lock(),
+    }
+    if not from_start:
+        for tail in monitor['tails']:
+            try:
+                stat = os.stat(tail['filename'])
+                tail.update(inode=stat.st_ino, offset=stat.st_size)
+            except FileNotFoundError:
+                pass
+    return monitor
+
+def _empty_counters():
+    return {'count': 0, 'statuses': Counter(), 'endpoints': Counter(), 'durations': [0] * DURATION_BINS}
+
+def _read_lines(tail):
+    # Return the complete lines appended since the last read; start over if the file was rotated or truncated
+    try:
+        stat = os.stat(tail['filename'])
+    except FileNotFoundError:
+        return []
+    if stat.st_ino != tail['inode'] or stat.st_size < tail['offset']:
+        tail.update(inode=stat.st_ino, offset=0, partial=b'')
+    if stat.st_size == tail['offset']:
+        return []
+
+    with open(tail['filename'], 'rb') as file:
+        file.seek(tail['offset'])
+        data = file.read(min(stat.st_size - tail['offset'], MAX_POLL_BYTES))
+    tail['offset'] += len(data)
+    data = tail['partial'] + data
+    end = data.rfind(b'\n') + 1
+    tail['partial'] = data[end:]
+    return data[:end].decode('utf-8', errors='replace').splitlines()
+
+def _parse(lines):
+    for row in csv.reader(lines):
+        if len(row) != len(log_store.LOG_COLUMNS) or row[0] == 'Timestamp':
+            continue  # header or malformed line
+        try:
+            row[4] = int(row[4])
+            row[9] = float(row[9])
+        except ValueError:
+            continue
+        yield tuple(row)
+
+def _advance(monitor, second):
+    # Expire the slots that fell out of the window; each slot is cleared once, so this is O(1) per second
+    window = monitor['window']
+    totals = monitor['totals']
+    for expired in range(max(monitor['second'] + 1, second - window + 1), second + 1):
+        slot = monitor['slots'][expired % window]
+        monitor['slots'][expired % window] = None
+        if slot is None:
+            continue
+        totals['count'] -= slot['count']
+        # In-place Counter difference drops keys that reach 0, so totals only hold what is in the window
+        totals['statuses'] -= slot['statuses']
+        totals['endpoints'] -= slot['endpoints']
+        for position, count in slot['durations'].items():
+            totals['durations'][position] -= count
+    monitor['second'] = max(monitor['second'], second)
+
+def _add_event(monitor, event):
+    second = monitor['second']
+    slot = monitor['slots'][second % monitor['window']]
+    if slot is None:
+        slot = {'count': 0, 'statuses': Counter(), 'endpoints': Counter(), 'durations': Counter()}
+        monitor['slots'][second % monitor['window']] = slot
+    position = min(max(int(event[9] // DURATION_BIN_SECONDS), 0), DURATION_BINS - 1)
+    totals = monitor['totals']
+    for counters in (slot, totals):
+        counters['count'] += 1
+        counters['statuses'][event[4]] += 1
+        counters['endpoints'][event[3]] += 1
+        counters['durations'][position] += 1
+
+def poll(monitor, now=None):
+    """
+    Ingest the lines appended since the last poll.
+
+    New events are stamped with the current second, pushed onto the recent
+    events buffer and counted into the rolling window, each in constant time.
+
+    Args:
+        monitor (dict): The monitor returned by open_monitor.
+        now (float): Current time in epoch seconds (defaults to time.time()).
+
+    Returns:
+        int: The number of new events.
+    """
+    with monitor['lock']:
+        _advance(monitor, int(time.time() if now is None else now))
+        added = 0
+        for event in _parse(line for tail in monitor['tails'] for line in _read_lines(tail)):
+            monitor['recent'].append(event)
+            _add_event(monitor, event)
+            added += 1
+        return added
+
+def _percentile(histogram, count, fraction):
+    # Upper edge of the bin holding the requested rank
+    rank = fraction * count
+    seen = 0
+    for position, bin_count in enumerate(histogram):
+        seen += bin_count
+        if seen >= rank:
+            return float((position + 1) * DURATION_BIN_SECONDS)
+    return float(DURATION_BINS * DURATION_BIN_SECONDS)
+
+def snapshot(monitor, top_k=5, now=None):
+    """
+    Summarize the rolling window.
+
+    Args:
+        monitor (dict): The monitor returned by open_monitor.
+        top_k (int): Number of endpoints to report.
+        now (float): Current time in epoch seconds (defaults to time.time()).
+
+    Returns:
+        dict: 'events' in the window, 'requests_per_second', 'error_rate'
+        (share of 4xx/5xx), 'status_rates' (share per Status), 'top_endpoints'
+        ((endpoint, count) pairs), 'p95_duration' (seconds, bin resolution or
+        None) and 'recent' (latest events, newest last).
+    """
+    with monitor['lock']:
+        _advance(monitor, int(time.time() if now is None else now))
+        totals = monitor['totals']
+        count = totals['count']
+        statuses = {status: n for status, n in totals['statuses'].items() if n > 0}
+        return {
+            'events': count,
+            'requests_per_second': count / monitor['window'],
+            'error_rate': sum(n for status, n in statuses.items() if status >= 400) / count if count else 0.0,
+            'status_rates': {status: n / count for status, n in sorted(statuses.items())},
+            'top_endpoints': [(endpoint, n) for endpoint, n in totals['endpoints'].most_common(top_k) if n > 0],
+            'p95_duration': _percentile(totals['durations'], count, 0.95) if count else None,
+            'recent': list(monitor['recent']),
+        }
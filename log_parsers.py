@@ -0,0 +1,489 @@
+import argparse
+import gzip
+import io
+import json
+import math
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import log_store
+import sessions
+from web_server_logs import write_tables
+
+# Supported input formats: Apache/Nginx combined access logs, JSON lines, and the project's own CSV
+FORMATS = ('combined', 'jsonl', 'csv')
+
+# Bytes of (decompressed) input parsed per batch; each batch becomes one table
+DEFAULT_BATCH_BYTES = 16 * 1024 * 1024
+
+# Batches handed to each worker process ahead of the one being collected
+PREFETCH_PER_PROCESS = 2
+
+# Distinct user agents whose classification is remembered
+UA_CACHE_SIZE = 65536
+
+# Value of the columns access logs do not carry (Country is resolved later from the address)
+UNKNOWN = 'Unknown'
+
+# JSON field names accepted for each column, in order of preference
+JSON_FIELDS = {
+    'Timestamp': ('Timestamp', 'timestamp', 'time', '@timestamp', 'time_iso8601', 'time_local', 'ts'),
+    'IP Address': ('IP Address', 'remote_addr', 'client_ip', 'ip', 'remote_ip', 'host'),
+    'Method': ('Method', 'method', 'request_method'),
+    'Endpoint': ('Endpoint', 'path', 'uri', 'request_uri', 'url'),
+    'Status': ('Status', 'status', 'status_code'),
+    'User Agent': ('user_agent', 'http_user_agent', 'userAgent', 'agent'),
+    'Response Time': ('response_time', 'request_time', 'duration'),
+    'Request': ('request',),
+}
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'), start=1)}
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def classify_user_agent(user_agent):
+    """
+    Derive the device type and browser from a User-Agent header.
+
+    Substring tests in a fixed order, no regular expressions; results are
+    memoized since real traffic repeats a small set of agents.
+
+    Args:
+        user_agent (str): The User-Agent header ('' or '-' when absent).
+
+    Returns:
+        tuple: (device, browser), device one of 'Desktop', 'Mobile',
+        'Tablet' or 'Bot', browser one of 'Edge', 'Firefox', 'Chrome',
+        'Safari' or 'Other'.
+    """
+    agent = user_agent.lower()
+    if 'bot' in agent or 'spider' in agent or 'crawl' in agent:
+        device = 'Bot'
+    elif 'ipad' in agent or 'tablet' in agent or ('android' in agent and 'mobile' not in agent):
+        device = 'Tablet'
+    elif 'mobi' in agent or 'iphone' in agent or 'android' in agent:
+        device = 'Mobile'
+    else:
+        device = 'Desktop'
+
+    # Edge and Chrome also announce Chrome/Safari, and Chrome announces Safari: test the specific ones first
+    if 'edg/' in agent or 'edge/' in agent or 'edga/' in agent or 'edgios/' in agent:
+        browser = 'Edge'
+    elif 'firefox/' in agent or 'fxios/' in agent:
+        browser = 'Firefox'
+    elif 'opr/' in agent or 'opera' in agent:
+        browser = 'Other'
+    elif 'chrome/' in agent or 'crios/' in agent or 'chromium/' in agent:
+        browser = 'Chrome'
+    elif 'safari/' in agent:
+        browser = 'Safari'
+    else:
+        browser = 'Other'
+    return device, browser
+
+@lru_cache(maxsize=4096)
+def _day_epoch(day):
+    # '10/Oct/2000' -> epoch seconds of that midnight (UTC)
+    day_of_month, month, year = day.split('/')
+    return (date(int(year), _MONTHS[month], int(day_of_month)).toordinal() - _EPOCH_ORDINAL) * 86400
+
+@lru_cache(maxsize=4096)
+def _clf_epoch(when):
+    # '10/Oct/2000:13:55:36 -0700' (common log format time) -> UTC epoch seconds; busy servers repeat each second
+    epoch = _day_epoch(when[:11]) + int(when[12:14]) * 3600 + int(when[15:17]) * 60 + int(when[18:20])
+    zone = when[21:26]
+    if zone:
+        offset = int(zone[1:3]) * 3600 + int(zone[3:5]) * 60
+        epoch += offset if zone[0] == '-' else -offset
+    return epoch
+
+def _epoch(value):
+    # JSON timestamps: epoch seconds/milliseconds, common log format, or ISO 8601 (naive means UTC)
+    if isinstance(value, (int, float)):
+        return int(value / 1000 if value > 1e11 else value)
+    if len(value) > 20 and value[2] == '/':
+        return _clf_epoch(value)
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+def _split_request(request):
+    # 'GET /path?query HTTP/1.1' -> ('GET', '/path'); anything else keeps the raw text as the endpoint
+    parts = request.split(' ')
+    if len(parts) == 3:
+        return parts[0], parts[1].partition('?')[0]
+    return '-', request
+
+def parse_combined_line(line):
+    """
+    Parse one Apache/Nginx combined (or common) log format line.
+
+    host ident user [time] "request" status bytes "referer" "agent" [duration]
+
+    The line is cut at its brackets and quotes with str methods rather than a
+    regular expression. A numeric last field after the user agent, such as
+    nginx's $request_time or Apache's %T, is taken as the response time in seconds.
+
+    Args:
+        line (str): The log line.
+
+    Returns:
+        tuple: (ip, epoch seconds, method, endpoint, status, user agent,
+        response time or NaN), or None for a malformed line.
+    """
+    host, _, rest = line.partition(' ')
+    opening = rest.find('[')
+    closing = rest.find(']', opening)
+    if opening < 0 or closing < 0 or rest[closing + 2:closing + 3] != '"':
+        return None
+    when = rest[opening + 1:closing]
+    rest = rest[closing + 3:]
+    if '\\"' in rest:
+        rest = rest.replace('\\"', "'")  # Apache escapes quotes inside quoted fields
+    request, _, rest = rest.partition('"')
+    status, _, rest = rest.strip().partition(' ')
+    # rest: 'bytes "referer" "agent" extra' -> ['bytes ', referer, ' ', agent, ' extra']
+    quoted = rest.split('"')
+    agent = quoted[3] if len(quoted) > 3 else ''
+    extra = quoted[4].split() if len(quoted) > 4 else []
+    try:
+        response_time = float(extra[-1]) if extra else math.nan
+    except ValueError:
+        response_time = math.nan
+    try:
+        method, endpoint = _split_request(request)
+        return host, _clf_epoch(when), method, endpoint, int(status), agent, response_time
+    except (ValueError, KeyError, IndexError):
+        return None
+
+def _field(record, column):
+    for name in JSON_FIELDS[column]:
+        value = record.get(name)
+        if value is not None:
+            return value
+    return None
+
+def parse_json_line(line):
+    """
+    Parse one JSON-lines log record.
+
+    Field names are matched against JSON_FIELDS, which covers this project's
+    columns and common nginx/ingress json log_format names. A 'request'
+    field ('GET /path HTTP/1.1') fills Method and Endpoint when they are
+    missing.
+
+    Args:
+        line (str): The JSON object.
+
+    Returns:
+        tuple: Same as parse_combined_line, or None for a malformed record.
+    """
+    try:
+        record = json.loads(line)
+        method, endpoint = _field(record, 'Method'), _field(record, 'Endpoint')
+        if method is None or endpoint is None:
+            request = _field(record, 'Request')
+            if request is not None:
+                method, endpoint = _split_request(request)
+        response_time = _field(record, 'Response Time')
+        return (
+            str(_field(record, 'IP Address') or '-'),
+            _epoch(_field(record, 'Timestamp')),
+            str(method or '-'),
+            str(endpoint or '-').partition('?')[0],
+            int(_field(record, 'Status')),
+            str(_field(record, 'User Agent') or ''),
+            float(response_time) if response_time not in (None, '', '-') else math.nan,
+        )
+    except (ValueError, TypeError, KeyError, IndexError, AttributeError):
+        return None
+
+# Line parser per format; register new formats here
+PARSERS = {
+    'combined': parse_combined_line,
+    'jsonl': parse_json_line,
+}
+
+def _dictionary(values):
+    return pa.array(values, pa.string()).dictionary_encode()
+
+def _constant(value, num_rows):
+    return pa.DictionaryArray.from_arrays(pa.array(np.zeros(num_rows, dtype=np.int32)), pa.array([value]))
+
+def parse_lines(data, log_format, header=False):
+    """
+    Parse a batch of complete log lines into a log table.
+
+    Country and Sports Activity are set to UNKNOWN. Duration is the dwell
+    time, as in generated logs: the gap to the same client's next request in
+    the batch, 0 for the last one in its session (parse_batches carries it
+    across batches). The log schema has no column for the response time the
+    line parsers return, so it is not kept.
+
+    Args:
+        data (bytes): Newline-terminated lines.
+        log_format (str): One of FORMATS.
+        header (bool): For 'csv', whether data starts with the header row.
+
+    Returns:
+        tuple: (pa.Table typed according to log_store.LOG_SCHEMA, number of skipped lines).
+    """
+    if log_format == 'csv':
+        return log_store.read_csv_table(io.BytesIO(data), header=header), 0
+
+    parse = PARSERS[log_format]
+    rows = []
+    skipped = 0
+    for line in data.decode('utf-8', errors='replace').splitlines():
+        if not line.strip():
+            continue
+        row = parse(line)
+        if row is None:
+            skipped += 1
+        else:
+            rows.append(row)
+    if not rows:
+        return log_store.LOG_SCHEMA.empty_table(), skipped
+
+    ips, epochs, methods, endpoints, statuses, agents, _ = zip(*rows)
+    devices, browsers = zip(*(classify_user_agent(agent) for agent in agents))
+    epochs = np.fromiter(epochs, dtype=np.int64, count=len(rows))
+    durations = sessions.dwell_times(pd.factorize(np.asarray(ips, dtype=object))[0], epochs)
+
+    table = pa.table({
+        'Timestamp': pa.array(epochs, pa.timestamp('s')),
+        'IP Address': pa.array(ips, pa.string()),
+        'Method': _dictionary(methods),
+        'Endpoint': _dictionary(endpoints),
+        'Status': pa.array(statuses, pa.int64()),
+        'Country': _constant(UNKNOWN, len(rows)),
+        'Sports Activity': _constant(UNKNOWN, len(rows)),
+        'Device': _dictionary(devices),
+        'Browser': _dictionary(browsers),
+        'Duration': pa.array(durations, pa.float64()),
+    })
+    return table.select(log_store.LOG_COLUMNS).cast(log_store.LOG_SCHEMA), skipped
+
+def is_gzip(filename):
+    """
+    Tell whether a file is gzip-compressed, from its magic number.
+    """
+    with open(filename, 'rb') as file:
+        return file.read(2) == b'\x1f\x8b'
+
+def open_log(filename):
+    """
+    Open a log file for binary reading, decompressing gzip on the fly.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+
+    Returns:
+        file-like: A binary stream of the (decompressed) log.
+    """
+    return gzip.open(filename, 'rb') if is_gzip(filename) else open(filename, 'rb')
+
+def detect_format(filename):
+    """
+    Guess the format of a log file from its first non-empty line.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+
+    Returns:
+        str: One of FORMATS.
+    """
+    with open_log(filename) as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(b'{'):
+                return 'jsonl'
+            if [name.strip('"') for name in line.decode('utf-8', errors='replace').split(',')] == log_store.LOG_COLUMNS:
+                return 'csv'
+            return 'combined'
+    return 'combined'
+
+def iter_batches(filename, batch_bytes=DEFAULT_BATCH_BYTES):
+    """
+    Stream a log file as line-aligned blocks of bytes.
+
+    gzip input is decompressed incrementally, so memory stays bounded by
+    batch_bytes however large the file is.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+        batch_bytes (int): Approximate size of each block.
+
+    Yields:
+        bytes: Consecutive blocks of complete lines.
+    """
+    partial = b''
+    with open_log(filename) as file:
+        while True:
+            data = file.read(batch_bytes)
+            if not data:
+                break
+            data = partial + data
+            end = data.rfind(b'\n') + 1
+            partial = data[end:]
+            if end:
+                yield data[:end]
+    if partial:
+        yield partial + b'\n'
+
+def _parse_range(filename, start, end, log_format):
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        return parse_lines(file.read(end - start), log_format)
+
+def _ordered(pool, function, argument_lists, window):
+    # Like pool.map, but submits at most window tasks ahead, so a long stream is never fully queued
+    pending = deque()
+    for arguments in argument_lists:
+        pending.append(pool.submit(function, *arguments))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def _carry_dwell(batches, timeout=sessions.SESSION_TIMEOUT):
+    # Each client's latest request is held back until its dwell time is known: its next
+    # request turns up in a later batch, or the log has moved on past the session timeout
+    held = log_store.LOG_SCHEMA.empty_table()
+    for table, skipped in batches:
+        table = pa.concat_tables([held, table]).unify_dictionaries().combine_chunks()
+        if table.num_rows == 0:
+            yield table, skipped
+            continue
+        epochs = table['Timestamp'].cast(pa.int64()).to_numpy()
+        codes, _ = pd.factorize(table['IP Address'].to_numpy())
+        dwell = sessions.dwell_times(codes, epochs, timeout)
+        order = np.lexsort((epochs, codes))
+        latest = np.zeros(len(codes), dtype=bool)
+        latest[order[np.append(codes[order][1:] != codes[order][:-1], True)]] = True
+        hold = latest & (epochs.max() - epochs <= timeout)
+        column = table.schema.get_field_index('Duration')
+        table = table.set_column(column, table.schema.field(column), pa.array(dwell, table.schema.field(column).type))
+        held = table.filter(pa.array(hold))
+        yield table.filter(pa.array(~hold)), skipped
+    if held.num_rows:
+        yield held, 0
+
+def parse_batches(filename, log_format=None, processes=1, batch_bytes=DEFAULT_BATCH_BYTES):
+    """
+    Parse a log file into a stream of log tables, in file order.
+
+    With processes > 1, batches are parsed in worker processes. Plain files
+    are split into line-aligned byte ranges that workers read themselves;
+    gzip input is decompressed here and its batches are handed to the
+    workers a few at a time.
+
+    For access logs, each client's latest request in a batch is held back
+    until its dwell time is known, then yielded with a later batch.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+        log_format (str): One of FORMATS (detected from the file if None).
+        processes (int): Worker processes.
+        batch_bytes (int): Approximate input bytes per batch.
+
+    Yields:
+        tuple: (pa.Table typed according to log_store.LOG_SCHEMA, number of skipped lines).
+    """
+    log_format = log_format or detect_format(filename)
+    if log_format not in FORMATS:
+        raise ValueError(f"Unknown log format {log_format!r}; expected one of {', '.join(FORMATS)}.")
+    batches = _parsed_batches(filename, log_format, processes, batch_bytes)
+    # The project's CSV carries its own Duration
+    return batches if log_format == 'csv' else _carry_dwell(batches)
+
+def _parsed_batches(filename, log_format, processes, batch_bytes):
+    compressed = is_gzip(filename)
+    header = log_format == 'csv'
+
+    if processes <= 1:
+        for position, data in enumerate(iter_batches(filename, batch_bytes)):
+            yield parse_lines(data, log_format, header and position == 0)
+        return
+
+    with ProcessPoolExecutor(processes) as pool:
+        window = processes * PREFETCH_PER_PROCESS
+        if compressed:
+            tasks = ((data, log_format, header and position == 0)
+                     for position, data in enumerate(iter_batches(filename, batch_bytes)))
+            yield from _ordered(pool, parse_lines, tasks, window)
+        else:
+            tasks = ((filename, start, end, log_format)
+                     for start, end in log_store.byte_ranges(filename, batch_bytes, header=header))
+            yield from _ordered(pool, _parse_range, tasks, window)
+
+def parse_file(filename, log_format=None, processes=1, batch_bytes=DEFAULT_BATCH_BYTES):
+    """
+    Parse a whole log file into one log table.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+        log_format (str): One of FORMATS (detected from the file if None).
+        processes (int): Worker processes.
+        batch_bytes (int): Approximate input bytes per batch.
+
+    Returns:
+        pa.Table: The requests, typed according to log_store.LOG_SCHEMA.
+    """
+    tables = [table for table, _ in parse_batches(filename, log_format, processes, batch_bytes)]
+    return pa.concat_tables(tables).unify_dictionaries() if tables else log_store.LOG_SCHEMA.empty_table()
+
+def ingest(filename, output=log_store.LOG_FILE, log_format=None, processes=1,
+           batch_bytes=DEFAULT_BATCH_BYTES, partitioned=False):
+    """
+    Append the requests of a log file to the log store's CSV (or another output).
+
+    Batches are written as they are parsed, so memory stays bounded.
+
+    Args:
+        filename (str): The log file, plain or gzip-compressed.
+        output (str): CSV or '.parquet' file, or partitioned dataset root (see web_server_logs.write_tables).
+        log_format (str): One of FORMATS (detected from the file if None).
+        processes (int): Worker processes.
+        batch_bytes (int): Approximate input bytes per batch.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at output.
+
+    Returns:
+        dict: 'rows' written and 'skipped' malformed lines.
+    """
+    counts = {'rows': 0, 'skipped': 0}
+
+    def tables():
+        for table, skipped in parse_batches(filename, log_format, processes, batch_bytes):
+            counts['rows'] += table.num_rows
+            counts['skipped'] += skipped
+            if table.num_rows:
+                yield table
+
+    write_tables(output, tables(), partitioned=partitioned)
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingest Apache/Nginx combined, JSON-lines or CSV logs (optionally gzipped).")
+    parser.add_argument('inputs', nargs='+', help="log files to ingest, in order")
+    parser.add_argument('--format', choices=FORMATS, default=None, help="input format (detected per file by default)")
+    parser.add_argument('--output', default=log_store.LOG_FILE, help="CSV or .parquet file, or partitioned dataset root")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="parser worker processes")
+    parser.add_argument('--batch-bytes', type=int, default=DEFAULT_BATCH_BYTES, help="input bytes per parsed batch")
+    parser.add_argument('--partitioned', action='store_true', help="append to an hour-partitioned dataset at --output")
+    args = parser.parse_args()
+
+    for path in args.inputs:
+        counts = ingest(path, args.output, args.format, args.processes, args.batch_bytes, args.partitioned)
+        print(f"{path}: {counts['rows']} rows ingested, {counts['skipped']} malformed lines skipped")
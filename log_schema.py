@@ -0,0 +1,145 @@
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+
+LOG_COLUMNS = ['Timestamp', 'IP Address', 'Method', 'Endpoint', 'Status',
+               'Country', 'Sports Activity', 'Device', 'Browser', 'Duration']
+
+# Columns kept dictionary-encoded (pandas categoricals). A client sends many requests, so
+# addresses are encoded too: a 4-byte code instead of a Python string per row, while IPv6
+# still fits and every consumer still sees the text form
+CATEGORICAL_COLUMNS = ['IP Address', 'Method', 'Endpoint', 'Country', 'Sports Activity', 'Device', 'Browser']
+
+# Text form of Timestamp in CSV files
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Header row of log CSV files, unquoted as pandas writes it
+CSV_HEADER = (','.join(LOG_COLUMNS) + '\n').encode('utf-8')
+
+# Characters that make a CSV field need quotes
+_CSV_SPECIAL = '[,"\r\n]'
+
+# In memory: Timestamp is int64 epoch seconds (datetime64[s] in pandas), Status fits int16 and
+# Duration (seconds, at most a session timeout) float32. Arrow's CSV reader only produces
+# int32-indexed dictionaries; pandas picks the narrowest code width itself.
+LOG_SCHEMA = pa.schema([
+    ('Timestamp', pa.timestamp('s')),
+    ('IP Address', pa.dictionary(pa.int32(), pa.string())),
+    ('Method', pa.dictionary(pa.int32(), pa.string())),
+    ('Endpoint', pa.dictionary(pa.int32(), pa.string())),
+    ('Status', pa.int16()),
+    ('Country', pa.dictionary(pa.int32(), pa.string())),
+    ('Sports Activity', pa.dictionary(pa.int32(), pa.string())),
+    ('Device', pa.dictionary(pa.int32(), pa.string())),
+    ('Browser', pa.dictionary(pa.int32(), pa.string())),
+    ('Duration', pa.float32()),
+])
+
+# Bumped whenever LOG_SCHEMA changes, so persisted caches of the old layout are rebuilt
+SCHEMA_VERSION = 2
+
+def read_csv_table(source, header=True):
+    """
+    Parse a log CSV straight into LOG_SCHEMA.
+
+    Arrow's multithreaded CSV reader decodes, dictionary-encodes and narrows
+    every column as it parses, so no Python object is created per row.
+
+    Args:
+        source (str or file-like): The CSV data.
+        header (bool): Whether the data starts with the header row.
+
+    Returns:
+        pa.Table: The logs, typed according to LOG_SCHEMA.
+    """
+    read_options = pv.ReadOptions(column_names=None if header else LOG_COLUMNS)
+    convert_options = pv.ConvertOptions(column_types=LOG_SCHEMA, include_columns=LOG_COLUMNS)
+    return pv.read_csv(source, read_options=read_options, convert_options=convert_options)
+
+def _needs_quotes(table):
+    # Only text columns can hold delimiters; a dictionary's values cover every row's text
+    for field in table.schema:
+        if not pa.types.is_dictionary(field.type):
+            continue
+        for chunk in table[field.name].chunks:
+            if pc.any(pc.match_substring_regex(chunk.dictionary, _CSV_SPECIAL)).as_py():
+                return True
+    return False
+
+def write_csv(file, table):
+    """
+    Append log rows to a CSV file, without a header (see CSV_HEADER).
+
+    Arrow can only quote every text field or none, while pandas (which wrote
+    the original log files) quotes just the fields that need it. Tables
+    whose text holds no delimiter, quote or line break (virtually all of
+    them) are written unquoted, as pandas writes them; any other table gets
+    all its text quoted, which readers parse the same. Whole-number
+    durations are written without a decimal point ('0' where pandas wrote '0.0').
+
+    Args:
+        file (file-like): Binary file opened for appending.
+        table (pa.Table): Rows typed according to LOG_SCHEMA.
+    """
+    options = pv.WriteOptions(include_header=False, quoting_style='needed' if _needs_quotes(table) else 'none')
+    pv.write_csv(table, file, write_options=options)
+
+def _conform_column(column, target):
+    if column.type == target:
+        return column
+    if pa.types.is_dictionary(target):
+        if not pa.types.is_dictionary(column.type):
+            column = pc.dictionary_encode(column.cast(pa.string()))
+        return column.cast(target)
+    if pa.types.is_timestamp(target) and (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+        return pc.strptime(column, TIMESTAMP_FORMAT, 's')
+    return column.cast(target)
+
+def conform(table):
+    """
+    Convert a table with the log columns into LOG_SCHEMA.
+
+    Strings are dictionary-encoded, 'YYYY-MM-DD HH:MM:SS' strings parsed,
+    and numbers narrowed (an out-of-range Status raises); columns already of
+    the right type are passed through untouched.
+
+    Args:
+        table (pa.Table): At least the LOG_COLUMNS, in any order and of any compatible type.
+
+    Returns:
+        pa.Table: The rows, typed according to LOG_SCHEMA.
+    """
+    return pa.Table.from_arrays([_conform_column(table[field.name], field.type) for field in LOG_SCHEMA],
+                                schema=LOG_SCHEMA)
+
+def from_rows(rows):
+    """
+    Convert log entries (lists in LOG_COLUMNS order) into a LOG_SCHEMA table.
+
+    Each column is handed to Arrow in one call and converted with conform.
+
+    Args:
+        rows (list): Log entries as produced by web_server_logs.generate_logs.
+
+    Returns:
+        pa.Table: The entries, typed according to LOG_SCHEMA.
+    """
+    if len(rows) == 0:
+        return LOG_SCHEMA.empty_table()
+    columns = list(zip(*rows))
+    return conform(pa.table({name: pa.array(values) for name, values in zip(LOG_COLUMNS, columns)}))
+
+def int_to_ipv4(addresses):
+    """
+    Format uint32 IPv4 addresses as dotted-quad strings, vectorized.
+
+    Args:
+        addresses (np.ndarray): uint32 addresses.
+
+    Returns:
+        pa.StringArray: The dotted-quad strings.
+    """
+    addresses = np.asarray(addresses, dtype=np.uint32)
+    octets = [pc.cast(pa.array((addresses >> shift) & 0xFF), pa.string()) for shift in (24, 16, 8, 0)]
+    return pc.binary_join_element_wise(*octets, '.')
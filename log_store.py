@@ -0,0 +1,717 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+import instrumentation
+from log_schema import CATEGORICAL_COLUMNS, CSV_HEADER, LOG_COLUMNS, LOG_SCHEMA, SCHEMA_VERSION, read_csv_table, write_csv
+
+# A log CSV, a directory written by write_partitioned, or a glob of such shards (one per web node)
+LOG_FILE = os.getenv('LOG_FILE', 'web_server_logs.csv')
+
+MANIFEST_FILE = '_manifest.json'
+
+# Rewrite the dataset as a single part once appends have produced this many
+MAX_PARTS = 32
+
+# Bytes just before the read offset that are hashed to detect rewritten files
+_DIGEST_WINDOW = 4096
+
+# Bytes of CSV parsed per chunk by the streaming readers
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Hour-partitioned datasets: root/date=YYYY-MM-DD/hour=HH/PARTITION_FILE, indexed by PARTITION_INDEX
+PARTITION_INDEX = '_partitions.json'
+PARTITION_FILE = 'logs.csv'
+
+# Sibling file locked by every writer of a log, see file_lock
+LOCK_SUFFIX = '.lock'
+
+# Threads loading shards at once; Arrow parses and decodes without holding the GIL
+SHARD_THREADS = os.cpu_count() or 1
+
+# In-process cache shared by every page: {csv path, partitioned root or tuple of shard paths: entry dict}
+_cache = {}
+
+# Serializes ingestion between threads; file_lock on the dataset serializes it between processes
+_lock = threading.Lock()
+
+def shards(source=LOG_FILE):
+    """
+    Resolve a log source into its shards.
+
+    A source is a log CSV or partitioned dataset root, a glob matching
+    several of them (e.g. 'logs/node-*.csv'), or a list of any of these.
+    The Parquet caches and lock files the store keeps next to each CSV never
+    count as shards.
+
+    Args:
+        source (str or list): The log source.
+
+    Returns:
+        list: Shard paths, sorted within each glob.
+
+    Raises:
+        FileNotFoundError: If a glob matches no shard.
+    """
+    if not isinstance(source, str):
+        return [path for item in source for path in shards(item)]
+    if not glob.has_magic(source):
+        return [source]
+    paths = [path for path in sorted(glob.glob(source))
+             if not path.endswith(LOCK_SUFFIX) and not os.path.isfile(os.path.join(path, MANIFEST_FILE))]
+    if not paths:
+        raise FileNotFoundError(f"No log shards match {source}")
+    return paths
+
+def is_sharded(source=LOG_FILE):
+    """
+    Tell whether a log source stands for several shards (a glob or a list).
+
+    Args:
+        source (str or list): The log source.
+
+    Returns:
+        bool: False for a single CSV file or partitioned dataset root.
+    """
+    return not isinstance(source, str) or glob.has_magic(source)
+
+def _cache_key(source):
+    if is_sharded(source):
+        return tuple(os.path.abspath(path) for path in shards(source))
+    return os.path.abspath(source)
+
+def _map_shards(function, paths):
+    # Load shards side by side; each keeps its own cache entry and Parquet dataset
+    if len(paths) == 1:
+        return [function(paths[0])]
+    with ThreadPoolExecutor(min(len(paths), SHARD_THREADS)) as pool:
+        return list(pool.map(function, paths))
+
+def dataset_path(filename=LOG_FILE):
+    """
+    Return the path of the Parquet dataset derived from a log CSV.
+
+    Args:
+        filename (str): The log CSV file.
+
+    Returns:
+        str: The Parquet dataset directory stored next to the CSV.
+    """
+    root, _ = os.path.splitext(filename)
+    return root + '.parquet'
+
+def iter_csv_chunks(filename=LOG_FILE, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Stream a log CSV as a sequence of bounded-size DataFrames.
+
+    Unlike load_logs, nothing is cached, so memory stays flat however large
+    the file is.
+
+    Args:
+        filename (str): The log CSV file.
+        chunk_bytes (int): Approximate CSV bytes parsed per chunk.
+
+    Yields:
+        pd.DataFrame: Consecutive rows of the log, typed like load_logs.
+    """
+    read_options = pv.ReadOptions(block_size=chunk_bytes)
+    convert_options = pv.ConvertOptions(column_types=LOG_SCHEMA, include_columns=LOG_COLUMNS)
+    with pv.open_csv(filename, read_options=read_options, convert_options=convert_options) as reader:
+        for batch in reader:
+            yield batch.to_pandas()
+
+def byte_ranges(filename=LOG_FILE, chunk_bytes=DEFAULT_CHUNK_BYTES, header=True):
+    """
+    Split the data rows of a log CSV into line-aligned byte ranges.
+
+    Each range can be parsed independently with read_csv_range, e.g. by
+    separate worker processes.
+
+    Args:
+        filename (str): The log CSV file (or any line-oriented text file).
+        chunk_bytes (int): Approximate size of each range.
+        header (bool): Whether the first line is a header to leave out.
+
+    Returns:
+        list: (start, end) byte offsets, in file order.
+    """
+    size = os.path.getsize(filename)
+    ranges = []
+    with open(filename, 'rb') as file:
+        if header:
+            file.readline()
+        start = file.tell()
+        while start < size:
+            file.seek(min(start + chunk_bytes, size))
+            if file.tell() < size:
+                file.readline()
+            end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+def read_csv_range(filename, start, end):
+    """
+    Parse the data rows stored between two line-aligned byte offsets.
+
+    Args:
+        filename (str): The log CSV file.
+        start (int): Offset of the first row.
+        end (int): Offset just past the last row.
+
+    Returns:
+        pd.DataFrame: The rows, typed like load_logs.
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    return read_csv_table(io.BytesIO(data), header=False).to_pandas()
+
+def load_table(filename=LOG_FILE, start=None, end=None):
+    """
+    Load the logs as an Arrow table, parsing only rows appended since the last load.
+
+    For a partitioned dataset only the partitions whose time range overlaps
+    [start, end] are read. Shards are loaded in parallel threads and their
+    rows concatenated shard after shard (not merged in time order).
+
+    Args:
+        filename (str or list): The log source, see shards.
+        start (datetime-like): Earliest request time to keep (inclusive), or None.
+        end (datetime-like): Latest request time to keep (inclusive), or None.
+
+    Returns:
+        pa.Table: The logs, typed according to LOG_SCHEMA.
+
+    Raises:
+        FileNotFoundError: If the CSV file or dataset does not exist.
+    """
+    if is_sharded(filename):
+        tables = _map_shards(lambda path: load_table(path, start, end), shards(filename))
+        return pa.concat_tables(tables) if tables else LOG_SCHEMA.empty_table()
+    if os.path.isdir(filename):
+        tables = [_load_entry(path)['table'] for path in partitions(filename, start, end)]
+        table = pa.concat_tables(tables) if tables else LOG_SCHEMA.empty_table()
+    else:
+        table = _load_entry(filename)['table']
+    if start is None and end is None:
+        return table
+    epochs = table['Timestamp'].cast(pa.int64())
+    mask = pc.and_(pc.greater_equal(epochs, _epoch(start, np.iinfo(np.int64).min, ceil=True)),
+                   pc.less_equal(epochs, _epoch(end, np.iinfo(np.int64).max)))
+    return table.filter(mask)
+
+def load_logs(filename=LOG_FILE, start=None, end=None):
+    """
+    Load the logs as a pandas DataFrame shared by all callers in the process.
+
+    Categorical columns come back as pandas categoricals and Timestamp as
+    datetime64. Without a time range, the same DataFrame object is returned
+    on every call until rows are appended, so callers must treat it as
+    read-only. With one, a new frame of the matching rows is returned; for a
+    partitioned dataset only the overlapping partitions are read. Shards
+    are loaded as in load_table, into one frame.
+
+    Args:
+        filename (str or list): The log source, see shards.
+        start (datetime-like): Earliest request time to keep (inclusive), or None.
+        end (datetime-like): Latest request time to keep (inclusive), or None.
+
+    Returns:
+        pd.DataFrame: The web server logs.
+
+    Raises:
+        FileNotFoundError: If the CSV file or dataset does not exist.
+    """
+    if start is not None or end is not None:
+        if is_sharded(filename) or os.path.isdir(filename):
+            return load_table(filename, start, end).to_pandas()
+        frame = load_logs(filename)
+        return frame[time_mask(frame['Timestamp'], start, end)]
+
+    if is_sharded(filename) or os.path.isdir(filename):
+        key = _cache_key(filename)
+        current = version(filename)
+        entry = _cache.get(key)
+        if entry is None or entry['version'] != current:
+            entry = {'version': current, 'frame': load_table(filename).to_pandas(),
+                     'loaded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+            _cache[key] = entry
+        return entry['frame']
+
+    entry = _load_entry(filename)
+    with _lock:
+        if entry['frame'] is None:
+            with instrumentation.span('log_store.to_pandas'):
+                entry['frame'] = entry['table'].to_pandas()
+        return entry['frame']
+
+def time_mask(timestamps, start=None, end=None):
+    """
+    Select request times within [start, end].
+
+    Args:
+        timestamps (pd.Series): Request times (datetime64).
+        start (datetime-like): Inclusive lower bound, or None.
+        end (datetime-like): Inclusive upper bound, or None.
+
+    Returns:
+        np.ndarray: Boolean mask aligned with timestamps.
+    """
+    values = timestamps.to_numpy()
+    mask = np.ones(len(values), dtype=bool)
+    if start is not None:
+        mask &= values >= pd.Timestamp(start).to_datetime64()
+    if end is not None:
+        mask &= values <= pd.Timestamp(end).to_datetime64()
+    return mask
+
+def time_bounds(filename=LOG_FILE):
+    """
+    Return the earliest and latest request time in the logs.
+
+    Partitioned datasets answer from their partition statistics without
+    reading any rows.
+
+    Args:
+        filename (str or list): The log source, see shards.
+
+    Returns:
+        tuple: (first, last) pd.Timestamps, or (None, None) when there are no rows.
+
+    Raises:
+        FileNotFoundError: If the CSV file or dataset does not exist.
+    """
+    if is_sharded(filename):
+        bounds = [bound for bound in _map_shards(time_bounds, shards(filename)) if bound[0] is not None]
+        if not bounds:
+            return None, None
+        return min(first for first, _ in bounds), max(last for _, last in bounds)
+    if os.path.isdir(filename):
+        index = _partition_index(filename)
+        if not index:
+            return None, None
+        first = min(stats['min'] for stats in index.values())
+        last = max(stats['max'] for stats in index.values())
+    else:
+        entry = _load_entry(filename)
+        if entry['bounds'] is None:
+            bounds = pc.min_max(entry['table']['Timestamp'].cast(pa.int64()))
+            entry['bounds'] = (bounds['min'].as_py(), bounds['max'].as_py())
+        first, last = entry['bounds']
+        if first is None:
+            return None, None
+    return pd.Timestamp(first, unit='s'), pd.Timestamp(last, unit='s')
+
+def partitions(root, start=None, end=None):
+    """
+    List the partition files of a dataset that overlap a time range.
+
+    Args:
+        root (str): The partitioned dataset root.
+        start (datetime-like): Inclusive lower bound, or None.
+        end (datetime-like): Inclusive upper bound, or None.
+
+    Returns:
+        list: Partition CSV paths, in time order.
+
+    Raises:
+        FileNotFoundError: If root is not a partitioned dataset.
+    """
+    index = _partition_index(root)
+    low = _epoch(start, -np.inf, ceil=True)
+    high = _epoch(end, np.inf)
+    return [os.path.join(root, relative) for relative, stats in sorted(index.items())
+            if stats['max'] >= low and stats['min'] <= high]
+
+@contextmanager
+def file_lock(path):
+    """
+    Hold an exclusive lock on a log across threads and processes.
+
+    Every writer of a log takes it (see web_server_logs.write_tables), so
+    appends from concurrent sessions, API workers and command-line runs never
+    interleave. Readers do not need it: they already leave a partially
+    written last line for the next load.
+
+    Args:
+        path (str): The log CSV file or partitioned dataset root; the lock is
+            the sibling file path + LOCK_SUFFIX.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.abspath(path) + LOCK_SUFFIX, 'a+b') as handle:
+        if fcntl is not None:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)  # retries for about 10 seconds
+                    break
+                except OSError:
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+            else:
+                handle.seek(0)
+                msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+
+def write_partitioned(table, root):
+    """
+    Append log rows to an hour-partitioned dataset.
+
+    Rows go to root/date=YYYY-MM-DD/hour=HH/logs.csv by request time, and
+    the partition index records each partition's row count and min/max
+    request time, which loaders use to skip partitions outside a query's
+    time range. Each partition file is itself an append-only log CSV.
+
+    Args:
+        table (pa.Table): Rows typed according to LOG_SCHEMA.
+        root (str): The dataset root directory (created if missing).
+    """
+    os.makedirs(root, exist_ok=True)
+    try:
+        index = _partition_index(root)
+    except FileNotFoundError:
+        index = {}
+    epochs = table['Timestamp'].cast(pa.int64()).to_numpy(zero_copy_only=False)
+    hours = epochs // 3600
+    order = np.argsort(hours, kind='stable')
+    for rows in np.split(order, np.flatnonzero(np.diff(hours[order])) + 1):
+        if len(rows) == 0:
+            continue
+        hour = pd.Timestamp(int(hours[rows[0]]) * 3600, unit='s')
+        relative = os.path.join(f"date={hour:%Y-%m-%d}", f"hour={hour:%H}", PARTITION_FILE)
+        path = os.path.join(root, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        new = not os.path.isfile(path) or os.path.getsize(path) == 0
+        with open(path, 'ab') as file:
+            if new:
+                file.write(CSV_HEADER)
+            write_csv(file, table.take(rows))
+
+        stats = index.get(relative, {'min': np.inf, 'max': -np.inf, 'rows': 0})
+        index[relative] = {
+            'min': int(min(stats['min'], epochs[rows].min())),
+            'max': int(max(stats['max'], epochs[rows].max())),
+            'rows': stats['rows'] + len(rows),
+        }
+    _write_json(os.path.join(root, PARTITION_INDEX), index)
+
+def _partition_index(root):
+    index = _read_json(os.path.join(root, PARTITION_INDEX))
+    if index is None:
+        raise FileNotFoundError(f"No partition index in {root}")
+    return index
+
+def _epoch(value, default, ceil=False):
+    # Whole epoch seconds; a lower bound rounds up so it compares exactly against second timestamps
+    if value is None:
+        return default
+    nanoseconds = pd.Timestamp(value).value
+    return -(-nanoseconds // 10 ** 9) if ceil else nanoseconds // 10 ** 9
+
+def version(filename=LOG_FILE):
+    """
+    Return a token that changes whenever the loaded logs change.
+
+    Pass it as an argument to @st.cache_data functions that derive data from
+    the logs, so their cache entries are invalidated exactly when new rows
+    are ingested.
+
+    Args:
+        filename (str or list): The log source, see shards.
+
+    Returns:
+        str: The file identity and byte offset of the loaded data (of each shard).
+
+    Raises:
+        FileNotFoundError: If the CSV file does not exist.
+    """
+    if is_sharded(filename):
+        return '|'.join(version(path) for path in shards(filename))
+    if os.path.isdir(filename):
+        # The index is replaced (new inode) on every write
+        stat = os.stat(os.path.join(filename, PARTITION_INDEX))
+        return f"{stat.st_dev}:{stat.st_ino}:{stat.st_mtime_ns}"
+    manifest = _load_entry(filename)['manifest']
+    return f"{manifest['device']}:{manifest['inode']}:{manifest['offset']}"
+
+def fingerprint(filename=LOG_FILE):
+    """
+    Return a content fingerprint of the loaded logs.
+
+    Unlike version, it does not depend on the file's inode, so copies of the
+    same log on other hosts, replicas and restarts share it: it keys caches
+    that outlive the process (see result_cache). Like the store's own rewrite
+    detection, it covers the loaded byte count and the bytes just before it.
+
+    Args:
+        filename (str or list): The log source, see shards.
+
+    Returns:
+        str: Hex digest of the loaded data.
+
+    Raises:
+        FileNotFoundError: If the CSV file does not exist.
+    """
+    if is_sharded(filename):
+        parts = [fingerprint(path) for path in shards(filename)]
+    elif os.path.isdir(filename):
+        # The partition index records every partition's row count and time range
+        with open(os.path.join(filename, PARTITION_INDEX), 'rb') as file:
+            parts = [file.read().decode('utf-8')]
+    else:
+        manifest = _load_entry(filename)['manifest']
+        parts = [str(manifest['offset']), manifest['digest']]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()
+
+def identity(filename=LOG_FILE):
+    """
+    Return a token that stays the same while the logs are only appended to.
+
+    Unlike version, it does not change when new rows are ingested, only when
+    the file is replaced or rewritten, so state derived from a prefix of the
+    logs (e.g. a model's sufficient statistics) can be extended with the new
+    rows while the identity matches. A partitioned dataset can gain rows in
+    the middle (in older partitions), so its identity changes with every
+    write, like its version. So do several shards, whose rows are
+    concatenated shard after shard.
+
+    Args:
+        filename (str or list): The log source, see shards.
+
+    Returns:
+        str: The file identity and the lineage of its dataset.
+
+    Raises:
+        FileNotFoundError: If the CSV file does not exist.
+    """
+    if is_sharded(filename) or os.path.isdir(filename):
+        return version(filename)
+    manifest = _load_entry(filename)['manifest']
+    return f"{manifest['device']}:{manifest['inode']}:{manifest.get('lineage')}"
+
+def loaded_at(filename=LOG_FILE):
+    """
+    Return when the cached logs for a CSV were last updated.
+
+    Args:
+        filename (str or list): The log source, see shards.
+
+    Returns:
+        str or None: The load time formatted as '%Y-%m-%d %H:%M:%S', or None if not loaded.
+    """
+    entry = _cache.get(_cache_key(filename))
+    return entry['loaded_at'] if entry else None
+
+def clear_cache():
+    """
+    Drop every cached table and DataFrame.
+    """
+    _cache.clear()
+
+def _load_entry(filename):
+    key = os.path.abspath(filename)
+    stat = os.stat(filename)
+    entry = _cache.get(key)
+    unchanged = entry is not None and entry['stat'] == (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    instrumentation.cache_lookup('log_store.table', hit=unchanged)
+    if unchanged:
+        return entry
+
+    path = dataset_path(filename)
+    with _lock, file_lock(path):
+        # Another thread or process may have ingested the tail while we waited
+        stat = os.stat(filename)
+        entry = _cache.get(key)
+        if entry is not None and entry['stat'] == (stat.st_ino, stat.st_size, stat.st_mtime_ns):
+            return entry
+        if entry is not None:
+            entry = _sync(entry, path)
+        if entry is None or not _same_file(entry['manifest'], filename, stat):
+            with instrumentation.span('log_store.open_dataset'):
+                entry = _open_dataset(filename, stat)
+            _cache[key] = entry
+        if stat.st_size > entry['manifest']['offset']:
+            with instrumentation.span('log_store.parse_csv'):
+                _ingest_tail(entry, filename, stat.st_size)
+        entry['stat'] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    return entry
+
+def _sync(entry, path):
+    # Catch up with the persisted dataset: adopt the parts another process appended to the
+    # same lineage, or return None to reopen it after a compaction or rebuild
+    manifest = _read_manifest(path)
+    ours = entry['manifest']
+    if manifest == ours:
+        return entry
+    if manifest is None or manifest.get('lineage') != ours['lineage'] \
+            or manifest['parts'][:len(ours['parts'])] != ours['parts']:
+        return None
+    added = manifest['parts'][len(ours['parts']):]
+    if added:
+        _extend(entry, pa.concat_tables(
+            [pq.read_table(os.path.join(path, part), memory_map=True).cast(LOG_SCHEMA) for part in added]))
+    entry['manifest'] = manifest
+    return entry
+
+def _extend(entry, new_table):
+    entry['table'] = pa.concat_tables([entry['table'], new_table])
+    if entry['frame'] is not None:
+        entry['frame'] = _append_frame(entry['frame'], new_table.to_pandas())
+    entry['bounds'] = None
+    entry['loaded_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _same_file(manifest, filename, stat):
+    # Identity check: same inode, not truncated, and the bytes before the offset are unchanged
+    if (manifest['device'], manifest['inode']) != (stat.st_dev, stat.st_ino):
+        return False
+    if stat.st_size < manifest['offset']:
+        return False
+    return _tail_digest(filename, manifest['offset']) == manifest['digest']
+
+def _tail_digest(filename, offset):
+    start = max(0, offset - _DIGEST_WINDOW)
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        return hashlib.sha1(file.read(offset - start)).hexdigest()
+
+def _open_dataset(filename, stat):
+    # Reuse the persisted dataset if it was built from this file, otherwise start over
+    path = dataset_path(filename)
+    manifest = _read_manifest(path)
+    if manifest is not None and manifest.get('schema') == SCHEMA_VERSION and _same_file(manifest, filename, stat):
+        # Parquet has no second-resolution timestamps, so cast back to LOG_SCHEMA
+        table = pa.concat_tables(
+            [pq.read_table(os.path.join(path, part), memory_map=True).cast(LOG_SCHEMA)
+             for part in manifest['parts']]
+        ) if manifest['parts'] else LOG_SCHEMA.empty_table()
+    else:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+        os.makedirs(path)
+        manifest = {'device': stat.st_dev, 'inode': stat.st_ino, 'offset': 0, 'schema': SCHEMA_VERSION,
+                    'digest': _tail_digest(filename, 0), 'parts': [], 'lineage': uuid.uuid4().hex}
+        table = LOG_SCHEMA.empty_table()
+
+    return {
+        'manifest': manifest,
+        'table': table,
+        'frame': None,  # converted on first load_logs; partitions only need the table
+        'bounds': None,
+        'loaded_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'stat': None,
+    }
+
+def _read_manifest(path):
+    return _read_json(os.path.join(path, MANIFEST_FILE))
+
+def _write_manifest(path, manifest):
+    _write_json(os.path.join(path, MANIFEST_FILE), manifest)
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+def _write_json(path, data):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(tmp, path)
+
+def _ingest_tail(entry, filename, size):
+    manifest = entry['manifest']
+    offset = manifest['offset']
+    with open(filename, 'rb') as file:
+        file.seek(offset)
+        data = file.read(size - offset)
+
+    # Leave a partially written last line for the next load
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return
+    data = data[:end]
+
+    new_table = read_csv_table(io.BytesIO(data), header=offset == 0)
+    path = dataset_path(filename)
+    # Work on a copy: the cached manifest must keep matching the one on disk until it is replaced
+    manifest = dict(manifest, parts=list(manifest['parts']))
+    if new_table.num_rows:
+        part = _part_name()
+        pq.write_table(new_table, os.path.join(path, part))
+        manifest['parts'].append(part)
+        _extend(entry, new_table)
+
+    manifest['offset'] = offset + end
+    manifest['digest'] = _tail_digest(filename, manifest['offset'])
+    replaced = _compact(path, entry, manifest) if len(manifest['parts']) > MAX_PARTS else []
+    _write_manifest(path, manifest)
+    entry['manifest'] = manifest
+    # Only now that no manifest lists them
+    for part in replaced:
+        try:
+            os.remove(os.path.join(path, part))
+        except OSError:
+            pass  # still mapped by another process on Windows; the next rebuild removes it
+    entry['loaded_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+def _part_name():
+    # Unique, so a part is never overwritten while an older manifest still lists it
+    return f"part-{uuid.uuid4().hex}.parquet"
+
+def _append_frame(frame, new_rows):
+    # Extend each categorical in place of re-encoding: old codes stay valid, only new rows are recoded
+    if frame.empty:
+        return new_rows
+    new_rows = new_rows.copy()
+    columns = {}
+    for column in CATEGORICAL_COLUMNS:
+        existing = frame[column].cat.categories
+        added = new_rows[column].cat.categories.difference(existing)
+        if len(added):
+            columns[column] = frame[column].cat.add_categories(added)
+        new_rows[column] = new_rows[column].cat.set_categories(existing.append(added))
+    if columns:
+        frame = frame.assign(**columns)
+    return pd.concat([frame, new_rows], ignore_index=True)
+
+def _compact(path, entry, manifest):
+    # Write the whole table as one new part; return the parts it replaces, for removal
+    # once the manifest listing it is written
+    table = entry['table'].combine_chunks()
+    part = _part_name()
+    pq.write_table(table, os.path.join(path, part))
+    replaced, manifest['parts'] = manifest['parts'], [part]
+    entry['table'] = table
+    return replaced
@@ -1,108 +1,583 @@
+import argparse
+import ipaddress
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 from geoip2.database import Reader
+import log_store
+import report_export
+import result_cache
+import rollup
+import sessions
+import sketches
 
-def load_data(filename='web_server_logs.csv'):
+GEOIP_DATABASE = 'GeoLite2-City.mmdb'
+
+# Upper bound on cached (ip, reader) -> country lookups
+GEOIP_CACHE_SIZE = 65536
+
+# Below this many unique addresses, worker start-up costs more than it saves
+MIN_IPS_PER_PROCESS = 50000
+
+# Endpoints listed in streaming reports
+DEFAULT_TOP_K = 10
+
+# Dwell-time percentiles reported in approximate mode
+DURATION_PERCENTILES = (0.5, 0.9, 0.95, 0.99)
+
+# Reader opened once per worker process by _init_geoip_worker
+_worker_reader = None
+
+def load_data(filename='web_server_logs.csv', start=None, end=None):
     """
-    Load web server logs from a CSV file.
+    Load web server logs from a CSV file through the shared log store.
 
     Args:
-        filename (str): The name of the CSV file to load data from.
+        filename (str or list): The CSV file (or partitioned dataset root) to load data from, or a glob or list of shards.
+        start (datetime-like): Earliest request time to keep, or None.
+        end (datetime-like): Latest request time to keep, or None.
 
     Returns:
-        pd.DataFrame: A DataFrame containing the web server logs.
+        pd.DataFrame: A DataFrame containing the web server logs (read-only, shared).
     """
-    return pd.read_csv(filename, encoding='utf-8')
+    return log_store.load_logs(filename, start, end)
 
 def get_country_from_ip(ip, reader):
     try:
+        # Private, reserved and malformed addresses are never in the database: skip the lookup
+        if not ipaddress.ip_address(ip).is_global:
+            return "Unknown"
         response = reader.city(ip)
         return response.country.name
     except Exception:
         return "Unknown"
 
-def analyze_logs(logs, reader):
+@lru_cache(maxsize=GEOIP_CACHE_SIZE)
+def lookup_country(ip, reader):
+    """
+    Memoized get_country_from_ip, shared across analyze_logs calls.
+
+    Args:
+        ip (str): The IP address to resolve.
+        reader (geoip2.database.Reader): The GeoIP2 reader instance.
+
+    Returns:
+        str: The country name, or "Unknown".
+    """
+    return get_country_from_ip(ip, reader)
+
+def _init_geoip_worker(database):
+    global _worker_reader
+    _worker_reader = Reader(database)
+
+def _resolve_shard(ips):
+    return [lookup_country(ip, _worker_reader) for ip in ips]
+
+def resolve_countries(ips, reader, processes=1, database=None):
+    """
+    Resolve the country of every address, looking up each unique address once.
+
+    Args:
+        ips (pd.Series): IP addresses, typically with heavy repetition.
+        reader (geoip2.database.Reader): The GeoIP2 reader instance.
+        processes (int): Worker processes to shard the unique addresses across.
+        database (str): GeoIP2 database path, required when processes > 1.
+
+    Returns:
+        pd.Series: Categorical country names aligned with ips.
+    """
+    codes, uniques = pd.factorize(ips)
+    processes = min(processes, len(uniques) // MIN_IPS_PER_PROCESS)
+
+    if processes > 1 and database is not None:
+        shards = np.array_split(np.asarray(uniques, dtype=object), processes)
+        with ProcessPoolExecutor(processes, initializer=_init_geoip_worker, initargs=(database,)) as pool:
+            resolved = [country for shard in pool.map(_resolve_shard, shards) for country in shard]
+    else:
+        resolved = [lookup_country(ip, reader) for ip in uniques]
+
+    # Map back with an index join; missing addresses (code -1) pick the trailing "Unknown"
+    country_codes, country_names = pd.factorize(np.asarray(resolved + ["Unknown"], dtype=object))
+    return pd.Series(pd.Categorical.from_codes(country_codes[codes], country_names), index=ips.index)
+
+def analyze_logs(logs, reader, processes=1, database=None, approximate=False):
     """
     Analyze web server logs to extract insights.
 
+    Given a glob or list of log shards instead of a frame, each shard is
+    aggregated on its own by a pool of worker processes and the partial
+    results are merged, see analyze_logs_chunked.
+
     Args:
-        logs (pd.DataFrame): The web server logs DataFrame.
+        logs (pd.DataFrame or str or list): The web server logs DataFrame, or log shards.
         reader (geoip2.database.Reader): The GeoIP2 reader instance.
+        processes (int): Worker processes for resolving unique IP addresses (or aggregating shards).
+        database (str): GeoIP2 database path, required when processes > 1.
+        approximate (bool): Use fixed-memory sketches, see summarize_logs.
 
     Returns:
         dict: A dictionary containing analysis results.
     """
-    logs['Country'] = logs['IP Address'].apply(get_country_from_ip, args=(reader,))
+    if not isinstance(logs, pd.DataFrame):
+        return analyze_logs_chunked(logs, reader=reader, database=database, processes=processes,
+                                    top_k=None, approximate=approximate)
+    # Work on new columns only: the frame may be the log store's shared copy
+    countries = resolve_countries(logs['IP Address'], reader, processes=processes, database=database)
+    return summarize_logs(logs, countries, approximate=approximate)
 
-    visits_per_country = logs['Country'].value_counts()
-    main_interests = logs['Endpoint'].value_counts()
+def summarize_logs(logs, countries=None, approximate=False):
+    """
+    Compute the analysis aggregates from logs whose countries are already known.
 
-    logs['Timestamp'] = pd.to_datetime(logs['Timestamp'], format='%H:%M:%S')
-    logs['Next Timestamp'] = logs.groupby('IP Address')['Timestamp'].shift(-1)
-    logs['Duration'] = (logs['Next Timestamp'] - logs['Timestamp']).dt.total_seconds().fillna(0)
-    average_duration = logs['Duration'].mean()
-    duration_std = logs['Duration'].std()
+    Args:
+        logs (pd.DataFrame): The web server logs DataFrame.
+        countries (pd.Series): Country per row; defaults to the logs' Country column.
+        approximate (bool): Count countries and endpoints with heavy-hitter
+            sketches and add 'unique_visitors' (HyperLogLog) and
+            'duration_percentiles' (t-digest), as finalize_partials does.
+
+    Returns:
+        dict: A dictionary containing analysis results.
+    """
+    if countries is None:
+        countries = logs['Country']
+    if approximate:
+        return finalize_partials(_chunk_partial(logs, countries, sessions.SESSION_TIMEOUT, True), top_k=None)
+
+    # Categorical value counts also list unobserved values; keep only visited ones
+    visits_per_country = countries.value_counts().loc[lambda counts: counts > 0]
+    main_interests = logs['Endpoint'].value_counts().loc[lambda counts: counts > 0]
+
+    # Duration is each page's dwell time within its visitor session (0 for exit pages)
+    visitor_codes, _ = pd.factorize(logs['IP Address'])
+    epochs = pd.to_datetime(logs['Timestamp']).to_numpy('datetime64[s]').astype(np.int64)
+    durations = pd.Series(sessions.dwell_times(visitor_codes, epochs))
+    average_duration = durations.mean()
+    duration_std = durations.std()
+
+    visitor_sessions = sessions.sessionize(logs)
 
     return {
         'visits_per_country': visits_per_country,
         'main_interests': main_interests,
         'average_duration': average_duration,
-        'duration_std': duration_std
+        'duration_std': duration_std,
+        'sessions': len(visitor_sessions),
+        'average_session_length': visitor_sessions['Length'].mean(),
+        'average_pages_per_session': visitor_sessions['Pages'].mean(),
     }
 
-def generate_visualizations(analysis_results):
+def welford(values):
     """
-    Generate visualizations from analysis results.
+    Summarize values as a mergeable (count, mean, M2) triple.
 
     Args:
-        analysis_results (dict): The analysis results.
+        values (array-like): The observations.
+
+    Returns:
+        tuple: (count, mean, sum of squared deviations from the mean).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return (0, 0.0, 0.0)
+    mean = values.mean()
+    return (len(values), float(mean), float(((values - mean) ** 2).sum()))
+
+def merge_welford(a, b):
+    """
+    Combine two (count, mean, M2) triples (Chan et al. parallel update).
+    """
+    count = a[0] + b[0]
+    if count == 0:
+        return (0, 0.0, 0.0)
+    delta = b[1] - a[1]
+    mean = a[1] + delta * b[0] / count
+    return (count, mean, a[2] + b[2] + delta * delta * a[0] * b[0] / count)
+
+def _remove_welford(a, b):
+    # Inverse of merge_welford: drop the observations summarized by b from a
+    count = a[0] - b[0]
+    if count == 0:
+        return (0, 0.0, 0.0)
+    mean = (a[0] * a[1] - b[0] * b[1]) / count
+    delta = b[1] - mean
+    return (count, mean, max(a[2] - b[2] - delta * delta * count * b[0] / a[0], 0.0))
+
+def _counts(values):
+    counts = values.value_counts()
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(object)
+    return counts
+
+def partial_aggregates(chunk, reader=None, timeout=sessions.SESSION_TIMEOUT, approximate=False):
     """
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=analysis_results['visits_per_country'].index, y=analysis_results['visits_per_country'].values)
-    plt.title('Number of Visits per Country')
-    plt.xlabel('Country')
-    plt.ylabel('Number of Visits')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig('visits_per_country.png')
+    Aggregate one chunk of logs into a mergeable partial result.
+
+    Besides counts and a Welford summary of dwell times, the partial keeps
+    each visitor's first and last request time so merge_partials can fix up
+    sessions and dwell times that span chunk boundaries.
 
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=analysis_results['main_interests'].index, y=analysis_results['main_interests'].values)
-    plt.title('Main Interests based on Viewed Endpoints')
-    plt.xlabel('Endpoint')
-    plt.ylabel('Number of Visits')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.savefig('main_interests.png')
+    In approximate mode, country and endpoint counts are Space-Saving
+    summaries, and the partial adds a HyperLogLog sketch of visitors and a
+    t-digest of dwell times, so memory stays fixed however many distinct
+    keys the log holds. Each visitor's last dwell time in the chunk is left
+    out of the digest until a later chunk shows whether the session goes on.
 
-def save_report(analysis_results, filename='report.txt'):
+    Args:
+        chunk (pd.DataFrame): Consecutive log rows.
+        reader (geoip2.database.Reader): Resolves countries from IPs; None uses the Country column.
+        timeout (int): Session inactivity timeout in seconds.
+        approximate (bool): Use sketches instead of exact counts.
+
+    Returns:
+        dict: The partial aggregates.
     """
-    Save a report of the analysis results to a text file.
+    countries = resolve_countries(chunk['IP Address'], reader) if reader is not None else chunk['Country']
+    return _chunk_partial(chunk, countries, timeout, approximate)
+
+def _chunk_partial(chunk, countries, timeout, approximate):
+    visitor_codes, visitors = pd.factorize(chunk['IP Address'])
+    epochs = pd.to_datetime(chunk['Timestamp']).to_numpy('datetime64[s]').astype(np.int64)
+    dwell = sessions.dwell_times(visitor_codes, epochs, timeout)
+    seen = pd.Series(epochs).groupby(visitor_codes)
+    partial = {
+        'rows': len(chunk),
+        'countries': _counts(countries),
+        'endpoints': _counts(chunk['Endpoint']),
+        'duration': welford(dwell),
+        'sessions': sessions.count_sessions(visitor_codes, epochs, timeout),
+        'first_seen': pd.Series(seen.min().to_numpy(), index=pd.Index(visitors, dtype=object)),
+        'last_seen': pd.Series(seen.max().to_numpy(), index=pd.Index(visitors, dtype=object)),
+    }
+    if approximate:
+        # Each visitor's latest request is the last of its (visitor, time) sorted run
+        order = np.lexsort((epochs, visitor_codes))
+        latest = np.ones(len(order), dtype=bool)
+        latest[:-1] = visitor_codes[order[1:]] != visitor_codes[order[:-1]]
+        settled = np.ones(len(order), dtype=bool)
+        settled[order[latest]] = False
+        partial.update(
+            countries=sketches.top_k_add(sketches.top_k_new(), countries),
+            endpoints=sketches.top_k_add(sketches.top_k_new(), chunk['Endpoint']),
+            visitors=sketches.hll_add(sketches.hll_new(), visitors),
+            dwell=sketches.tdigest_add(sketches.tdigest_new(), dwell[settled]),
+        )
+    return partial
+
+def merge_partials(earlier, later, timeout=sessions.SESSION_TIMEOUT):
+    """
+    Merge the partial aggregates of two consecutive stretches of the log.
+
+    A visitor whose next request follows within the timeout across the
+    boundary continues the same session: their provisional 0 dwell time at
+    the end of the earlier stretch is replaced by the real gap.
+
+    Args:
+        earlier (dict): Partial aggregates of the earlier rows.
+        later (dict): Partial aggregates of the rows that follow.
+        timeout (int): Session inactivity timeout in seconds.
+
+    Returns:
+        dict: The partial aggregates of both stretches.
+    """
+    shared = earlier['last_seen'].index.intersection(later['first_seen'].index)
+    gaps = later['first_seen'][shared] - earlier['last_seen'][shared]
+    gaps = gaps[(gaps >= 0) & (gaps <= timeout)].to_numpy(dtype=np.float64)
+
+    duration = merge_welford(earlier['duration'], later['duration'])
+    if len(gaps):
+        duration = merge_welford(_remove_welford(duration, welford(np.zeros(len(gaps)))), welford(gaps))
+
+    merged = {
+        'rows': earlier['rows'] + later['rows'],
+        'duration': duration,
+        'sessions': earlier['sessions'] + later['sessions'] - len(gaps),
+        'first_seen': earlier['first_seen'].combine_first(later['first_seen']),
+        'last_seen': later['last_seen'].combine_first(earlier['last_seen']),
+    }
+    if 'visitors' in earlier:
+        # The earlier side's held-back dwell times of shared visitors are now known: a gap or an exit (0)
+        dwell = sketches.tdigest_merge(earlier['dwell'], later['dwell'])
+        dwell = sketches.tdigest_add(dwell, np.concatenate([gaps, np.zeros(len(shared) - len(gaps))]))
+        merged.update(
+            countries=sketches.merge(earlier['countries'], later['countries']),
+            endpoints=sketches.merge(earlier['endpoints'], later['endpoints']),
+            visitors=sketches.merge(earlier['visitors'], later['visitors']),
+            dwell=dwell,
+        )
+    else:
+        merged.update(
+            countries=earlier['countries'].add(later['countries'], fill_value=0).astype(np.int64),
+            endpoints=earlier['endpoints'].add(later['endpoints'], fill_value=0).astype(np.int64),
+        )
+    return merged
+
+def finalize_partials(partial, top_k=DEFAULT_TOP_K):
+    """
+    Turn merged partial aggregates into analysis results.
+
+    Args:
+        partial (dict): Merged partial aggregates.
+        top_k (int): Number of endpoints to keep in main_interests (None keeps all).
+
+    Returns:
+        dict: The same keys as summarize_logs.
+    """
+    count, mean, m2 = partial['duration']
+    approximate = 'visitors' in partial
+    if approximate:
+        visits_per_country = sketches.top_k_items(partial['countries'])
+        main_interests = sketches.top_k_items(partial['endpoints'])
+    else:
+        visits_per_country = partial['countries'].sort_values(ascending=False)
+        main_interests = partial['endpoints'].sort_values(ascending=False)
+    results = {
+        'visits_per_country': visits_per_country,
+        'main_interests': main_interests.head(top_k) if top_k else main_interests,
+        'average_duration': mean if count else math.nan,
+        'duration_std': math.sqrt(m2 / (count - 1)) if count > 1 else math.nan,
+        'sessions': partial['sessions'],
+        'average_session_length': count * mean / partial['sessions'] if partial['sessions'] else math.nan,
+        'average_pages_per_session': partial['rows'] / partial['sessions'] if partial['sessions'] else math.nan,
+    }
+    if approximate:
+        # Visitors still pending at the end of the log exited on their last page
+        dwell = sketches.tdigest_add(partial['dwell'], np.zeros(len(partial['last_seen'])))
+        results['unique_visitors'] = sketches.hll_count(partial['visitors'])
+        results['duration_percentiles'] = dict(zip(
+            DURATION_PERCENTILES, sketches.tdigest_quantile(dwell, DURATION_PERCENTILES).tolist()))
+    return results
+
+def _range_partial(task):
+    filename, first, last, use_geoip, timeout, approximate, start, end = task
+    chunk = log_store.read_csv_range(filename, first, last)
+    chunk = _in_time_range(chunk, start, end)
+    return partial_aggregates(chunk, _worker_reader if use_geoip else None, timeout, approximate)
+
+def _in_time_range(chunk, start, end):
+    if start is None and end is None:
+        return chunk
+    return chunk[log_store.time_mask(chunk['Timestamp'], start, end)]
+
+def _shard_partial(path, reader, chunk_bytes, timeout, approximate, start, end):
+    # Aggregate one shard chunk by chunk, then settle its pending visitors: the
+    # shard's sessions end with it, so the closed partial merges with any other
+    partials = (partial_aggregates(_in_time_range(chunk, start, end), reader, timeout, approximate)
+                for part in _log_files(path, start, end) for chunk in log_store.iter_csv_chunks(part, chunk_bytes))
+    partial = _fold_partials(partials, timeout, approximate)
+    if approximate:
+        partial['dwell'] = sketches.tdigest_add(partial['dwell'], np.zeros(len(partial['last_seen'])))
+    partial['first_seen'] = partial['first_seen'].iloc[:0]
+    partial['last_seen'] = partial['last_seen'].iloc[:0]
+    return partial
+
+def _shard_task(task):
+    path, use_geoip, *options = task
+    return _shard_partial(path, _worker_reader if use_geoip else None, *options)
+
+def _shard_rollup(task):
+    path, bucket = task
+    return rollup.build_rollup(log_store.load_table(path).to_pandas(), bucket)
+
+def rollup_shards(source=log_store.LOG_FILE, processes=1, bucket='h'):
+    """
+    Build the rollup cube of several log shards.
+
+    Each shard is loaded and rolled up on its own, by worker processes when
+    processes > 1, and the cubes are merged. No frame of all the rows is
+    ever built.
+
+    Args:
+        source (str or list): The log source, see log_store.shards.
+        processes (int): Worker processes.
+        bucket (str): Pandas frequency string for the time buckets.
+
+    Returns:
+        pd.DataFrame: The merged cube, as rollup.build_rollup returns.
+    """
+    tasks = [(path, bucket) for path in log_store.shards(source)]
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(min(processes, len(tasks))) as pool:
+            return rollup.merge_rollups(list(pool.map(_shard_rollup, tasks)))
+    return rollup.merge_rollups([_shard_rollup(task) for task in tasks])
+
+def cached_rollup(source=log_store.LOG_FILE):
+    """
+    Return the rollup cube of the logs, from the persistent result cache when possible.
+
+    On a miss the cube is built (shard by shard for several shards, see
+    rollup_shards) and stored, so other processes, restarts and replicas
+    map it from disk.
+
+    Args:
+        source (str or list): The log source, see log_store.shards.
+
+    Returns:
+        pd.DataFrame: The cube, as rollup.build_rollup returns.
+    """
+    def build():
+        if log_store.is_sharded(source):
+            return rollup_shards(source)
+        return rollup.build_rollup(log_store.load_logs(source))
+
+    return result_cache.cached('rollup', log_store.fingerprint(source), build)
+
+def _log_files(filename, start, end):
+    # A partitioned dataset is read partition by partition, skipping those outside the time range
+    return log_store.partitions(filename, start, end) if os.path.isdir(filename) else [filename]
+
+def analyze_logs_chunked(filename='web_server_logs.csv', reader=None, database=None, processes=1,
+                         chunk_bytes=log_store.DEFAULT_CHUNK_BYTES, top_k=DEFAULT_TOP_K,
+                         timeout=sessions.SESSION_TIMEOUT, approximate=False, start=None, end=None):
+    """
+    Analyze a log CSV in bounded-size chunks with flat memory use.
+
+    Each chunk is reduced to partial aggregates and merged in file order.
+    A partitioned dataset is read in time order, one partition after the
+    other, and partitions outside [start, end] are never opened.
+    With processes > 1 the file is split into line-aligned byte ranges that
+    worker processes parse and aggregate in parallel; they resolve
+    countries with their own reader opened from database.
+
+    Several shards (a glob or list, one log per web node) are instead
+    aggregated independently, one shard per worker process, and merged.
+    Sessions are followed within each shard, which is exact when the load
+    balancer keeps each visitor on one node; a visitor spread over nodes
+    counts one session per node.
+
+    Args:
+        filename (str or list): The log CSV file or partitioned dataset root, or a glob or list of shards.
+        reader (geoip2.database.Reader): Resolves countries in serial mode; None uses the Country column.
+        database (str): GeoIP2 database path for worker processes; None uses the Country column.
+        processes (int): Worker processes.
+        chunk_bytes (int): Approximate CSV bytes per chunk.
+        top_k (int): Number of endpoints to keep in main_interests.
+        timeout (int): Session inactivity timeout in seconds.
+        approximate (bool): Aggregate with fixed-memory sketches, see partial_aggregates.
+        start (datetime-like): Earliest request time to analyze, or None.
+        end (datetime-like): Latest request time to analyze, or None.
+
+    Returns:
+        dict: The same keys as summarize_logs.
+    """
+    if log_store.is_sharded(filename):
+        options = (chunk_bytes, timeout, approximate, start, end)
+        paths = log_store.shards(filename)
+        if processes > 1 and len(paths) > 1:
+            tasks = [(path, database is not None) + options for path in paths]
+            initializer, initargs = (_init_geoip_worker, (database,)) if database is not None else (None, ())
+            with ProcessPoolExecutor(min(processes, len(paths)), initializer=initializer, initargs=initargs) as pool:
+                result = _fold_partials(pool.map(_shard_task, tasks), timeout, approximate)
+        else:
+            result = _fold_partials((_shard_partial(path, reader, *options) for path in paths), timeout, approximate)
+        return finalize_partials(result, top_k)
+
+    files = _log_files(filename, start, end)
+    if processes > 1:
+        tasks = [(path, first, last, database is not None, timeout, approximate, start, end)
+                 for path in files for first, last in log_store.byte_ranges(path, chunk_bytes)]
+        initializer, initargs = (_init_geoip_worker, (database,)) if database is not None else (None, ())
+        with ProcessPoolExecutor(processes, initializer=initializer, initargs=initargs) as pool:
+            partials = pool.map(_range_partial, tasks)
+            result = _fold_partials(partials, timeout, approximate)
+    else:
+        partials = (partial_aggregates(_in_time_range(chunk, start, end), reader, timeout, approximate)
+                    for path in files for chunk in log_store.iter_csv_chunks(path, chunk_bytes))
+        result = _fold_partials(partials, timeout, approximate)
+    return finalize_partials(result, top_k)
+
+def _fold_partials(partials, timeout, approximate=False):
+    result = None
+    for partial in partials:
+        result = partial if result is None else merge_partials(result, partial, timeout)
+        # The running result is never merged as the later side, so first_seen is not needed,
+        # and visitors idle for longer than the timeout can no longer continue a session
+        latest = result['last_seen'].max()
+        active = result['last_seen'] >= latest - timeout
+        if approximate:
+            # Their held-back dwell times are final exits
+            result['dwell'] = sketches.tdigest_add(result['dwell'], np.zeros(int((~active).sum())))
+        result['first_seen'] = result['first_seen'].iloc[:0]
+        result['last_seen'] = result['last_seen'][active]
+    if result is None:
+        return partial_aggregates(log_store.LOG_SCHEMA.empty_table().to_pandas(), approximate=approximate)
+    return result
+
+def generate_visualizations(analysis_results, processes=1, directory='.'):
+    """
+    Generate visualizations from analysis results.
+
+    Charts are drawn on independent Agg figures (see report_export.render_chart),
+    in parallel worker processes when processes > 1.
 
     Args:
         analysis_results (dict): The analysis results.
-        filename (str): The name of the text file to save the report to.
+        processes (int): Worker processes rendering the charts.
+        directory (str): Where the PNG files go.
+
+    Returns:
+        list: The written chart paths.
+    """
+    return report_export.render_charts(report_export.chart_specs(analysis_results, directory), processes)
+
+def save_report(analysis_results, filename='report.txt', table_rows=report_export.MAX_TABLE_ROWS, charts=()):
     """
-    report = f"""
-    Report:
-    ---------
-    Number of Visits per Country:
-    {analysis_results['visits_per_country'].to_string()}
+    Save a report of the analysis results to a file.
 
-    Main Interests based on Viewed Endpoints:
-    {analysis_results['main_interests'].to_string()}
+    The report is written section by section, and each table is capped at
+    table_rows rows (the rest is summarized in one line).
 
-    Average Duration: {analysis_results['average_duration']} seconds
-    Standard Deviation of Duration: {analysis_results['duration_std']} seconds
+    Args:
+        analysis_results (dict): The analysis results.
+        filename (str): The report file; a '.html' or '.json' extension selects that format, anything else is text.
+        table_rows (int): Rows per table (None writes every row).
+        charts (list): Chart image paths to reference.
     """
-    with open(filename, "w", encoding='utf-8') as file:
-        file.write(report)
+    report_export.export_report(analysis_results, filename, table_rows=table_rows, charts=charts)
 
 if __name__ == "__main__":
-    logs = load_data()
-    reader = Reader('GeoLite2-City.mmdb')
-    analysis_results = analyze_logs(logs, reader)
-    generate_visualizations(analysis_results)
-    save_report(analysis_results)
+    parser = argparse.ArgumentParser(description="Analyze web server logs and write a report.")
+    parser.add_argument('--streaming', action='store_true', help="read the log in chunks with flat memory use")
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--approximate', action='store_true',
+                        help="count with fixed-memory sketches (adds unique visitors and duration percentiles)")
+    parser.add_argument('--input', nargs='+', default=['web_server_logs.csv'],
+                        help="log CSV or partitioned dataset root, or several shards (globs allowed)")
+    parser.add_argument('--start', default=None, help="earliest request time to analyze, e.g. '2024-05-23 00:00'")
+    parser.add_argument('--end', default=None, help="latest request time to analyze")
+    parser.add_argument('--chunk-mb', type=int, default=log_store.DEFAULT_CHUNK_BYTES // (1024 * 1024),
+                        help="CSV megabytes per chunk in streaming mode")
+    parser.add_argument('--report', default='report.txt', help="report file; .html or .json select that format")
+    parser.add_argument('--report-rows', type=int, default=report_export.MAX_TABLE_ROWS,
+                        help="rows per report table (0 writes every row)")
+    parser.add_argument('--segment-by', choices=report_export.SEGMENT_COLUMNS, default=None,
+                        help="instead, write one report per value of this column (uses the Country column, no GeoIP)")
+    parser.add_argument('--segments-dir', default='reports', help="directory for the per-segment reports")
+    parser.add_argument('--formats', default='text', help="comma-separated per-segment report formats (text,html,json)")
+    args = parser.parse_args()
+    table_rows = args.report_rows or None
+    source = args.input[0] if len(args.input) == 1 else args.input
+
+    if args.segment_by:
+        written = report_export.segment_reports(source, args.segment_by, args.segments_dir, args.processes,
+                                                args.formats.split(','), table_rows, start=args.start, end=args.end)
+        print(f"Wrote reports for {len(written)} segments to {args.segments_dir}")
+        raise SystemExit(0)
+
+    reader = Reader(GEOIP_DATABASE)
+    if args.streaming or log_store.is_sharded(source):
+        # Shards are always aggregated one per worker and merged, never concatenated
+        analysis_results = analyze_logs_chunked(source, reader=reader, database=GEOIP_DATABASE,
+                                                processes=args.processes, chunk_bytes=args.chunk_mb * 1024 * 1024,
+                                                top_k=DEFAULT_TOP_K if args.streaming else None,
+                                                approximate=args.approximate, start=args.start, end=args.end)
+    else:
+        logs = load_data(source, args.start, args.end)
+        analysis_results = analyze_logs(logs, reader, processes=args.processes, database=GEOIP_DATABASE,
+                                        approximate=args.approximate)
+    charts = generate_visualizations(analysis_results, processes=args.processes)
+    save_report(analysis_results, args.report, table_rows, charts)
     reader.close()
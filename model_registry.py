@@ -0,0 +1,165 @@
+import os
+
+import joblib
+import numpy as np
+from sklearn.linear_model import LinearRegression
+
+MODEL_DIR = 'models'
+MODEL_FILE = 'duration_by_hour.joblib'
+
+HOURS = 24
+
+# Every TEST_EVERY-th log row (by position) is held out for evaluation
+TEST_EVERY = 5
+
+def model_path():
+    """
+    Return where the duration-by-hour model is persisted.
+
+    Returns:
+        str: The joblib file path.
+    """
+    return os.path.join(MODEL_DIR, MODEL_FILE)
+
+def hour_statistics(data, first_row=0):
+    """
+    Summarize positive durations per hour of day for the train and test splits.
+
+    The sums are all a one-feature least-squares fit needs, and they can be
+    added together, so new rows update a model without revisiting old ones.
+
+    Args:
+        data (pd.DataFrame): Logs with 'Timestamp' and 'Duration' columns.
+        first_row (int): Position of data's first row in the full log (fixes the split).
+
+    Returns:
+        dict: 'train' and 'test' arrays of shape (3, 24): count, sum and sum of squares of Duration per hour.
+    """
+    positions = first_row + np.arange(len(data))
+    durations = data['Duration'].to_numpy(dtype=np.float64)
+    hours = data['Timestamp'].dt.hour.to_numpy()
+    keep = durations > 0
+
+    statistics = {}
+    for split, rows in (('train', keep & (positions % TEST_EVERY != 0)), ('test', keep & (positions % TEST_EVERY == 0))):
+        statistics[split] = np.vstack([
+            np.bincount(hours[rows], minlength=HOURS),
+            np.bincount(hours[rows], weights=durations[rows], minlength=HOURS),
+            np.bincount(hours[rows], weights=durations[rows] ** 2, minlength=HOURS),
+        ]).astype(np.float64)
+    return statistics
+
+def fit_statistics(statistics):
+    """
+    Fit Duration ~ Hour by least squares from per-hour sums.
+
+    Args:
+        statistics (dict): Output of hour_statistics (possibly accumulated).
+
+    Returns:
+        dict: Registry entry with the fitted 'model', its test 'mse' and an
+        hour -> prediction table in 'predictions'.
+    """
+    counts, sums, squares = statistics['train']
+    hours = np.arange(HOURS, dtype=np.float64)
+    total = counts.sum()
+    slope, intercept = 0.0, 0.0
+    if total:
+        mean_hour = (counts * hours).sum() / total
+        mean_duration = sums.sum() / total
+        spread = (counts * (hours - mean_hour) ** 2).sum()
+        if spread:
+            slope = ((hours - mean_hour) * (sums - counts * mean_duration)).sum() / spread
+        intercept = mean_duration - slope * mean_hour
+
+    model = LinearRegression()
+    model.coef_ = np.array([slope])
+    model.intercept_ = intercept
+    model.n_features_in_ = 1
+    predictions = intercept + slope * hours
+
+    # Test MSE from sums: sum over hours of sum((y - y_hat)^2) = sumsq - 2 y_hat sum + n y_hat^2
+    test_counts, test_sums, test_squares = statistics['test']
+    test_total = test_counts.sum()
+    errors = test_squares - 2 * predictions * test_sums + test_counts * predictions ** 2
+    mse = errors.sum() / test_total if test_total else float('nan')
+
+    return {'model': model, 'mse': mse, 'predictions': predictions, 'statistics': statistics}
+
+def train(data):
+    """
+    Fit the duration-by-hour model from scratch.
+
+    Args:
+        data (pd.DataFrame): Logs with 'Timestamp' and 'Duration' columns.
+
+    Returns:
+        dict: Registry entry, see fit_statistics.
+    """
+    return fit_statistics(hour_statistics(data))
+
+def load(path=None):
+    """
+    Load the persisted registry entry.
+
+    Args:
+        path (str): Model file (defaults to model_path()).
+
+    Returns:
+        dict or None: The entry, or None if nothing usable is stored.
+    """
+    try:
+        return joblib.load(path or model_path())
+    except (OSError, EOFError, ValueError, KeyError):
+        return None
+
+def save(entry, path=None):
+    path = path or model_path()
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    joblib.dump(entry, path + '.tmp')
+    os.replace(path + '.tmp', path)
+
+def update(data, source, path=None):
+    """
+    Bring the persisted model up to date with the logs.
+
+    If the stored model was trained on an earlier prefix of the same log
+    (same source, fewer rows), only the rows added since are summarized and
+    folded in. Otherwise the model is retrained from scratch. The result is
+    persisted either way.
+
+    Args:
+        data (pd.DataFrame): The full, append-only logs.
+        source (str): Identity of the log file (see log_store.identity).
+        path (str): Model file (defaults to model_path()).
+
+    Returns:
+        dict: Registry entry with 'model', 'mse', 'predictions', 'source' and 'rows'.
+    """
+    entry = load(path)
+    if entry is not None and entry.get('source') == source and entry.get('rows', -1) == len(data):
+        return entry
+
+    if entry is not None and entry.get('source') == source and entry.get('rows', len(data) + 1) < len(data):
+        new = hour_statistics(data.iloc[entry['rows']:], first_row=entry['rows'])
+        statistics = {split: entry['statistics'][split] + new[split] for split in new}
+    else:
+        statistics = hour_statistics(data)
+
+    entry = fit_statistics(statistics)
+    entry.update(source=source, rows=len(data))
+    save(entry, path)
+    return entry
+
+def predict(entry, hour):
+    """
+    Look up the predicted duration for an hour of the day.
+
+    Args:
+        entry (dict): Registry entry.
+        hour (int): Hour of the day (0-23).
+
+    Returns:
+        float: Predicted duration in seconds.
+    """
+    return float(entry['predictions'][hour])
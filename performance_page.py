@@ -0,0 +1,84 @@
+import streamlit as st
+import pandas as pd
+import altair as alt
+import instrumentation
+
+def stage_table(metrics):
+    """
+    Summarize every recorded stage.
+
+    Args:
+        metrics (dict): Output of instrumentation.snapshot.
+
+    Returns:
+        pd.DataFrame: Calls, total/mean seconds and histogram p50/p95 per stage, slowest in total first.
+    """
+    rows = []
+    for name, histogram in metrics['spans'].items():
+        rows.append({
+            'Stage': name,
+            'Calls': histogram['count'],
+            'Total (s)': histogram['sum'],
+            'Mean (ms)': histogram['sum'] / histogram['count'] * 1000 if histogram['count'] else 0.0,
+            'p50 (ms) ≤': instrumentation.quantile(histogram, 0.5, metrics['buckets']) * 1000,
+            'p95 (ms) ≤': instrumentation.quantile(histogram, 0.95, metrics['buckets']) * 1000,
+        })
+    columns = ['Stage', 'Calls', 'Total (s)', 'Mean (ms)', 'p50 (ms) ≤', 'p95 (ms) ≤']
+    return pd.DataFrame(rows, columns=columns).sort_values('Total (s)', ascending=False, ignore_index=True)
+
+def cache_table(metrics):
+    """
+    Summarize cache hits and misses.
+
+    Args:
+        metrics (dict): Output of instrumentation.snapshot.
+
+    Returns:
+        pd.DataFrame: Hits, misses and hit rate per cache.
+    """
+    rows = [{'Cache': name, 'Hits': counters['hits'], 'Misses': counters['misses'],
+             'Hit rate': counters['hits'] / (counters['hits'] + counters['misses'])
+             if counters['hits'] + counters['misses'] else 0.0}
+            for name, counters in sorted(metrics['caches'].items())]
+    return pd.DataFrame(rows, columns=['Cache', 'Hits', 'Misses', 'Hit rate'])
+
+def display_performance_page():
+    """
+    Display the latency and cache metrics recorded by this server process.
+    """
+    st.title('Performance')
+    st.caption("Per-stage timings and cache counts since the server started (or the last reset), "
+               "across every session of this process.")
+
+    metrics = instrumentation.snapshot()
+    if not metrics['spans'] and not metrics['caches']:
+        st.write("Nothing recorded yet. Open the other pages to collect timings.")
+        return
+
+    st.subheader('Stages')
+    stages = stage_table(metrics)
+    st.dataframe(stages, hide_index=True, use_container_width=True)
+
+    if not stages.empty:
+        stage = st.selectbox('Latency histogram for', stages['Stage'])
+        histogram = metrics['spans'][stage]
+        labels = [f"≤ {bound * 1000:g} ms" if bound != float('inf') else f"> {metrics['buckets'][-2] * 1000:g} ms"
+                  for bound in metrics['buckets']]
+        chart = alt.Chart(pd.DataFrame({'Bucket': labels, 'Calls': histogram['buckets']})).mark_bar().encode(
+            x=alt.X('Bucket', sort=None),  # bucket order, not alphabetical
+            y='Calls',
+            tooltip=['Bucket', 'Calls']
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+    st.subheader('Caches')
+    st.dataframe(cache_table(metrics), hide_index=True, use_container_width=True)
+
+    col1, col2, col3 = st.columns(3)
+    col1.download_button('Export Prometheus metrics', instrumentation.to_prometheus(metrics),
+                         file_name='metrics.prom', mime='text/plain')
+    col2.download_button('Export JSON metrics', instrumentation.to_json(metrics),
+                         file_name='metrics.json', mime='application/json')
+    if col3.button('Reset metrics'):
+        instrumentation.reset()
+        st.rerun()
@@ -1,65 +1,73 @@
 import streamlit as st
 import pandas as pd
-from sklearn.model_selection import train_test_split
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error
 from datetime import datetime
-
-@st.cache_data
-def load_data():
+import forecasting
+import instrumentation
+import log_store
+import model_registry
+import rendering
+import result_cache
+
+@instrumentation.timed('prediction.load_data')
+def load_data(start=None, end=None):
     """
     Load the web server log data for prediction.
 
+    Args:
+        start (datetime-like): Earliest request time to keep, or None.
+        end (datetime-like): Latest request time to keep, or None.
+
     Returns:
-        pd.DataFrame: A DataFrame containing the web server log data.
+        pd.DataFrame: A DataFrame containing the web server log data, with Timestamp already parsed.
     """
     try:
-        # Load the CSV file
-        data = pd.read_csv('web_server_logs.csv', names=[
-            'Timestamp', 'IP Address', 'Method', 'Endpoint', 'Status', 
-            'Country', 'Sports Activity', 'Device', 'Browser', 'Duration'
-        ], skiprows=1)  # Skip the header row
-
-        # Convert Timestamp to datetime
-        data['Timestamp'] = pd.to_datetime(data['Timestamp'], format='%Y-%m-%d %H:%M:%S')
-
-        return data
+        # Shared with the other pages; the store parses Timestamp as datetime64
+        return log_store.load_logs(start=start, end=end)
     except FileNotFoundError:
         st.error("Error: Web server log CSV file not found.")
         return pd.DataFrame()  # Return an empty DataFrame in case of error
 
+@instrumentation.timed('prediction.train_model')
 def train_model(data):
     """
     Train a simple linear regression model using only positive durations.
 
+    Every fifth log row is held out to report the Mean Squared Error.
+
     Args:
         data (pd.DataFrame): DataFrame containing the training data.
 
     Returns:
         sklearn.linear_model.LinearRegression: Trained linear regression model.
     """
-    # Filter out non-positive durations
-    data = data[data['Duration'] > 0]
-
-    # Extract hour from Timestamp
-    data['Hour'] = data['Timestamp'].dt.hour
-
-    X = data[['Hour']]  # Features
-    y = data['Duration']  # Target variable
+    entry = model_registry.train(data)
+    st.write(f"Mean Squared Error: {entry['mse']}")
+    return entry['model']
 
-    # Split the data into training and testing sets
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+@st.cache_resource(max_entries=4)
+def load_model(version, start=None, end=None):
+    """
+    Return the registered model for a log store version.
 
-    # Train the model
-    model = LinearRegression()
-    model.fit(X_train, y_train)
+    The persisted model is reused across sessions and restarts, and only the
+    rows appended since it was trained are folded in, so reruns (e.g. moving
+    the hour slider) never retrain. A model for a time range is trained on
+    that range alone and kept in the result cache.
 
-    # Evaluate the model
-    y_pred = model.predict(X_test)
-    mse = mean_squared_error(y_test, y_pred)
-    st.write(f"Mean Squared Error: {mse}")
+    Args:
+        version (str): log_store.version(), the cache key.
+        start (pd.Timestamp): Start of the time range, or None.
+        end (pd.Timestamp): End of the time range, or None.
 
-    return model
+    Returns:
+        dict: Registry entry with 'model', 'mse' and the hour -> duration 'predictions' table.
+    """
+    instrumentation.cache_miss('prediction.model')
+    if start is not None or end is not None:
+        return result_cache.cached('prediction.model', log_store.fingerprint(),
+                                   lambda: model_registry.train(log_store.load_logs(start=start, end=end)),
+                                   {'start': start, 'end': end})
+    return model_registry.update(log_store.load_logs(), log_store.identity())
 
 def predict_peak_visiting_time(model, hour):
     """
@@ -75,29 +83,89 @@ def predict_peak_visiting_time(model, hour):
     prediction = model.predict([[hour]])
     return prediction[0]
 
+@st.cache_resource(max_entries=4)
+def load_forecaster(version, interval, start=None, end=None):
+    """
+    Resample the logs and fit the request-volume forecaster, once per log version.
+
+    The fit persists in the result cache, so restarts and other replicas load it from disk.
+
+    Args:
+        version (str): log_store.version(), the cache key.
+        interval (str): 'min' or 'h'.
+        start (pd.Timestamp): Start of the history to fit on, or None.
+        end (pd.Timestamp): End of the history to fit on, or None.
+
+    Returns:
+        tuple: (request counts per interval, fitted forecaster).
+    """
+    instrumentation.cache_miss('prediction.forecaster')
+
+    def fit():
+        counts = forecasting.request_counts(log_store.load_logs(start=start, end=end), interval)
+        with instrumentation.span('prediction.fit_forecaster'):
+            return counts, forecasting.fit_forecaster(counts, interval)
+
+    return result_cache.cached('prediction.forecaster', log_store.fingerprint(), fit,
+                               {'interval': interval, 'start': start, 'end': end})
+
+def display_forecast(version, start=None, end=None):
+    """
+    Display the requests-per-interval forecast with its prediction interval.
+
+    Args:
+        version (str): log_store.version() of the loaded logs.
+        start (pd.Timestamp): Start of the history to fit on, or None.
+        end (pd.Timestamp): End of the history to fit on, or None.
+    """
+    st.header('Request Volume Forecast')
+    labels = {'Hourly': 'h', 'Per minute': 'min'}
+    interval = labels[st.radio('Interval:', list(labels), horizontal=True)]
+    horizon = st.slider('Intervals to forecast:', 1, 168 if interval == 'h' else 240, 24)
+
+    instrumentation.cache_lookup('prediction.forecaster')
+    counts, forecaster = load_forecaster(version, interval, start, end)
+    if counts.empty:
+        st.write("No data available for forecasting.")
+        return
+    with instrumentation.span('prediction.forecast'):
+        prediction = forecasting.forecast(forecaster, counts, horizon)
+
+    peak, row = forecasting.peak_interval(prediction)
+    st.write(f"Expected peak: {peak:%Y-%m-%d %H:%M} with about {int(row['Forecast'])} requests "
+             f"(80% interval {int(row['Lower'])}-{int(row['Upper'])})")
+    chart = pd.concat([counts.rename('Requests').astype(float), prediction], axis=1)
+    st.line_chart(chart)
+
 def display_prediction_page():
     """
     Display the prediction page.
     """
     st.title('Peak Duration Visit Time Predictor')
 
-    # Load data
-    data = load_data()
+    # Load data (only the selected time range)
+    start, end = rendering.time_range_filter()
+    data = load_data(start, end)
 
     if data.empty:
         st.write("No data available for prediction.")
         return
 
-    # Train model
-    model = train_model(data)
+    # Trained once per log version; new rows update the persisted model incrementally
+    instrumentation.cache_lookup('prediction.model')
+    with instrumentation.span('prediction.load_model'):
+        entry = load_model(log_store.version(), start, end)
+    st.write(f"Mean Squared Error: {entry['mse']}")
 
     # Prediction input
     hour = st.slider('Select hour:', 0, 23, 12)  # Default value is 12
 
-    # Predict peak visiting time
-    prediction = predict_peak_visiting_time(model, hour)
+    # Predict peak visiting time (a lookup in the precomputed hour table)
+    prediction = model_registry.predict(entry, hour)
 
     st.write(f"Predicted duration of visits at {hour}:00: {int(prediction)} seconds")
 
+    display_forecast(log_store.version(), start, end)
+
 if __name__ == '__main__':
     display_prediction_page()
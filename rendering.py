@@ -0,0 +1,179 @@
+import io
+from datetime import datetime, time
+
+import pandas as pd
+import streamlit as st
+
+import instrumentation
+import log_store
+
+# Raw rows sent to the browser per table page
+PAGE_SIZE = 100
+
+# Categories drawn per chart; the rest are summed into OTHER_LABEL
+MAX_CATEGORIES = 15
+OTHER_LABEL = 'Other'
+
+# Rendered chart specs and figures kept across reruns and sessions
+CHART_CACHE_SIZE = 256
+
+# Time-range presets, counted back from the latest request in the logs
+TIME_RANGES = {
+    'All time': None,
+    'Last hour': pd.Timedelta(hours=1),
+    'Last 24 hours': pd.Timedelta(hours=24),
+    'Last 7 days': pd.Timedelta(days=7),
+    'Custom': 'custom',
+}
+
+def page_bounds(num_rows, page, page_size=PAGE_SIZE):
+    """
+    Return the row range of a table page.
+
+    Args:
+        num_rows (int): Rows in the table.
+        page (int): 1-based page number (clamped to the valid range).
+        page_size (int): Rows per page.
+
+    Returns:
+        tuple: (start, end, number of pages).
+    """
+    pages = max(1, -(-num_rows // page_size))
+    page = min(max(page, 1), pages)
+    start = (page - 1) * page_size
+    return start, min(start + page_size, num_rows), pages
+
+def time_range_filter(filename=log_store.LOG_FILE):
+    """
+    Show the sidebar time-range selector shared by every page.
+
+    The widget key is the same on every page, so the selection carries over
+    when switching pages. Bounds come from the store's statistics, without
+    scanning rows.
+
+    Args:
+        filename (str): The log CSV file or partitioned dataset root.
+
+    Returns:
+        tuple: (start, end) pd.Timestamps, or (None, None) for all time.
+    """
+    try:
+        first, last = log_store.time_bounds(filename)
+    except FileNotFoundError:
+        return None, None
+    if first is None:
+        return None, None
+
+    choice = st.sidebar.selectbox('Time range', list(TIME_RANGES), key='time_range')
+    window = TIME_RANGES[choice]
+    if window is None:
+        return None, None
+    if window == 'custom':
+        dates = st.sidebar.date_input('Dates', value=(first.date(), last.date()),
+                                      min_value=first.date(), max_value=last.date(), key='time_range_dates')
+        if len(dates) != 2:
+            return None, None  # second date not picked yet
+        return pd.Timestamp(datetime.combine(dates[0], time.min)), pd.Timestamp(datetime.combine(dates[1], time.max))
+    return last - window, last
+
+def display_table(frame, key, columns=None, page_size=PAGE_SIZE):
+    """
+    Show a large frame one page at a time.
+
+    Only the current page is sliced (rows first, then columns) and sent to
+    the browser, so the payload does not grow with the frame.
+
+    Args:
+        frame (pd.DataFrame): The rows to show.
+        key (str): Unique widget key for the page selector.
+        columns (list): Columns to show (all if None).
+        page_size (int): Rows per page.
+    """
+    num_rows = len(frame)
+    pages = page_bounds(num_rows, 1, page_size)[2]
+    page = st.number_input('Page', min_value=1, max_value=pages, value=1, step=1, key=f'{key}_page')
+    start, end, _ = page_bounds(num_rows, int(page), page_size)
+    rows = frame.iloc[start:end]
+    st.dataframe(rows[columns] if columns is not None else rows)
+    st.caption(f"Rows {start + 1 if num_rows else 0}-{end} of {num_rows:,} (page {int(page)} of {pages})")
+
+def top_n(counts, n=MAX_CATEGORIES, other_label=OTHER_LABEL):
+    """
+    Keep the n largest categories and sum the rest into one bucket.
+
+    Args:
+        counts (pd.Series): Value per category.
+        n (int): Categories to keep.
+        other_label (str): Label of the bucket for the rest.
+
+    Returns:
+        pd.Series: At most n + 1 values, largest first, with the bucket last.
+    """
+    counts = counts.sort_values(ascending=False)
+    if len(counts) <= n + 1:
+        return counts
+    head = counts.iloc[:n]
+    head.index = head.index.astype(object)
+    return pd.concat([head, pd.Series([counts.iloc[n:].sum()], index=[other_label])])
+
+def top_n_frame(counts, label, value='count', n=MAX_CATEGORIES):
+    """
+    top_n as a two-column frame ready for charting.
+
+    Args:
+        counts (pd.Series): Value per category.
+        label (str): Name of the category column.
+        value (str): Name of the value column.
+        n (int): Categories to keep.
+
+    Returns:
+        pd.DataFrame: Columns label and value.
+    """
+    frame = top_n(counts, n).rename_axis(label).reset_index(name=value)
+    frame[label] = frame[label].astype(str)
+    return frame
+
+@st.cache_data(max_entries=CHART_CACHE_SIZE, show_spinner=False)
+def _chart_spec(key, _build):
+    instrumentation.cache_miss('rendering.chart')
+    return _build().to_dict()
+
+def display_chart(key, build):
+    """
+    Show an Altair chart whose spec is built once per key.
+
+    Building (aggregation included, when done inside build) and serializing
+    the chart only happen on a cache miss; reruns with the same key send the
+    cached spec.
+
+    Args:
+        key (tuple): Everything the chart depends on, e.g. chart name, store version and filter state.
+        build (callable): Returns the alt.Chart; called only on a miss.
+    """
+    instrumentation.cache_lookup('rendering.chart')
+    st.vega_lite_chart(_chart_spec(key, build), use_container_width=True)
+
+@st.cache_data(max_entries=CHART_CACHE_SIZE, show_spinner=False)
+def _pie_png(key, _counts):
+    instrumentation.cache_miss('rendering.pie')
+    from matplotlib.figure import Figure  # imported on the first pie rather than on every page load
+    # Figure (not pyplot) keeps no global state, so concurrent sessions can render safely
+    figure = Figure()
+    axes = figure.subplots()
+    axes.pie(_counts, labels=_counts.index, autopct='%1.1f%%', startangle=90)
+    axes.legend(_counts.index, loc="best", fontsize='small')
+    axes.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+def display_pie(key, counts):
+    """
+    Show a matplotlib pie chart of counts, rendered once per key.
+
+    Args:
+        key (tuple): Everything the chart depends on.
+        counts (pd.Series): Value per category (bucket with top_n first).
+    """
+    instrumentation.cache_lookup('rendering.pie')
+    st.image(_pie_png(key, counts), use_column_width=True)
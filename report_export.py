@@ -0,0 +1,321 @@
+import hashlib
+import html
+import json
+import math
+import os
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import log_store
+
+REPORT_FORMATS = ('text', 'html', 'json')
+
+# Rows written per report table; the rest is summarized in one line (None writes every row)
+MAX_TABLE_ROWS = 50
+
+# Bars drawn per chart; charts of thousands of categories are unreadable and slow to render
+MAX_CHART_BARS = 30
+
+# Columns segment reports can be split by
+SEGMENT_COLUMNS = ('Country', 'Sports Activity', 'Endpoint', 'Device', 'Browser')
+
+# (section title, results key, label column) of every table in a report
+REPORT_TABLES = (
+    ('Number of Visits per Country', 'visits_per_country', 'Country'),
+    ('Main Interests based on Viewed Endpoints', 'main_interests', 'Endpoint'),
+)
+
+# (label, results key, unit) of every scalar in a report, in order
+REPORT_VALUES = (
+    ('Average Duration', 'average_duration', 'seconds'),
+    ('Standard Deviation of Duration', 'duration_std', 'seconds'),
+    ('Sessions', 'sessions', ''),
+    ('Average Session Length', 'average_session_length', 'seconds'),
+    ('Average Pages per Session', 'average_pages_per_session', ''),
+    ('Unique Visitors (approximate)', 'unique_visitors', ''),
+)
+
+# (file stem, title, x label, results key) of every chart
+REPORT_CHARTS = (
+    ('visits_per_country', 'Number of Visits per Country', 'Country', 'visits_per_country'),
+    ('main_interests', 'Main Interests based on Viewed Endpoints', 'Endpoint', 'main_interests'),
+)
+
+def chart_specs(analysis_results, directory='.', prefix=''):
+    """
+    Describe the charts of a report as picklable specs for render_charts.
+
+    Args:
+        analysis_results (dict): The analysis results.
+        directory (str): Where the PNG files go.
+        prefix (str): Prepended to each file name, e.g. a segment name.
+
+    Returns:
+        list: One dict per chart with 'path', 'title', 'xlabel', 'labels' and 'values'.
+    """
+    specs = []
+    for stem, title, xlabel, key in REPORT_CHARTS:
+        counts = analysis_results[key].head(MAX_CHART_BARS)
+        specs.append({
+            'path': os.path.join(directory, f'{prefix}{stem}.png'),
+            'title': title,
+            'xlabel': xlabel,
+            'labels': [str(label) for label in counts.index],
+            'values': counts.to_numpy(dtype=np.float64),
+        })
+    return specs
+
+def render_chart(spec):
+    """
+    Render one bar chart spec to PNG with the Agg canvas.
+
+    A Figure bound to its own Agg canvas shares no pyplot state, so charts
+    can be drawn from several threads or processes at once.
+
+    Args:
+        spec (dict): A spec from chart_specs.
+
+    Returns:
+        str: The written path.
+    """
+    import seaborn as sns
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(10, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots()
+    if spec['labels']:
+        sns.barplot(x=spec['labels'], y=spec['values'], ax=axes)
+    axes.set_title(spec['title'])
+    axes.set_xlabel(spec['xlabel'])
+    axes.set_ylabel('Number of Visits')
+    axes.tick_params(axis='x', labelrotation=45)
+    figure.tight_layout()
+    figure.savefig(spec['path'])
+    return spec['path']
+
+def render_charts(specs, processes=1):
+    """
+    Render chart specs, in parallel worker processes when asked.
+
+    Args:
+        specs (list): Specs from chart_specs.
+        processes (int): Worker processes (1 renders in this process).
+
+    Returns:
+        list: The written paths, in spec order.
+    """
+    processes = min(processes, len(specs))
+    if processes <= 1:
+        return [render_chart(spec) for spec in specs]
+    with ProcessPoolExecutor(processes) as pool:
+        return list(pool.map(render_chart, specs))
+
+def _number(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if isinstance(value, np.generic) else value
+
+def _rows(counts, limit):
+    # (label, count) pairs to write, and the rows left out
+    shown = counts if limit is None else counts.head(limit)
+    return ((str(label), _number(value)) for label, value in shown.items()), len(counts) - len(shown)
+
+def _text_report(stream, analysis_results, title, table_rows, charts):
+    stream.write(f"{title}\n{'-' * len(title)}\n")
+    for section, key, _ in REPORT_TABLES:
+        counts = analysis_results[key]
+        rows, hidden = _rows(counts, table_rows)
+        stream.write(f"\n{section}:\n")
+        for label, value in rows:
+            stream.write(f"{label:<40} {value}\n")
+        if hidden:
+            stream.write(f"... {hidden} more ({len(counts)} in total, {counts.iloc[-hidden:].sum()} visits)\n")
+    stream.write("\n")
+    for label, key, unit in REPORT_VALUES:
+        if key in analysis_results:
+            stream.write(f"{label}: {analysis_results[key]}{' ' + unit if unit else ''}\n")
+    if 'duration_percentiles' in analysis_results:
+        percentiles = ', '.join(f"p{fraction * 100:g}: {value:.1f} s"
+                                for fraction, value in analysis_results['duration_percentiles'].items())
+        stream.write(f"Duration Percentiles (approximate): {percentiles}\n")
+    for path in charts:
+        stream.write(f"Chart: {path}\n")
+
+def _html_report(stream, analysis_results, title, table_rows, charts):
+    escape = html.escape
+    stream.write(f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{escape(title)}</title></head><body>\n")
+    stream.write(f"<h1>{escape(title)}</h1>\n<dl>\n")
+    for label, key, unit in REPORT_VALUES:
+        if key in analysis_results:
+            stream.write(f"<dt>{escape(label)}</dt><dd>{escape(str(analysis_results[key]))} {escape(unit)}</dd>\n")
+    if 'duration_percentiles' in analysis_results:
+        for fraction, value in analysis_results['duration_percentiles'].items():
+            stream.write(f"<dt>p{fraction * 100:g} Duration (approximate)</dt><dd>{value:.1f} seconds</dd>\n")
+    stream.write("</dl>\n")
+    for path in charts:
+        stream.write(f"<img src=\"{escape(os.path.basename(path))}\" alt=\"\">\n")
+    for section, key, column in REPORT_TABLES:
+        counts = analysis_results[key]
+        rows, hidden = _rows(counts, table_rows)
+        stream.write(f"<h2>{escape(section)}</h2>\n<table>\n<tr><th>{escape(column)}</th><th>Visits</th></tr>\n")
+        for label, value in rows:
+            stream.write(f"<tr><td>{escape(label)}</td><td>{value}</td></tr>\n")
+        stream.write("</table>\n")
+        if hidden:
+            stream.write(f"<p>{hidden} more rows not shown ({len(counts)} in total).</p>\n")
+    stream.write("</body></html>\n")
+
+def _json_report(stream, analysis_results, title, table_rows, charts):
+    # Written member by member, table rows one at a time, so no full document string is built
+    stream.write(f'{{"title": {json.dumps(title)}')
+    for label, key, _ in REPORT_VALUES:
+        if key in analysis_results:
+            stream.write(f', {json.dumps(key)}: {json.dumps(_number(analysis_results[key]))}')
+    if 'duration_percentiles' in analysis_results:
+        percentiles = {str(fraction): _number(value) for fraction, value in analysis_results['duration_percentiles'].items()}
+        stream.write(f', "duration_percentiles": {json.dumps(percentiles)}')
+    stream.write(f', "charts": {json.dumps(list(charts))}')
+    for _, key, _ in REPORT_TABLES:
+        counts = analysis_results[key]
+        rows, hidden = _rows(counts, table_rows)
+        stream.write(f', {json.dumps(key)}: {{"total_rows": {len(counts)}, "truncated": {json.dumps(bool(hidden))}, "rows": [')
+        for position, row in enumerate(rows):
+            stream.write((', ' if position else '') + json.dumps(row))
+        stream.write(']}')
+    stream.write('}\n')
+
+_WRITERS = {'text': _text_report, 'html': _html_report, 'json': _json_report}
+
+def write_report(analysis_results, stream, report_format='text', title='Report', table_rows=MAX_TABLE_ROWS, charts=()):
+    """
+    Write a report of the analysis results to a text stream, section by section.
+
+    Args:
+        analysis_results (dict): The analysis results.
+        stream (file-like): Text stream to write to.
+        report_format (str): One of REPORT_FORMATS.
+        title (str): The report title.
+        table_rows (int): Rows per table; the rest is summarized (None writes every row).
+        charts (list): Chart image paths to reference.
+    """
+    if report_format not in _WRITERS:
+        raise ValueError(f"Unknown report format {report_format!r}; expected one of {', '.join(REPORT_FORMATS)}.")
+    _WRITERS[report_format](stream, analysis_results, title, table_rows, charts)
+
+def report_format_for(filename):
+    """
+    Pick the report format from a file name's extension ('.html', '.json', anything else is text).
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    return {'.html': 'html', '.htm': 'html', '.json': 'json'}.get(extension, 'text')
+
+def export_report(analysis_results, filename, title='Report', table_rows=MAX_TABLE_ROWS, charts=()):
+    """
+    Write a report file in the format its extension names.
+
+    Args:
+        analysis_results (dict): The analysis results.
+        filename (str): The report file.
+        title (str): The report title.
+        table_rows (int): Rows per table; the rest is summarized (None writes every row).
+        charts (list): Chart image paths to reference.
+    """
+    with open(filename, 'w', encoding='utf-8') as file:
+        write_report(analysis_results, file, report_format_for(filename), title, table_rows, charts)
+
+def segment_file_name(value):
+    """
+    Turn a segment value into a safe file name stem.
+    """
+    stem = ''.join(character if character.isalnum() or character in '-_' else '_' for character in str(value))
+    return stem.strip('_') or 'unknown'
+
+def segment_file_names(values):
+    """
+    Give each segment value of an export its own file name stem.
+
+    Values whose stems would collide (e.g. 'Korea, Republic of' and 'Korea
+    Republic of', or stems differing only in case) get a short hash of the
+    raw value appended.
+
+    Args:
+        values (list): The segment values.
+
+    Returns:
+        dict: Segment value -> file name stem.
+    """
+    stems = {value: segment_file_name(value) for value in values}
+    counts = Counter(stem.casefold() for stem in stems.values())
+    return {
+        value: stem if counts[stem.casefold()] == 1
+        else f"{stem}_{hashlib.sha1(str(value).encode('utf-8')).hexdigest()[:8]}"
+        for value, stem in stems.items()
+    }
+
+def _segment_shard(filename, column, stems, output_dir, formats, table_rows, charts, start, end):
+    # One worker's share of segments: load once, split with one groupby, write each segment's files
+    import logs_analysis
+
+    logs = log_store.load_logs(filename, start, end)
+    logs = logs[logs[column].isin(list(stems))]
+    written = {}
+    for value, segment in logs.groupby(column, observed=True, sort=False):
+        results = logs_analysis.summarize_logs(segment)
+        stem = stems[value]
+        chart_paths = [render_chart(spec) for spec in chart_specs(results, output_dir, f'{stem}_')] if charts else []
+        paths = []
+        for report_format in formats:
+            extension = {'text': 'txt', 'html': 'html', 'json': 'json'}[report_format]
+            path = os.path.join(output_dir, f'{stem}.{extension}')
+            with open(path, 'w', encoding='utf-8') as file:
+                write_report(results, file, report_format, f'Report: {column} = {value}', table_rows, chart_paths)
+            paths.append(path)
+        written[str(value)] = paths + chart_paths
+    return written
+
+def segment_reports(filename=log_store.LOG_FILE, column='Country', output_dir='reports', processes=1,
+                    formats=('text',), table_rows=MAX_TABLE_ROWS, charts=True, start=None, end=None):
+    """
+    Write one report per value of a column, e.g. per country or per sport.
+
+    Segments are dealt round-robin (largest first) to worker processes. Each
+    worker loads the logs once from the store's on-disk cache, splits its
+    share with one groupby, and writes each segment's reports and charts.
+
+    Args:
+        filename (str): The log CSV file or partitioned dataset root.
+        column (str): One of SEGMENT_COLUMNS.
+        output_dir (str): Directory for the reports (created if missing).
+        processes (int): Worker processes.
+        formats (tuple): Report formats, from REPORT_FORMATS.
+        table_rows (int): Rows per table; the rest is summarized (None writes every row).
+        charts (bool): Also render each segment's charts.
+        start (datetime-like): Earliest request time to report on, or None.
+        end (datetime-like): Latest request time to report on, or None.
+
+    Returns:
+        dict: Segment value -> list of written files.
+    """
+    if column not in SEGMENT_COLUMNS:
+        raise ValueError(f"Cannot segment by {column!r}; expected one of {', '.join(SEGMENT_COLUMNS)}.")
+    os.makedirs(output_dir, exist_ok=True)
+    sizes = log_store.load_logs(filename, start, end)[column].value_counts()
+    values = list(sizes[sizes > 0].index)
+    processes = max(1, min(processes, len(values)))
+    stems = segment_file_names(values)
+    shards = [{value: stems[value] for value in values[position::processes]} for position in range(processes)]
+
+    tasks = [(filename, column, shard, output_dir, tuple(formats), table_rows, charts, start, end) for shard in shards]
+    written = {}
+    if processes == 1:
+        for task in tasks:
+            written.update(_segment_shard(*task))
+        return written
+    with ProcessPoolExecutor(processes) as pool:
+        for result in pool.map(_segment_shard, *zip(*tasks)):
+            written.update(result)
+    return written
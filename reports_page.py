@@ -1,17 +1,16 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
+import instrumentation
+import log_store
+import rendering
 
-# Load data with caching
-@st.cache_data
-def load_report_data():
+# Load data from the shared log store
+@instrumentation.timed('reports.load_data')
+def load_report_data(start=None, end=None):
     try:
-        # Load the CSV file
-        data = pd.read_csv('web_server_logs.csv', names=[
-            'Timestamp', 'IP Address', 'Method', 'Endpoint', 'Status', 
-            'Country', 'Sports Activity', 'Device', 'Browser', 'Duration'
-        ])
-        return data
+        # The store parses the CSV header once, so it is never read as a data row
+        return log_store.load_logs(start=start, end=end)
     except FileNotFoundError:
         st.error("Error: Report data CSV file not found.")
         return pd.DataFrame()  # Return an empty DataFrame in case of error
@@ -20,8 +19,9 @@ def display_reports():
     st.title('Standalone Reports Page Analysis')
     st.markdown('<style>div.block-container{padding-top:1rem;}</style>', unsafe_allow_html=True)
 
-    # Load data
-    report_data = load_report_data()
+    # Load data (only the selected time range)
+    start, end = rendering.time_range_filter()
+    report_data = load_report_data(start, end)
     if report_data.empty:
         st.write("No data available.")
         return
@@ -31,41 +31,54 @@ def display_reports():
 
     # 1) Table showcasing country, device, browser, endpoint
     st.subheader('Logs Table')
-    st.write(report_data[['Country', 'Device', 'Browser', 'Endpoint']])
+    # One page of rows at a time instead of the whole log
+    with instrumentation.span('reports.table'):
+        rendering.display_table(report_data, 'report_table', columns=['Country', 'Device', 'Browser', 'Endpoint'])
+
+    # Charts are aggregated and serialized once per store version and time range
+    version = (log_store.version(), str(start), str(end))
 
     # 2) Horizontal bar plot to show total number of visits by endpoint
     st.subheader('Total Number of Visits by Endpoint')
-    visits_by_endpoint = report_data['Endpoint'].value_counts().reset_index()
-    visits_by_endpoint.columns = ['Endpoint', 'Count']
-    bar_chart = alt.Chart(visits_by_endpoint).mark_bar().encode(
-        x='Count:Q',
-        y=alt.Y('Endpoint:N', sort='-x'),
-        color=alt.Color('Endpoint:N', scale=alt.Scale(scheme='category20')),
-        opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
-        tooltip=['Endpoint:N', 'Count:Q']
-    ).add_selection(
-        selection
-    ).properties(
-        title=''
-    )
 
-    st.altair_chart(bar_chart, use_container_width=True)
+    def endpoint_chart():
+        # Categorical value counts also list categories absent from the selected time range
+        counts = report_data['Endpoint'].value_counts()
+        visits_by_endpoint = rendering.top_n_frame(counts[counts > 0], 'Endpoint', 'Count')
+        return alt.Chart(visits_by_endpoint).mark_bar().encode(
+            x='Count:Q',
+            y=alt.Y('Endpoint:N', sort='-x'),
+            color=alt.Color('Endpoint:N', scale=alt.Scale(scheme='category20')),
+            opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
+            tooltip=['Endpoint:N', 'Count:Q']
+        ).add_selection(
+            selection
+        ).properties(
+            title=''
+        )
+
+    with instrumentation.span('reports.chart.endpoints'):
+        rendering.display_chart(('report_endpoints', version), endpoint_chart)
 
     # 3) Total number of people clicking on different sports to watch
     st.subheader('Clicks on Different Sports')
-    clicks_by_sports = report_data['Sports Activity'].value_counts().reset_index()
-    clicks_by_sports.columns = ['Sports Activity', 'Count']
-    pie_chart = alt.Chart(clicks_by_sports).mark_arc().encode(
-        theta='Count:Q',
-        color=alt.Color('Sports Activity:N', scale=alt.Scale(scheme='category20')),
-        opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
-        tooltip=['Sports Activity:N', 'Count:Q']
-    ).properties(
-        title=''
-    ).add_selection(
-        selection
-    )
 
-    st.altair_chart(pie_chart, use_container_width=True)
+    def sports_chart():
+        # Categorical value counts also list categories absent from the selected time range
+        counts = report_data['Sports Activity'].value_counts()
+        clicks_by_sports = rendering.top_n_frame(counts[counts > 0], 'Sports Activity', 'Count')
+        return alt.Chart(clicks_by_sports).mark_arc().encode(
+            theta='Count:Q',
+            color=alt.Color('Sports Activity:N', scale=alt.Scale(scheme='category20')),
+            opacity=alt.condition(selection, alt.value(1), alt.value(0.2)),
+            tooltip=['Sports Activity:N', 'Count:Q']
+        ).properties(
+            title=''
+        ).add_selection(
+            selection
+        )
+
+    with instrumentation.span('reports.chart.sports'):
+        rendering.display_chart(('report_sports', version), sports_chart)
 
 # This should be called in `app.py`, so no need to run it here
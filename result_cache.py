@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+import uuid
+
+import joblib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+import instrumentation
+
+# Shared by every process using the same directory: Streamlit sessions, API workers, restarts and replicas
+CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '.result_cache')
+
+# Least recently used entries are evicted once the cache holds more than this many bytes
+MAX_CACHE_BYTES = int(os.getenv('RESULT_CACHE_BYTES', 1024 ** 3))
+
+# Entry file per kind of value: Arrow tables and DataFrames as uncompressed IPC files
+# (memory-mapped on read), anything else with joblib (numpy arrays memory-mapped on read)
+SUFFIXES = {'table': '.arrow', 'frame': '.frame.arrow', 'object': '.joblib'}
+
+def cache_key(namespace, fingerprint, params=None):
+    """
+    Derive the content address of a result.
+
+    Args:
+        namespace (str): What is cached, e.g. 'dashboard.rollup'.
+        fingerprint (str): Fingerprint of the input data, e.g. log_store.fingerprint().
+        params (dict): The parameters the result depends on (JSON-serializable, or
+            converted with str, e.g. timestamps).
+
+    Returns:
+        str: Hex digest naming the entry.
+    """
+    payload = json.dumps([namespace, fingerprint, params or {}], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _path(key, kind):
+    return os.path.join(CACHE_DIR, key[:2], key + SUFFIXES[kind])
+
+def _kind(value):
+    if isinstance(value, pa.Table):
+        return 'table'
+    if isinstance(value, pd.DataFrame):
+        return 'frame'
+    return 'object'
+
+def _read(path, kind):
+    if kind == 'object':
+        return joblib.load(path, mmap_mode='r')
+    # Buffers of a memory-mapped IPC file are views on the page cache, not copies
+    table = ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    if kind == 'table':
+        return table
+    # Numeric columns without nulls stay views on the mapped file
+    return table.to_pandas(split_blocks=True)
+
+def _write(path, value, kind):
+    if kind == 'object':
+        joblib.dump(value, path)
+        return
+    table = value if kind == 'table' else pa.Table.from_pandas(value)
+    # An IPC file holds one dictionary per column, so chunks must share it
+    table = table.unify_dictionaries()
+    with pa.OSFile(path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+
+def get(key, default=None):
+    """
+    Look up a result by key.
+
+    A hit marks the entry as recently used. Unreadable entries (e.g. left by
+    an older version of a cached type) are dropped and count as misses.
+
+    Args:
+        key (str): The key from cache_key.
+        default: Returned on a miss.
+
+    Returns:
+        The cached value (read-only where memory-mapped), or default.
+    """
+    for kind in SUFFIXES:
+        path = _path(key, kind)
+        try:
+            value = _read(path, kind)
+        except FileNotFoundError:
+            continue
+        except (OSError, EOFError, ValueError, KeyError, AttributeError, ImportError):
+            _remove(path)
+            continue
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted meanwhile; the mapped value stays valid
+        return value
+    return default
+
+def put(key, value):
+    """
+    Store a result under a key, then evict old entries beyond MAX_CACHE_BYTES.
+
+    The entry is written to a temporary file and renamed into place, so
+    concurrent readers never see a partial entry, and concurrent writers of
+    the same key (which hold the same content) simply replace each other.
+
+    Args:
+        key (str): The key from cache_key.
+        value: A pa.Table, a pd.DataFrame or any joblib-serializable object.
+    """
+    kind = _kind(value)
+    path = _path(key, kind)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        _write(tmp, value, kind)
+        os.replace(tmp, path)
+    except OSError:
+        _remove(tmp)  # e.g. the entry is mapped by another process on a platform that forbids replacing it
+    evict()
+
+def cached(namespace, fingerprint, compute, params=None):
+    """
+    Return a cached result, computing and storing it on a miss.
+
+    Lookups are counted in the instrumentation as cache 'result_cache.<namespace>'.
+
+    Args:
+        namespace (str): What is cached.
+        fingerprint (str): Fingerprint of the input data.
+        compute (callable): Builds the result; called only on a miss.
+        params (dict): The parameters the result depends on.
+
+    Returns:
+        The result. On a miss the freshly computed value is returned, not a re-read copy.
+    """
+    key = cache_key(namespace, fingerprint, params)
+    value = get(key)
+    instrumentation.cache_lookup(f'result_cache.{namespace}', hit=value is not None)
+    if value is None:
+        value = compute()
+        put(key, value)
+    return value
+
+def _entries():
+    for directory, _, names in os.walk(CACHE_DIR):
+        for name in names:
+            if name.endswith('.tmp'):
+                continue
+            path = os.path.join(directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            yield stat.st_mtime_ns, stat.st_size, path
+
+def evict(max_bytes=None):
+    """
+    Remove least recently used entries until the cache fits in max_bytes.
+
+    Args:
+        max_bytes (int): Size bound (defaults to MAX_CACHE_BYTES).
+
+    Returns:
+        int: The bytes the cache holds afterwards.
+    """
+    max_bytes = MAX_CACHE_BYTES if max_bytes is None else max_bytes
+    entries = sorted(_entries())
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in entries:
+        if total <= max_bytes:
+            break
+        if _remove(path):
+            total -= size
+    return total
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except OSError:
+        return False
+
+def clear():
+    """
+    Remove every cached result.
+    """
+    shutil.rmtree(CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+# Dimensions the dashboard filters and charts on
+ROLLUP_DIMENSIONS = ['Country', 'Sports Activity', 'Endpoint', 'Device', 'Browser', 'Status']
+
+TIME_BUCKET = 'Time Bucket'
+
+# Measures stored per cell; mean and standard deviation are derived from them
+MEASURES = ['count', 'duration_sum', 'duration_sumsq']
+
+def build_rollup(logs, bucket='h'):
+    """
+    Pre-aggregate logs into a rollup cube.
+
+    Each row of the cube is one observed combination of ROLLUP_DIMENSIONS and
+    time bucket, holding the request count and the sum and sum of squares of
+    Duration. Any filter on those dimensions followed by a count, mean or
+    standard deviation can be answered from the cube alone.
+
+    Args:
+        logs (pd.DataFrame): The web server logs.
+        bucket (str): Pandas frequency string for the time buckets.
+
+    Returns:
+        pd.DataFrame: The cube, one row per non-empty cell.
+    """
+    if logs.empty:
+        return pd.DataFrame(columns=ROLLUP_DIMENSIONS + [TIME_BUCKET] + MEASURES)
+
+    duration = logs['Duration'].to_numpy(dtype=np.float64)
+    keys = [logs[dimension] for dimension in ROLLUP_DIMENSIONS]
+    keys.append(logs['Timestamp'].dt.floor(bucket).rename(TIME_BUCKET))
+    measures = pd.DataFrame({
+        'count': np.ones(len(logs), dtype=np.int64),
+        'duration_sum': duration,
+        'duration_sumsq': duration * duration,
+    }, index=logs.index)
+    return measures.groupby(keys, observed=True, sort=False).sum().reset_index()
+
+def merge_rollups(cubes):
+    """
+    Merge cubes built from disjoint sets of rows into one.
+
+    Args:
+        cubes (list): Cubes returned by build_rollup.
+
+    Returns:
+        pd.DataFrame: The combined cube.
+    """
+    cubes = [cube for cube in cubes if not cube.empty]
+    if not cubes:
+        return build_rollup(pd.DataFrame())
+    combined = pd.concat(cubes, ignore_index=True)
+    keys = ROLLUP_DIMENSIONS + [TIME_BUCKET]
+    return combined.groupby(keys, observed=True, sort=False)[MEASURES].sum().reset_index()
+
+def count_by(cube, dimension):
+    """
+    Count requests per value of a dimension.
+
+    Args:
+        cube (pd.DataFrame): The (filtered) rollup cube.
+        dimension (str): The dimension to group by.
+
+    Returns:
+        pd.Series: Request counts indexed by dimension value, largest first.
+    """
+    counts = cube.groupby(dimension, observed=True)['count'].sum()
+    return counts[counts > 0].sort_values(ascending=False)
+
+def duration_stats_by(cube, dimension):
+    """
+    Compute Duration mean and standard deviation per value of a dimension.
+
+    Args:
+        cube (pd.DataFrame): The (filtered) rollup cube.
+        dimension (str): The dimension to group by.
+
+    Returns:
+        pd.DataFrame: Columns 'count', 'mean' and 'std', indexed by dimension value.
+    """
+    sums = cube.groupby(dimension, observed=True)[MEASURES].sum()
+    sums = sums[sums['count'] > 0]
+    return _duration_stats(sums)
+
+def _duration_stats(sums):
+    count = sums['count'].astype(np.float64)
+    mean = sums['duration_sum'] / count
+    # Sample variance from the sums, matching pandas' default ddof=1
+    variance = (sums['duration_sumsq'] - count * mean * mean) / (count - 1)
+    return pd.DataFrame({
+        'count': sums['count'],
+        'mean': mean,
+        'std': np.sqrt(variance.clip(lower=0)).where(count > 1),
+    })
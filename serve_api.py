@@ -0,0 +1,115 @@
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+
+from werkzeug.serving import make_server
+
+import api_flask
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+
+def bind_socket(host, port, backlog=1024):
+    """
+    Create the listening socket shared by every worker.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        backlog (int): Listen queue length.
+
+    Returns:
+        socket.socket: The bound, listening socket.
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def run_worker(sock, host, port):
+    """
+    Serve the API on an inherited socket until terminated.
+
+    Args:
+        sock (socket.socket): The shared listening socket.
+        host (str): Interface the socket is bound to.
+        port (int): Port the socket is bound to.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    server = make_server(host, port, api_flask.app, threaded=True, fd=sock.fileno())
+    server.daemon_threads = True
+    server.serve_forever()
+
+def spawn_worker(sock, host, port):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, host, port)
+        finally:
+            os._exit(0)
+    return pid
+
+def serve(host='127.0.0.1', port=8000, workers=DEFAULT_WORKERS):
+    """
+    Run the analysis API with pre-forked worker processes.
+
+    The log dataset is loaded once in the parent before forking, so workers
+    share the parent's in-memory DataFrame and filter index copy-on-write
+    instead of each parsing and holding a private copy. Rows appended later
+    are ingested by the first worker to see them, under the log store's
+    dataset lock; the others load its Parquet parts rather than parsing the
+    CSV again. Each worker serves requests on threads. Dead workers are
+    replaced; SIGINT/SIGTERM stop all of them.
+
+    Args:
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        workers (int): Number of worker processes.
+    """
+    sock = bind_socket(host, port)
+    try:
+        api_flask.load_dataset()
+    except FileNotFoundError:
+        print("Warning: log data not found; workers will load it on first request.", file=sys.stderr)
+    # Keep the warm objects out of the collector so its bookkeeping does not unshare their pages
+    gc.freeze()
+
+    children = {spawn_worker(sock, host, port) for _ in range(workers)}
+    print(f"Serving on http://{host}:{port} with {workers} workers", file=sys.stderr)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, _ = os.wait()
+        except ChildProcessError:
+            break
+        children.discard(pid)
+        if not stopping:
+            children.add(spawn_worker(sock, host, port))
+    sock.close()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve the log analysis API with multiple worker processes.")
+    parser.add_argument('--host', default='127.0.0.1', help="interface to bind")
+    parser.add_argument('--port', type=int, default=8000, help="port to bind")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="worker processes")
+    args = parser.parse_args()
+
+    serve(args.host, args.port, args.workers)
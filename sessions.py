@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+# A visitor's requests more than this many seconds apart start a new session
+SESSION_TIMEOUT = 1800
+
+SESSION_COLUMNS = ['IP Address', 'Session Start', 'Session End', 'Length', 'Pages', 'Dwell Time']
+
+def _epochs(timestamps):
+    return pd.to_datetime(timestamps).to_numpy('datetime64[s]').astype(np.int64)
+
+def _segments(visitor_codes, epochs, timeout):
+    # One sort by (visitor, time); a session starts at a new visitor or after a gap above timeout
+    order = np.lexsort((epochs, visitor_codes))
+    visitors, times = visitor_codes[order], epochs[order]
+    gaps = np.diff(times)
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = (visitors[1:] != visitors[:-1]) | (gaps > timeout)
+    return order, times, gaps, starts
+
+def dwell_times(visitor_codes, epochs, timeout=SESSION_TIMEOUT):
+    """
+    Compute how long each request's page was viewed.
+
+    A request's dwell time is the gap to the same visitor's next request in
+    the same session; exit pages (no next request in the session) get 0.
+
+    Args:
+        visitor_codes (np.ndarray): Integer visitor id per request (e.g. factorized IPs).
+        epochs (np.ndarray): Request time per request, in epoch seconds.
+        timeout (int): Inactivity timeout in seconds.
+
+    Returns:
+        np.ndarray: Dwell seconds per request, in input order.
+    """
+    order, _, gaps, starts = _segments(np.asarray(visitor_codes), np.asarray(epochs), timeout)
+    dwell_sorted = np.zeros(len(order), dtype=np.float64)
+    dwell_sorted[:-1] = np.where(starts[1:], 0, gaps)
+    dwell = np.empty_like(dwell_sorted)
+    dwell[order] = dwell_sorted
+    return dwell
+
+def count_sessions(visitor_codes, epochs, timeout=SESSION_TIMEOUT):
+    """
+    Count sessions without materializing them.
+
+    Args:
+        visitor_codes (np.ndarray): Integer visitor id per request.
+        epochs (np.ndarray): Request time per request, in epoch seconds.
+        timeout (int): Inactivity timeout in seconds.
+
+    Returns:
+        int: The number of sessions.
+    """
+    if len(epochs) == 0:
+        return 0
+    return int(_segments(np.asarray(visitor_codes), np.asarray(epochs), timeout)[3].sum())
+
+def _session_arrays(visitors, epochs, timeout):
+    if len(epochs) == 0:
+        return {'visitors': np.empty(0, dtype=object), 'start': np.empty(0, dtype=np.int64),
+                'end': np.empty(0, dtype=np.int64), 'pages': np.empty(0, dtype=np.int64)}
+    codes, uniques = pd.factorize(visitors)
+    order, times, _, starts = _segments(codes, epochs, timeout)
+    first = np.flatnonzero(starts)
+    last = np.append(first[1:], len(order)) - 1
+    return {
+        'visitors': np.asarray(uniques, dtype=object)[codes[order[first]]],
+        'start': times[first],
+        'end': times[last],
+        'pages': last - first + 1,
+    }
+
+def _session_frame(sessions):
+    length = (sessions['end'] - sessions['start']).astype(np.float64)
+    pages = sessions['pages']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        dwell = np.where(pages > 1, length / (pages - 1), np.nan)
+    return pd.DataFrame({
+        'IP Address': sessions['visitors'],
+        'Session Start': sessions['start'].astype('datetime64[s]'),
+        'Session End': sessions['end'].astype('datetime64[s]'),
+        'Length': length,
+        'Pages': pages,
+        'Dwell Time': dwell,
+    }, columns=SESSION_COLUMNS)
+
+def sessionize(logs, timeout=SESSION_TIMEOUT):
+    """
+    Group requests into per-visitor sessions.
+
+    Args:
+        logs (pd.DataFrame): Logs with 'IP Address' and 'Timestamp' columns.
+        timeout (int): Inactivity timeout in seconds.
+
+    Returns:
+        pd.DataFrame: One row per session with its visitor, start and end
+        times, Length (seconds), Pages (requests) and Dwell Time (mean
+        seconds per page with a next page; NaN for single-page sessions).
+    """
+    visitors = np.asarray(logs['IP Address'], dtype=object)
+    return _session_frame(_session_arrays(visitors, _epochs(logs['Timestamp']), timeout))
@@ -0,0 +1,275 @@
+import math
+
+import joblib
+import numpy as np
+import pandas as pd
+
+# HyperLogLog registers are 2**HLL_PRECISION bytes; relative error is about 1.04 / sqrt(2**precision)
+HLL_PRECISION = 14
+
+# Keys tracked by a top-k (Space-Saving) summary
+TOP_K_CAPACITY = 1000
+
+# t-digest compression: about COMPRESSION / 2 centroids, finest at the tails
+TDIGEST_COMPRESSION = 200
+
+def _hashes(values):
+    # 64-bit hashes; categoricals hash each category once
+    if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+        values = pd.Categorical(values)  # a Series, CategoricalIndex or Categorical
+        codes = values.codes
+        hashed = pd.util.hash_array(np.asarray(values.categories, dtype=object), categorize=False)
+        return hashed[codes[codes >= 0]]
+    values = np.asarray(values, dtype=object)
+    return pd.util.hash_array(values[pd.notna(values)], categorize=False)
+
+def _bit_length(values):
+    # Bit length of uint64 values; each 32-bit half converts to float64 exactly
+    high = np.frexp((values >> np.uint64(32)).astype(np.float64))[1]
+    low = np.frexp((values & np.uint64(0xFFFFFFFF)).astype(np.float64))[1]
+    return np.where(high > 0, high + 32, low)
+
+def hll_new(precision=HLL_PRECISION):
+    """
+    Create an empty HyperLogLog distinct-count sketch.
+
+    Args:
+        precision (int): log2 of the number of registers (4-18).
+
+    Returns:
+        dict: The sketch.
+    """
+    return {'kind': 'hll', 'precision': precision, 'registers': np.zeros(1 << precision, dtype=np.uint8)}
+
+def hll_add(sketch, values):
+    """
+    Add values to a HyperLogLog sketch (in place).
+
+    Adding a value again has no effect, so passing only the distinct values
+    (e.g. the uniques of a factorize already at hand) gives the same sketch faster.
+
+    Args:
+        sketch (dict): The sketch returned by hll_new.
+        values (array-like): Values to count; missing values are ignored.
+
+    Returns:
+        dict: The same sketch.
+    """
+    precision = sketch['precision']
+    hashes = _hashes(values)
+    if len(hashes) == 0:
+        return sketch
+    rest_bits = 64 - precision
+    registers = (hashes >> np.uint64(rest_bits)).astype(np.intp)
+    rest = hashes & np.uint64((1 << rest_bits) - 1)
+    ranks = (rest_bits - _bit_length(rest) + 1).astype(np.uint8)
+    np.maximum.at(sketch['registers'], registers, ranks)
+    return sketch
+
+def hll_merge(a, b):
+    """
+    Combine two HyperLogLog sketches of the same precision.
+
+    Returns:
+        dict: A sketch of the union of both inputs.
+    """
+    if a['precision'] != b['precision']:
+        raise ValueError("HyperLogLog sketches must have the same precision to merge.")
+    return {**a, 'registers': np.maximum(a['registers'], b['registers'])}
+
+def hll_count(sketch):
+    """
+    Estimate the number of distinct values added to a HyperLogLog sketch.
+
+    Returns:
+        int: The estimate.
+    """
+    registers = sketch['registers']
+    size = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / size)
+    estimate = alpha * size * size / np.ldexp(1.0, -registers.astype(np.int64)).sum()
+    empty = int((registers == 0).sum())
+    if estimate <= 2.5 * size and empty:
+        estimate = size * math.log(size / empty)  # linear counting for small cardinalities
+    return int(round(estimate))
+
+def top_k_new(capacity=TOP_K_CAPACITY):
+    """
+    Create an empty Space-Saving heavy-hitter summary.
+
+    At most capacity keys are tracked. Each tracked count overestimates the
+    true count by at most 'floor', and no untracked key occurs more than
+    'floor' times.
+
+    Args:
+        capacity (int): Number of keys kept.
+
+    Returns:
+        dict: The summary.
+    """
+    return {'kind': 'top_k', 'capacity': capacity, 'counts': pd.Series([], dtype=np.int64), 'floor': 0, 'total': 0}
+
+def _truncate(counts, capacity, floor):
+    counts = counts.sort_values(ascending=False, kind='stable')
+    if len(counts) > capacity:
+        floor = max(floor, int(counts.iloc[capacity]))
+        counts = counts.iloc[:capacity]
+    return counts, floor
+
+def top_k_merge(a, b):
+    """
+    Combine two heavy-hitter summaries.
+
+    A key missing from one side is assumed to have occurred up to that
+    side's floor times, so estimates stay upper bounds.
+
+    Returns:
+        dict: The summary of both inputs, with the smaller capacity.
+    """
+    keys = a['counts'].index.union(b['counts'].index)
+    combined = (a['counts'].reindex(keys, fill_value=a['floor'])
+                + b['counts'].reindex(keys, fill_value=b['floor']))
+    capacity = min(a['capacity'], b['capacity'])
+    counts, floor = _truncate(combined.astype(np.int64), capacity, a['floor'] + b['floor'])
+    return {'kind': 'top_k', 'capacity': capacity, 'counts': counts, 'floor': floor, 'total': a['total'] + b['total']}
+
+def top_k_add(sketch, values):
+    """
+    Add values to a heavy-hitter summary.
+
+    Args:
+        sketch (dict): The summary returned by top_k_new.
+        values (array-like): Keys to count.
+
+    Returns:
+        dict: The updated summary.
+    """
+    counts = pd.Series(values).value_counts()
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(object)
+    counts, floor = _truncate(counts.astype(np.int64), sketch['capacity'], 0)
+    chunk = {'kind': 'top_k', 'capacity': sketch['capacity'], 'counts': counts, 'floor': floor,
+             'total': int(len(values))}
+    return top_k_merge(sketch, chunk)
+
+def top_k_items(sketch, k=None):
+    """
+    Return the heaviest keys of a summary.
+
+    Args:
+        sketch (dict): The summary.
+        k (int): Number of keys (None returns every tracked key).
+
+    Returns:
+        pd.Series: Estimated count per key, largest first.
+    """
+    counts = sketch['counts']
+    return counts.head(k) if k else counts
+
+def tdigest_new(compression=TDIGEST_COMPRESSION):
+    """
+    Create an empty t-digest quantile sketch.
+
+    Args:
+        compression (int): Accuracy/size trade-off; about compression / 2 centroids are kept.
+
+    Returns:
+        dict: The digest.
+    """
+    return {'kind': 'tdigest', 'compression': compression, 'means': np.empty(0), 'weights': np.empty(0),
+            'min': math.inf, 'max': -math.inf}
+
+def _compress(digest, means, weights):
+    # Merge sorted centroids whose cumulative-weight midpoints share a unit of the arcsine scale,
+    # which keeps centroids small near the tails and large around the median
+    order = np.argsort(means, kind='stable')
+    means, weights = means[order], weights[order]
+    compression = digest['compression']
+    quantiles = (np.cumsum(weights) - weights / 2) / weights.sum()
+    scale = compression / (2 * math.pi) * np.arcsin(np.clip(2 * quantiles - 1, -1, 1))
+    buckets = np.floor(scale + compression / 4).astype(np.intp)
+    merged_weights = np.bincount(buckets, weights=weights)
+    used = merged_weights > 0
+    merged_means = np.bincount(buckets, weights=means * weights)[used] / merged_weights[used]
+    return {**digest, 'means': merged_means, 'weights': merged_weights[used]}
+
+def tdigest_add(digest, values):
+    """
+    Add values to a t-digest.
+
+    Args:
+        digest (dict): The digest returned by tdigest_new.
+        values (array-like): Observations; NaNs are ignored.
+
+    Returns:
+        dict: The updated digest.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return digest
+    digest = {**digest, 'min': min(digest['min'], float(values.min())), 'max': max(digest['max'], float(values.max()))}
+    return _compress(digest, np.concatenate([digest['means'], values]),
+                     np.concatenate([digest['weights'], np.ones(len(values))]))
+
+def tdigest_merge(a, b):
+    """
+    Combine two t-digests.
+
+    Returns:
+        dict: A digest of both inputs, with the smaller compression.
+    """
+    digest = {**a, 'compression': min(a['compression'], b['compression']),
+              'min': min(a['min'], b['min']), 'max': max(a['max'], b['max'])}
+    if len(b['weights']) == 0:
+        return digest
+    return _compress(digest, np.concatenate([a['means'], b['means']]), np.concatenate([a['weights'], b['weights']]))
+
+def tdigest_quantile(digest, fraction):
+    """
+    Estimate a quantile from a t-digest.
+
+    Args:
+        digest (dict): The digest.
+        fraction (float or array-like): Quantile(s) in [0, 1].
+
+    Returns:
+        float or np.ndarray: The estimate(s); NaN for an empty digest.
+    """
+    weights = digest['weights']
+    if len(weights) == 0:
+        return np.full(np.shape(fraction), np.nan) if np.ndim(fraction) else math.nan
+    total = weights.sum()
+    centers = np.cumsum(weights) - weights / 2
+    positions = np.concatenate([[0.0], centers, [total]])
+    values = np.concatenate([[digest['min']], digest['means'], [digest['max']]])
+    return np.interp(np.asarray(fraction) * total, positions, values)
+
+def merge(a, b):
+    """
+    Combine two sketches of the same kind.
+    """
+    merges = {'hll': hll_merge, 'top_k': top_k_merge, 'tdigest': tdigest_merge}
+    return merges[a['kind']](a, b)
+
+def save(sketches, path):
+    """
+    Write sketches (a sketch or a dict/list of them) to disk.
+
+    Args:
+        sketches: The sketch(es) to write.
+        path (str): Destination file.
+    """
+    joblib.dump(sketches, path)
+
+def load(path):
+    """
+    Read sketches written by save.
+
+    Args:
+        path (str): Source file.
+
+    Returns:
+        The sketch(es) as saved.
+    """
+    return joblib.load(path)
@@ -0,0 +1,89 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import log_parsers
+import log_schema
+import log_store
+import logs_analysis
+import web_server_logs
+
+ROWS = 3000
+
+# Small enough to cut the test logs into dozens of chunks
+CHUNK_BYTES = 8 * 1024
+
+EXACT_KEYS = ('sessions', 'average_duration', 'duration_std', 'average_session_length', 'average_pages_per_session')
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = str(tmp_path / 'logs.csv')
+    web_server_logs.save_logs_to_csv(web_server_logs.generate_logs(ROWS, seed=1), path)
+    return path
+
+def _counts(series):
+    series = series.copy()
+    series.index = series.index.astype(str)
+    return series.astype(np.int64).sort_index()
+
+def assert_same_results(actual, expected):
+    pd.testing.assert_series_equal(_counts(actual['visits_per_country']), _counts(expected['visits_per_country']),
+                                   check_names=False)
+    pd.testing.assert_series_equal(_counts(actual['main_interests']), _counts(expected['main_interests']),
+                                   check_names=False)
+    for key in EXACT_KEYS:
+        assert actual[key] == pytest.approx(expected[key], rel=1e-9), key
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_chunked_analysis_matches_whole(log_file, processes):
+    whole = logs_analysis.summarize_logs(log_store.load_logs(log_file))
+    chunked = logs_analysis.analyze_logs_chunked(log_file, processes=processes, chunk_bytes=CHUNK_BYTES, top_k=None)
+    assert_same_results(chunked, whole)
+
+def test_shards_match_concatenation(tmp_path):
+    # Generated shards draw distinct visitors, as a load balancer with sticky sessions would
+    paths = []
+    for seed in (1, 2, 3):
+        path = str(tmp_path / f'node-{seed}.csv')
+        web_server_logs.save_logs_to_csv(web_server_logs.generate_logs(ROWS // 3, seed=seed), path)
+        paths.append(path)
+    concatenated = pd.concat([log_store.load_logs(path) for path in paths], ignore_index=True)
+    whole = logs_analysis.summarize_logs(concatenated, concatenated['Country'].astype(object))
+    for processes in (1, 2):
+        sharded = logs_analysis.analyze_logs_chunked(paths, processes=processes, chunk_bytes=CHUNK_BYTES, top_k=None)
+        assert_same_results(sharded, whole)
+
+def test_sketch_merges_match_whole(log_file):
+    whole = logs_analysis.summarize_logs(log_store.load_logs(log_file), approximate=True)
+    chunked = logs_analysis.analyze_logs_chunked(log_file, chunk_bytes=CHUNK_BYTES, top_k=None, approximate=True)
+    # Space-Saving is exact below its capacity and HyperLogLog merges losslessly
+    assert_same_results(chunked, whole)
+    assert chunked['unique_visitors'] == whole['unique_visitors']
+    for fraction, value in whole['duration_percentiles'].items():
+        assert chunked['duration_percentiles'][fraction] == pytest.approx(value, rel=0.05, abs=1.0)
+
+def _access_log(path, rows):
+    random = np.random.default_rng(1)
+    epochs = 1_700_000_000 + np.cumsum(random.integers(0, 20, rows))
+    with open(path, 'w', encoding='utf-8') as file:
+        for position, epoch in enumerate(epochs):
+            when = datetime.fromtimestamp(int(epoch), timezone.utc).strftime('%d/%b/%Y:%H:%M:%S +0000')
+            file.write(f'10.0.0.{random.integers(1, 40)} - - [{when}] "GET /page-{position % 7}?q=1 HTTP/1.1" '
+                       f'200 512 "-" "Mozilla/5.0 Chrome/120.0" 0.{random.integers(1, 9)}\n')
+
+def _sorted_rows(table):
+    frame = table.to_pandas()
+    frame = frame.astype({column: str for column in log_schema.CATEGORICAL_COLUMNS})
+    return frame.sort_values(['IP Address', 'Timestamp', 'Endpoint']).reset_index(drop=True)
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_parser_batches_match_single_batch(tmp_path, processes):
+    path = str(tmp_path / 'access.log')
+    _access_log(path, ROWS)
+    whole = _sorted_rows(log_parsers.parse_file(path))
+    batched = _sorted_rows(log_parsers.parse_file(path, processes=processes, batch_bytes=4096))
+    pd.testing.assert_frame_equal(batched, whole)
+    # Duration is the dwell time, never the trailing response time
+    assert (whole['Duration'] == 0).any() and whole['Duration'].max() > 1
@@ -1,89 +1,210 @@
-from datetime import datetime, timedelta
-from random import randint, choice
-import csv
-from faker import Faker
+import argparse
 import os
+from datetime import datetime
+from functools import lru_cache
+from random import Random
 
-fake = Faker()
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 
-def generate_ip():
+from log_schema import CSV_HEADER, LOG_SCHEMA, from_rows, int_to_ipv4, write_csv
+from log_store import file_lock, write_partitioned
+from sessions import SESSION_TIMEOUT, dwell_times
+
+ENDPOINTS = ["/index.html", "/images/games.jpg", "/searchsports.php", "/football.html"]
+METHODS = ["GET", "POST"]
+STATUSES = [200, 304, 404, 500]
+DEVICES = ["Desktop", "Mobile", "Tablet"]
+BROWSERS = ["Chrome", "Firefox", "Safari", "Edge"]
+SPORTS_ACTIVITIES = ["Football", "Basketball", "Tennis", "Swimming", "Running", "Cycling", "Golf", "Baseball", "Cricket", "Volleyball"]
+
+# Seconds covered by one run of generated logs
+DEFAULT_SPAN_SECONDS = 100000
+
+DEFAULT_CHUNK_SIZE = 1_000_000
+
+# Default visitor pool is one client per this many requests, capped at MAX_CLIENTS
+REQUESTS_PER_CLIENT = 10
+MAX_CLIENTS = 1_000_000
+
+def country_pool(size=100, seed=None):
     """
-    Generate a random IP address.
+    Draw the pool of countries that generated visits come from.
+
+    Args:
+        size (int): Number of draws; repeated countries get proportionally more traffic.
+        seed (int): Optional seed for reproducible pools.
 
     Returns:
-        str: A randomly generated IP address.
+        list: Country names, possibly with repeats.
+    """
+    return Random(seed).choices(_countries(), k=size)
+
+@lru_cache(maxsize=1)
+def _countries():
+    # Faker's en_US country list (what Faker().country() draws from), loaded once on first generation;
+    # importing only the provider skips building a Faker instance with every provider
+    from faker.providers.address.en_US import Provider
+    return tuple(Provider.countries)
+
+def _dictionary(rng, values, num_rows):
+    # Draw codes into the unique values so the column is dictionary-encoded from the start
+    uniques, inverse = np.unique(np.asarray(values), return_inverse=True)
+    codes = inverse[rng.integers(0, len(values), num_rows)].astype(np.int32)
+    return pa.DictionaryArray.from_arrays(codes, pa.array(uniques.tolist(), pa.string()))
+
+def generate_log_chunks(num_entries, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, start_time=None,
+                        span_seconds=DEFAULT_SPAN_SECONDS, clients=None):
     """
-    return ".".join(map(str, (randint(0, 255) for _ in range(4))))
+    Generate web server log entries as a stream of Arrow tables.
+
+    Rows are produced in timestamp order across chunks: each chunk covers its
+    share of the time span, so only one chunk is ever held in memory.
+    Requests come from a fixed pool of client addresses, a few of them much
+    busier than the rest. Duration is the dwell time until the same client's
+    next request in the session (0 for exit pages); a client's last request
+    in a chunk is treated as an exit page.
+
+    Args:
+        num_entries (int): The total number of log entries to generate.
+        chunk_size (int): The maximum number of rows per chunk.
+        seed (int): Optional seed for reproducible logs.
+        start_time (datetime): Start of the time span (defaults to now).
+        span_seconds (int): Length of the time span the entries are spread over.
+        clients (int): Number of distinct client addresses (defaults to one per REQUESTS_PER_CLIENT rows).
+
+    Yields:
+        pa.Table: Chunks of log entries typed according to log_store.LOG_SCHEMA.
+    """
+    rng = np.random.default_rng(seed)
+    countries = country_pool(seed=seed)
+    start = int((start_time or datetime.now()).timestamp())
+    if clients is None:
+        clients = min(max(1, num_entries // REQUESTS_PER_CLIENT), MAX_CLIENTS)
+    client_addresses = rng.integers(0, 2 ** 32, clients, dtype=np.uint32)
+
+    for first in range(0, num_entries, chunk_size):
+        num_rows = min(chunk_size, num_entries - first)
+        # Each chunk draws its timestamps inside its own slice of the span
+        low = start + span_seconds * first // num_entries
+        high = start + span_seconds * (first + num_rows) // num_entries
+        epochs = np.sort(rng.integers(low, max(high, low + 1), num_rows))
+
+        # Squaring a uniform draw skews traffic towards the first clients in the pool
+        client_codes = (clients * rng.random(num_rows) ** 2).astype(np.int64)
+        durations = dwell_times(client_codes, epochs, SESSION_TIMEOUT)
 
-def generate_logs(num_entries=300):
+        yield pa.Table.from_arrays([
+            pa.array(epochs, pa.timestamp('s')),
+            pc.dictionary_encode(int_to_ipv4(client_addresses[client_codes])),
+            _dictionary(rng, METHODS, num_rows),
+            _dictionary(rng, ENDPOINTS, num_rows),
+            pa.array(np.asarray(STATUSES, dtype=np.int16)[rng.integers(0, len(STATUSES), num_rows)]),
+            _dictionary(rng, countries, num_rows),
+            _dictionary(rng, SPORTS_ACTIVITIES, num_rows),
+            _dictionary(rng, DEVICES, num_rows),
+            _dictionary(rng, BROWSERS, num_rows),
+            pa.array(durations.astype(np.float32)),
+        ], schema=LOG_SCHEMA)
+
+def generate_logs(num_entries=300, seed=None):
     """
     Generate a list of web server log entries.
 
     Args:
         num_entries (int): The number of log entries to generate.
+        seed (int): Optional seed for reproducible logs.
 
     Returns:
         list: A list of log entries, each entry is a list containing timestamp, IP address, method, endpoint, status,
               country, type of sporting activities, device, browser, and duration.
     """
-    endpoints = ["/index.html", "/images/games.jpg", "/searchsports.php", "/football.html"]
-    methods = ["GET", "POST"]
-    statuses = [200, 304, 404, 500]
-    countries = [fake.country() for _ in range(100)]  # Generate a list of 100 random countries
-    devices = ["Desktop", "Mobile", "Tablet"]
-    browsers = ["Chrome", "Firefox", "Safari", "Edge"]
-    sports_activities = ["Football", "Basketball", "Tennis", "Swimming", "Running", "Cycling", "Golf", "Baseball", "Cricket", "Volleyball"]
-
-    log_entries = []
-    start_time = datetime.now()
-
-    for _ in range(num_entries):
-        timestamp = (start_time + timedelta(seconds=randint(0, 100000))).strftime('%Y-%m-%d %H:%M:%S')
-        ip_address = generate_ip()
-        method = choice(methods)
-        endpoint = choice(endpoints)
-        status = choice(statuses)
-        country = choice(countries)
-        sports_activity = choice(sports_activities)
-        device = choice(devices)
-        browser = choice(browsers)
-        log_entry = [timestamp, ip_address, method, endpoint, status, country, sports_activity, device, browser]
-        log_entries.append(log_entry)
-
-    # Sort log entries by timestamp
-    log_entries.sort(key=lambda x: datetime.strptime(x[0], '%Y-%m-%d %H:%M:%S'))
-
-    # Calculate and add duration
-    for i in range(1, len(log_entries)):
-        prev_time = datetime.strptime(log_entries[i - 1][0], '%Y-%m-%d %H:%M:%S')
-        curr_time = datetime.strptime(log_entries[i][0], '%Y-%m-%d %H:%M:%S')
-        duration = (curr_time - prev_time).total_seconds()
-        log_entries[i].append(duration)
-
-    # Add duration for the first log entry
-    log_entries[0].append(0.0)
-
-    return log_entries
-
-def save_logs_to_csv(log_entries, filename="web_server_logs.csv"):
+    table = pa.concat_tables(generate_log_chunks(num_entries, seed=seed))
+    logs = table.to_pandas()
+    logs['Timestamp'] = logs['Timestamp'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    return logs.to_numpy(dtype=object).tolist()
+
+def save_logs_to_csv(log_entries, filename="web_server_logs.csv", partitioned=False):
     """
     Save log entries to a CSV file. Append if the file exists, else create a new one.
 
     Args:
         log_entries (list): A list of log entries to save.
         filename (str): The name of the CSV file to save the log entries to.
+        partitioned (bool): Treat filename as the root of an hour-partitioned
+            dataset (see log_store.write_partitioned) and append each entry to
+            its hour's CSV. Implied when filename is an existing directory.
+    """
+    # Converted column by column into the shared schema, then written like any other log table
+    write_tables(filename, [from_rows(log_entries)], partitioned=partitioned)
+
+def write_logs(filename, num_entries, chunk_size=DEFAULT_CHUNK_SIZE, seed=None, start_time=None,
+               span_seconds=DEFAULT_SPAN_SECONDS, clients=None, partitioned=False):
+    """
+    Stream generated log entries straight to a CSV or Parquet file.
+
+    CSV output is appended like save_logs_to_csv; a '.parquet' filename is
+    written as a new file. Only one chunk is held in memory at a time.
+
+    Args:
+        filename (str): The output file; the extension selects the format.
+        num_entries (int): The total number of log entries to generate.
+        chunk_size (int): The maximum number of rows per chunk.
+        seed (int): Optional seed for reproducible logs.
+        start_time (datetime): Start of the time span (defaults to now).
+        span_seconds (int): Length of the time span the entries are spread over.
+        clients (int): Number of distinct client addresses.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at filename.
+    """
+    chunks = generate_log_chunks(num_entries, chunk_size=chunk_size, seed=seed, start_time=start_time,
+                                 span_seconds=span_seconds, clients=clients)
+    write_tables(filename, chunks, partitioned=partitioned)
+
+def write_tables(filename, tables, partitioned=False):
+    """
+    Write a stream of log tables to a CSV, Parquet file or partitioned dataset.
+
+    CSV output is appended like save_logs_to_csv; a '.parquet' filename is
+    written as a new file. Tables are written one at a time as they arrive,
+    under the output's log_store.file_lock, so concurrent writers never
+    interleave rows.
+
+    Args:
+        filename (str): The output file; the extension selects the format.
+        tables (iterable): pa.Tables typed according to log_store.LOG_SCHEMA.
+        partitioned (bool): Append to an hour-partitioned dataset rooted at filename.
     """
-    # Check if the file exists to determine the write mode
-    file_exists = os.path.isfile(filename)
-    
-    with open(filename, mode='a' if file_exists else 'w', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        # Write the header only if the file is being created
+    with file_lock(filename):
+        _write_tables(filename, tables, partitioned)
+
+def _write_tables(filename, tables, partitioned):
+    if partitioned or os.path.isdir(filename):
+        for table in tables:
+            write_partitioned(table, filename)
+        return
+
+    if filename.endswith('.parquet'):
+        with pq.ParquetWriter(filename, LOG_SCHEMA) as writer:
+            for table in tables:
+                writer.write_table(table)
+        return
+
+    file_exists = os.path.isfile(filename) and os.path.getsize(filename) > 0
+    with open(filename, 'ab') as file:
         if not file_exists:
-            writer.writerow(["Timestamp", "IP Address", "Method", "Endpoint", "Status",
-                             "Country", "Sports Activity", "Device", "Browser", "Duration"])
-        writer.writerows(log_entries)
+            file.write(CSV_HEADER)
+        for table in tables:
+            write_csv(file, table)
 
 if __name__ == "__main__":
-    logs = generate_logs()
-    save_logs_to_csv(logs)
+    parser = argparse.ArgumentParser(description="Generate synthetic web server logs.")
+    parser.add_argument('--rows', type=int, default=300, help="number of log entries to generate")
+    parser.add_argument('--output', default="web_server_logs.csv", help="CSV or .parquet file, or partitioned dataset root")
+    parser.add_argument('--seed', type=int, default=None, help="seed for reproducible logs")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="rows generated per chunk")
+    parser.add_argument('--partitioned', action='store_true', help="write an hour-partitioned dataset to --output")
+    args = parser.parse_args()
+
+    write_logs(args.output, args.rows, chunk_size=args.chunk_size, seed=args.seed, partitioned=args.partitioned)